@@ -0,0 +1,81 @@
+# File: address_bench.py
+# Description: Measures how many bytes each address takes in memory once
+#       it is read from a file, with the slotted, interned Address of
+#       address_store.py against the plain Address (with a __dict__ and its
+#       own copy of every string) it replaced.
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from address_store import Address, AddressStore
+
+STATES = ["AL", "CA", "FL", "GA", "IL", "MI", "NY", "OH", "PA", "TX", "WA"]
+
+
+class PlainAddress:
+    """The Address as it was before: a regular object with a __dict__"""
+
+    def __init__(self, address):
+        """Initialize the address object"""
+        self.name = address[0]
+        self.street = address[1]
+        self.city = address[2]
+        self.state = address[3]
+        self.zip = address[4]
+
+
+def generate_addresses(filename, count, cities=1000, seed=0):
+    """Write count made-up addresses to filename, in the five-lines-per-address format"""
+    rng = random.Random(seed)
+    towns = [("City%d" % i, rng.choice(STATES), "%05d" % rng.randrange(100000))
+             for i in range(cities)]
+    with open(filename, "w") as out:
+        for i in range(count):
+            city, state, zipcode = rng.choice(towns)
+            if i > 0:
+                out.write("\n")
+            out.write("Person %d\n%d Main Street\n%s\n%s\n%s" % (i, rng.randrange(10000),
+                                                                 city, state, zipcode))
+
+
+def measure(address_class, filename):
+    """
+    Read every address in filename into a list of address_class objects,
+    the way AddressStore reads a page. Returns (records, bytes per
+    record, seconds).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    addresses = []
+    with open(filename, "rb") as address_file:
+        fields = []
+        for line in address_file:
+            fields.append(line.decode("utf-8").rstrip())
+            if len(fields) == AddressStore.LINES_PER_RECORD:
+                addresses.append(address_class(fields))
+                fields = []
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (len(addresses), size / len(addresses), seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure memory per address")
+    parser.add_argument("--output", help = "keep the generated file here "
+                                           "(by default it is written to a temporary directory)")
+    parser.add_argument("--records", type = int, default = 200000)
+    parser.add_argument("--cities", type = int, default = 1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = args.output or os.path.join(temp_dir, "generated_addresses.txt")
+        generate_addresses(filename, args.records, args.cities)
+        print("%-22s %16s %10s" % ("address", "bytes/record", "seconds"))
+        for name, address_class in [("plain (before)", PlainAddress), ("slotted, interned", Address)]:
+            records, per_record, seconds = measure(address_class, filename)
+            print("%-22s %16.1f %10.2f" % (name, per_record, seconds))
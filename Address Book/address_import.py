@@ -0,0 +1,274 @@
+# File: address_import.py
+# Description: Command line tool that merges address files (in either
+#       format) into one, cleaning up the fields and dropping duplicates.
+#       Records are streamed through one at a time: duplicates are found
+#       with a compact table of hashes of normalized keys, and near
+#       duplicates (the same address with a slightly different name)
+#       within a bounded cache of blocks of records sharing zip and street.
+
+import argparse
+import array
+import hashlib
+import os
+import re
+import sys
+from collections import OrderedDict
+
+from address_store import Address, AddressStore, ColumnFile, sync_directory, sync_file
+
+PROGRESS_STEP = 100000  # records between progress reports
+
+# Spellings of street words that mean the same thing
+STREET_WORDS = {
+    "street": "st", "str": "st", "avenue": "ave", "av": "ave", "road": "rd",
+    "drive": "dr", "boulevard": "blvd", "lane": "ln", "court": "ct",
+    "place": "pl", "terrace": "ter", "circle": "cir", "highway": "hwy",
+    "parkway": "pkwy", "square": "sq", "north": "n", "south": "s",
+    "east": "e", "west": "w", "apartment": "apt", "suite": "ste", "#": "apt",
+}
+
+SPACES = re.compile(r"\s+")
+PUNCTUATION = re.compile(r"[^\w#\s]")
+
+
+def read_addresses(filename):
+    """
+    Generator that yields the addresses in filename, in either format,
+    without reading the whole file into memory
+    """
+    with open(filename, "rb") as address_file:
+        if ColumnFile.is_binary(address_file):
+            columns = ColumnFile(address_file)
+            try:
+                for page_number in range(len(columns.page_offsets) - 1):
+                    yield from columns.read_page(page_number)
+            finally:
+                columns.close()
+            return
+
+        fields = []
+        for line in address_file:
+            fields.append(line.decode("utf-8", "replace").rstrip())
+            if len(fields) == AddressStore.LINES_PER_RECORD:
+                yield Address(fields)
+                fields = []
+        if len(fields) > 0 and any(fields):
+            # the last record was cut short
+            yield Address(fields + [""] * (AddressStore.LINES_PER_RECORD - len(fields)))
+
+
+def clean(text):
+    """Return text without leading, trailing or repeated spaces"""
+    return SPACES.sub(" ", text).strip()
+
+
+def normalize(address):
+    """
+    Return address with its fields cleaned up: spaces tidied, the state
+    in capitals and the zip cut to its first five digits if it has them
+    """
+    zipcode = clean(address.zip)
+    digits = re.sub(r"\D", "", zipcode)
+    if len(digits) in [5, 9]:
+        zipcode = digits[:5]
+    return Address([clean(address.name), clean(address.street), clean(address.city),
+                    clean(address.state).upper(), zipcode])
+
+
+def street_key(street):
+    """Return street lowercased, without punctuation and with street words spelled one way"""
+    words = PUNCTUATION.sub(" ", street.lower().replace("#", " # ")).split()
+    return " ".join(STREET_WORDS.get(word, word) for word in words)
+
+
+def name_key(name):
+    """Return name lowercased, without punctuation and with the words in order"""
+    return " ".join(sorted(PUNCTUATION.sub(" ", name.lower()).split()))
+
+
+def fingerprint(address):
+    """Return a 64-bit hash of the normalized name, street and zip of a normalized address"""
+    key = "%s\n%s\n%s" % (name_key(address.name), street_key(address.street), address.zip.lower())
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size = 8).digest(), "little")
+
+
+def trigrams(text):
+    """Return the set of three-letter pieces of text, padded so short words count too"""
+    text = "  %s " % text
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def similarity(first, second):
+    """Return the share of trigrams (0 to 1) the two texts have in common"""
+    first = trigrams(first)
+    second = trigrams(second)
+    return len(first & second) / len(first | second)
+
+
+class FingerprintSet:
+    """
+    Set of 64-bit fingerprints in an open-addressing hash table held in
+    one array, so it takes 16 bytes or so per fingerprint instead of the
+    70 or more of a Python set of ints.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        """Create an empty set with room for capacity / 2 fingerprints before growing"""
+        self.slots = array.array('Q', bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.count = 0
+
+    def add(self, value):
+        """Add value and return True, or return False if it was there already"""
+        value = value or 1 # 0 marks an empty slot
+        slots = self.slots
+        i = value & self.mask
+        while slots[i] != 0:
+            if slots[i] == value:
+                return False
+            i = (i + 1) & self.mask
+        slots[i] = value
+        self.count += 1
+        if self.count * 2 > len(slots):
+            self.grow()
+        return True
+
+    def grow(self):
+        """Double the table"""
+        old = self.slots
+        self.slots = array.array('Q', bytes(16 * len(old)))
+        self.mask = len(self.slots) - 1
+        for value in old:
+            if value != 0:
+                i = value & self.mask
+                while self.slots[i] != 0:
+                    i = (i + 1) & self.mask
+                self.slots[i] = value
+
+    def __len__(self):
+        """Return the number of fingerprints"""
+        return self.count
+
+
+class NearDuplicates:
+    """
+    Finds records that are probably the same as an earlier one: the same
+    zip and street, and a name that is nearly the same. Only records in
+    the same block (zip and street) are compared. The most recently used
+    blocks are kept, each with its last few names, so memory stays
+    bounded and a near duplicate further back than that is missed.
+    """
+
+    def __init__(self, threshold=0.7, max_blocks=200000, block_size=8):
+        """Create an empty cache of blocks"""
+        self.threshold = threshold
+        self.max_blocks = max_blocks
+        self.block_size = block_size
+        self.blocks = OrderedDict()     # (zip, street key) -> list of name keys
+
+    def check(self, address):
+        """Return True if address nearly matches a kept record, else keep it and return False"""
+        block_key = (address.zip.lower(), street_key(address.street))
+        name = name_key(address.name)
+        block = self.blocks.get(block_key)
+        if block is None:
+            block = self.blocks[block_key] = []
+            if len(self.blocks) > self.max_blocks:
+                self.blocks.popitem(last = False)
+        else:
+            self.blocks.move_to_end(block_key)
+            for other in block:
+                if similarity(name, other) >= self.threshold:
+                    return True
+        block.append(name)
+        if len(block) > self.block_size:
+            del block[0]
+        return False
+
+
+def merge(filenames, output, binary=None, fuzzy=True, threshold=0.7,
+          max_blocks=200000, progress=None):
+    """
+    Merge the address files filenames into output, normalizing every
+    record and dropping exact duplicates and, if fuzzy is True, near
+    duplicates. output is in the binary format if binary is True, or if
+    binary is None and its name ends with ColumnFile.SUFFIX. progress, if
+    given, is called with the statistics every PROGRESS_STEP records
+    read. Returns the statistics: records read, written, exact and near
+    duplicates and empty records.
+    """
+    stats = OrderedDict([("read", 0), ("written", 0), ("exact duplicates", 0),
+                         ("near duplicates", 0), ("empty", 0)])
+    seen = FingerprintSet()
+    near = NearDuplicates(threshold, max_blocks)
+
+    def unique_addresses():
+        for filename in filenames:
+            for address in read_addresses(filename):
+                stats["read"] += 1
+                if progress is not None and stats["read"] % PROGRESS_STEP == 0:
+                    progress(stats)
+                address = normalize(address)
+                if not any([address.name, address.street, address.city, address.state, address.zip]):
+                    stats["empty"] += 1
+                elif not seen.add(fingerprint(address)):
+                    stats["exact duplicates"] += 1
+                elif fuzzy and near.check(address):
+                    stats["near duplicates"] += 1
+                else:
+                    stats["written"] += 1
+                    yield address
+
+    if binary is None:
+        binary = output.endswith(ColumnFile.SUFFIX)
+    # output may be one of the inputs, so it is only replaced at the end,
+    # once the merged file is all on disk
+    temp_filename = output + ".tmp"
+    try:
+        with open(temp_filename, "wb") as out:
+            if binary:
+                ColumnFile.write(unique_addresses(), out, AddressStore.PAGE_SIZE)
+            else:
+                first = True
+                for address in unique_addresses():
+                    if not first:
+                        out.write(b"\n")
+                    out.write(address.string().encode("utf-8"))
+                    first = False
+            sync_file(out)
+    except BaseException:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+        raise
+    os.replace(temp_filename, output)
+    sync_directory(output)
+    return stats
+
+
+def report(stats):
+    """Return the statistics as one line"""
+    return ", ".join("%s: %d" % (name, value) for name, value in stats.items())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Merge address files, dropping duplicates")
+    parser.add_argument("inputs", nargs = "+", help = "address files, in either format")
+    parser.add_argument("-o", "--output", required = True,
+                        help = "merged file (binary if it ends with %s)" % ColumnFile.SUFFIX)
+    parser.add_argument("--exact-only", action = "store_true",
+                        help = "only drop records whose normalized name, street and zip match")
+    parser.add_argument("--threshold", type = float, default = 0.7,
+                        help = "share of name trigrams that makes a near duplicate")
+    parser.add_argument("--max-blocks", type = int, default = 200000,
+                        help = "zip and street blocks kept for finding near duplicates")
+    args = parser.parse_args()
+
+    try:
+        stats = merge(args.inputs, args.output, fuzzy = not args.exact_only,
+                      threshold = args.threshold, max_blocks = args.max_blocks,
+                      progress = lambda stats: print(report(stats), file = sys.stderr))
+    except (OSError, ValueError) as error:
+        raise SystemExit("Cannot merge: %s" % error)
+    print(report(stats))
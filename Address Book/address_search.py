@@ -0,0 +1,261 @@
+# File: address_search.py
+# Description: In-memory search indexes over an AddressStore: a sorted
+#       name index for prefix lookups, a trigram index for substring and
+#       fuzzy name matches, and exact indexes on state and zip.
+
+import array
+import bisect
+import sys
+import unittest
+
+from address_store import Address, AddressStore
+
+class AddressIndex:
+    """
+    Indexes are keyed by record number. Deleted records are left in the
+    indexes and filtered out when searching, so deleting stays cheap.
+    """
+
+    FUZZY_MATCH = 0.5   # share of the query's trigrams a fuzzy match must have
+
+    def __init__(self):
+        """Create empty indexes"""
+        self.keys = {}          # record -> (lowercase name, uppercase state, zip)
+        self.names = []         # sorted list of (lowercase name, record)
+        self.trigrams = {}      # trigram -> array of records whose name has it
+        self.states = {}        # uppercase state -> array of records
+        self.zips = {}          # zip -> array of records
+        self.edited_keys = {}   # edited record -> the (field, key) pairs it is indexed under
+        self.last_query = None  # the last substring query and its matches,
+        self.last_matches = []  # reused while the user keeps typing
+
+    def build(self, store, progress=None):
+        """
+        Index every record of store that is not deleted. progress, if
+        given, is called with the number of records indexed so far every
+        store.PROGRESS_STEP records.
+        """
+        self.__init__()
+        names = []
+        for record, address in store.items():
+            names.append((address.name.lower(), record))
+            self.add_fields(record, address)
+            if progress is not None and len(names) % store.PROGRESS_STEP == 0:
+                progress(len(names))
+        names.sort()
+        self.names = names
+
+    def add(self, record, address):
+        """Index a record added after the indexes were built"""
+        bisect.insort(self.names, (address.name.lower(), record))
+        self.add_fields(record, address)
+        self.last_query = None
+
+    def update(self, record, address):
+        """
+        Index the new fields of an edited record. Its old trigrams, state
+        and zip are left in the indexes, like deleted records, and the
+        searches skip them by checking keys. The keys a record is indexed
+        under are kept once it is edited, so that it is never added under
+        the same key twice.
+        """
+        old = self.keys.get(record)
+        if old is None:
+            self.add(record, address)
+            return
+        name = address.name.lower()
+        state = address.state.strip().upper()
+        zipcode = address.zip.strip()
+        if name != old[0]:
+            i = bisect.bisect_left(self.names, (old[0], record))
+            if i < len(self.names) and self.names[i] == (old[0], record):
+                del self.names[i]
+            bisect.insort(self.names, (name, record))
+        indexed = self.edited_keys.get(record)
+        if indexed is None:
+            # the keys it has been indexed under so far
+            indexed = {("trigram", trigram) for trigram in trigrams_of(old[0])}
+            indexed.update([("state", old[1]), ("zip", old[2])])
+            self.edited_keys[record] = indexed
+        self.keys[record] = (name, state, zipcode)
+        for trigram in set(trigrams_of(name)):
+            self.add_once(record, self.trigrams, "trigram", trigram)
+        self.add_once(record, self.states, "state", state)
+        self.add_once(record, self.zips, "zip", zipcode)
+        self.last_query = None
+
+    def add_once(self, record, index, field, key):
+        """Add the edited record to index under key, unless it is there already"""
+        indexed = self.edited_keys[record]
+        if (field, key) not in indexed:
+            indexed.add((field, key))
+            add_to(index, key, record)
+
+    def add_fields(self, record, address):
+        """Add record to the trigram, state and zip indexes"""
+        name = address.name.lower()
+        state = sys.intern(address.state.strip().upper())
+        zipcode = sys.intern(address.zip.strip())
+        self.keys[record] = (name, state, zipcode)
+        for trigram in set(trigrams_of(name)):
+            add_to(self.trigrams, trigram, record)
+        add_to(self.states, state, record)
+        add_to(self.zips, zipcode, record)
+
+    def by_prefix(self, prefix, limit):
+        """Return up to limit records whose name starts with prefix, in name order"""
+        prefix = prefix.lower()
+        records = []
+        i = bisect.bisect_left(self.names, (prefix,))
+        while i < len(self.names) and len(records) < limit:
+            name, record = self.names[i]
+            if not name.startswith(prefix):
+                break
+            records.append(record)
+            i += 1
+        return records
+
+    def by_substring(self, text, store):
+        """
+        Return the records whose name contains text. The records sharing
+        the query's rarest trigram are checked; if the query extends the
+        previous one, only the previous matches are checked.
+        """
+        text = text.lower()
+        if self.last_query is not None and self.last_query in text:
+            candidates = self.last_matches
+        else:
+            query_trigrams = trigrams_of(text)
+            if len(query_trigrams) == 0:
+                return []
+            candidates = min((self.trigrams.get(t, ()) for t in query_trigrams), key = len)
+        keys = self.keys
+        matches = [record for record in candidates
+                   if text in keys[record][0] and store.exists(record)]
+        self.last_query = text
+        self.last_matches = matches
+        return matches
+
+    def by_similarity(self, text, limit):
+        """Return up to limit records whose name shares most trigrams with text, best first"""
+        query_trigrams = set(trigrams_of(text.lower()))
+        counts = {}
+        keys = self.keys
+        for trigram in query_trigrams:
+            for record in self.trigrams.get(trigram, ()):
+                if trigram in keys[record][0]: # not left over from before an edit
+                    counts[record] = counts.get(record, 0) + 1
+        needed = max(1, int(len(query_trigrams) * self.FUZZY_MATCH))
+        best = sorted((-count, record) for record, count in counts.items() if count >= needed)
+        return [record for count, record in best[:limit]]
+
+    def search(self, query, store, limit=50):
+        """
+        Return up to limit records matching query. Words like "state:GA"
+        and "zip:31416" must match exactly; the rest of the query is
+        matched against names, first by prefix, then as a substring, and
+        if nothing else matches, by similarity.
+        """
+        text_words = []
+        state = None
+        zipcode = None
+        for word in query.split():
+            field, colon, value = word.partition(":")
+            if colon and field.lower() == "state":
+                state = value.upper()
+            elif colon and field.lower() == "zip":
+                zipcode = value
+            else:
+                text_words.append(word)
+        text = " ".join(text_words)
+
+        keys = self.keys
+        def allowed(record):
+            name, record_state, record_zip = keys[record]
+            return ((state is None or record_state == state)
+                    and (zipcode is None or record_zip == zipcode)
+                    and store.exists(record))
+
+        if len(text) == 0:
+            # only exact matches, in record order
+            candidates = []
+            if state is not None:
+                candidates.append(self.states.get(state, ()))
+            if zipcode is not None:
+                candidates.append(self.zips.get(zipcode, ()))
+            if len(candidates) == 0:
+                return []
+            results = []
+            for record in min(candidates, key = len):
+                if len(results) >= limit:
+                    break
+                if allowed(record):
+                    results.append(record)
+            return results
+
+        results = [record for record in self.by_prefix(text, limit) if allowed(record)]
+        seen = set(results)
+        if len(results) < limit and len(text) >= 3:
+            for record in self.by_substring(text, store):
+                if len(results) >= limit:
+                    break
+                if record not in seen and allowed(record):
+                    results.append(record)
+                    seen.add(record)
+        if len(results) == 0 and len(text) >= 3:
+            results = [record for record in self.by_similarity(text, limit) if allowed(record)]
+        return results
+
+
+def add_to(index, key, record):
+    """Append record to the array of records for key in index"""
+    records = index.get(key)
+    if records is None:
+        records = index[key] = array.array('q')
+    records.append(record)
+
+
+def trigrams_of(text):
+    """Return the list of three-letter pieces of text"""
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class AddressIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = AddressStore()
+        for fields in [["Ada Lovelace", "1 Main St", "Athens", "GA", "30601"],
+                       ["Alan Turing", "2 Oak Ave", "Macon", "GA", "31201"],
+                       ["Grace Hopper", "3 Elm St", "Austin", "TX", "73301"],
+                       ["Adam Smith", "4 Pine Rd", "Athens", "GA", "30601"]]:
+            self.store.add(Address(fields))
+        self.index = AddressIndex()
+        self.index.build(self.store)
+
+    def test_prefix_substring_and_similarity(self):
+        self.assertEqual(self.index.search("ad", self.store), [0, 3])
+        self.assertEqual(self.index.search("hopp", self.store), [2])
+        self.assertEqual(self.index.search("turnig", self.store), [])
+        self.assertEqual(self.index.search("alan turnig", self.store), [1])
+
+    def test_exact_fields(self):
+        self.assertEqual(self.index.search("state:ga", self.store), [0, 1, 3])
+        self.assertEqual(self.index.search("zip:30601", self.store), [0, 3])
+        self.assertEqual(self.index.search("ad state:GA zip:31201", self.store), [])
+
+    def test_add_update_and_delete(self):
+        record = self.store.add(Address(["Adele Adkins", "5 Bay St", "Tulsa", "OK", "74101"]))
+        self.index.add(record, self.store.get(record))
+        self.assertEqual(self.index.search("ad", self.store), [0, 3, 4])
+
+        # editing back and forth never indexes a record twice under a key
+        for name, state in [("Grace Hopper", "GA"), ("Grace Brewster Hopper", "TX"),
+                            ("Grace Hopper", "GA")]:
+            self.index.update(2, Address([name, "3 Elm St", "Austin", state, "73301"]))
+        self.assertEqual(list(self.index.trigrams["hop"]), [2])
+        self.assertEqual(list(self.index.states["GA"]), [0, 1, 3, 2])
+        self.assertEqual(self.index.search("brewster", self.store), [])
+        self.assertEqual(self.index.search("hopper state:GA", self.store), [2])
+
+        self.store.delete(0)
+        self.assertEqual(self.index.search("ad", self.store), [3, 4])
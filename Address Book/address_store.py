@@ -0,0 +1,917 @@
+# File: address_store.py
+# Description: Storage layer behind the AddressBook GUI. An AddressStore
+#       reads an address file (five lines per address) through an index of
+#       byte offsets, so records are only read, a page at a time, when they
+#       are shown. Added records go after the ones in the file and deleted
+#       records are only marked, until the store is saved (compacted).
+#       Every change is also appended to a journal next to the file, so it
+#       survives a crash, and replayed when the file is opened again.
+#       Address files can also be in a compact binary format (ColumnFile),
+#       which the store recognizes when it opens them.
+
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import zlib
+from collections import OrderedDict
+
+class Address:
+    """
+    An address, with slots instead of a __dict__ to keep it small. The
+    city, state and zip repeat a lot, so they are interned: every record
+    with the same city shares one string.
+    """
+
+    __slots__ = ("name", "street", "city", "state", "zip")
+
+    def __init__(self, address):
+        """Initialize the address object"""
+        self.name = address[0]
+        self.street = address[1]
+        self.city = sys.intern(address[2])
+        self.state = sys.intern(address[3])
+        self.zip = sys.intern(address[4])
+
+    def string(self):
+        """Format the address as a string"""
+        return "%s\n%s\n%s\n%s\n%s" % (self.name, self.street, self.city, self.state, self.zip)
+
+
+class ColumnFile:
+    """
+    Binary address file. A fixed header is followed by the records in
+    pages, the shared string table and the page index (where each page
+    starts). Every page is zlib-compressed and holds its records column by
+    column: the byte lengths of the names and of the streets, the string
+    table numbers of the cities, states and zips, then the name and street
+    bytes (UTF-8). The string table is compressed the same way and holds
+    each city, state and zip once, as the byte lengths followed by the
+    bytes. Numbers are little-endian. The file is memory-mapped, so
+    opening it reads only the header, the page index and the string
+    table, and any page can be read without the others.
+    """
+
+    MAGIC = b"ABK1"
+    VERSION = 1
+    SUFFIX = ".abk"             # binary files are saved when the name ends with this
+    # magic, version, records per page, records, pages, strings, string table offset, page index offset
+    HEADER = struct.Struct("<4sHHqqqqq")
+    MAX_LENGTH = 0xFFFF         # longest name or street, in bytes
+
+    def __init__(self, file):
+        """
+        Read the header, page index and string table of the open binary
+        file file. Raises OSError if it is not a binary address file.
+        """
+        self.file = file
+        try:
+            self.map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError: # empty file
+            raise OSError("%s is not an address file" % file.name)
+        try:
+            (magic, version, self.page_size, self.count, pages, strings,
+             strings_offset, index_offset) = self.HEADER.unpack_from(self.map, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("bad header")
+            self.page_offsets = numbers_from('q', self.map[index_offset:index_offset + 8 * (pages + 1)])
+            if len(self.page_offsets) != pages + 1:
+                raise ValueError("page index cut short")
+            table = zlib.decompress(self.map[strings_offset:index_offset])
+            self.strings = split_strings(table, 4 * strings, numbers_from('I', table[:4 * strings]))
+        except (struct.error, ValueError, zlib.error):
+            self.close()
+            raise OSError("%s is not a valid address file" % file.name)
+
+    def read_page(self, page_number):
+        """Return the list of addresses in page page_number"""
+        start = self.page_offsets[page_number]
+        data = zlib.decompress(self.map[start:self.page_offsets[page_number + 1]])
+        count = min(self.page_size, self.count - page_number * self.page_size)
+        typecode = 'H' if data[0] == 2 else 'I'
+        position = 1
+        lengths = numbers_from('H', data[position:position + 4 * count])
+        position += 4 * count
+        ids = numbers_from(typecode, data[position:position + 3 * count * data[0]])
+        position += 3 * count * data[0]
+        text = split_strings(data, position, lengths)
+        strings = self.strings
+        return [Address([text[i], text[count + i], strings[ids[i]],
+                         strings[ids[count + i]], strings[ids[2 * count + i]]])
+                for i in range(count)]
+
+    def close(self):
+        """Close the file"""
+        self.map.close()
+        self.file.close()
+
+    @classmethod
+    def is_binary(cls, file):
+        """
+        Check if the open file file has the header of a binary address
+        file, leaving it at the start. Besides the magic and version, the
+        layout the header describes must fit the file, so a text file that
+        happens to start with the magic is still read as text.
+        """
+        file.seek(0)
+        header = file.read(cls.HEADER.size)
+        file.seek(0)
+        try:
+            (magic, version, page_size, count, pages, strings,
+             strings_offset, index_offset) = cls.HEADER.unpack(header)
+        except struct.error: # too short
+            return False
+        return (magic == cls.MAGIC and version == cls.VERSION and page_size > 0 and count >= 0
+                and pages == -(-count // page_size) and strings >= 0
+                and cls.HEADER.size <= strings_offset <= index_offset
+                and index_offset + 8 * (pages + 1) == os.fstat(file.fileno()).st_size)
+
+    @classmethod
+    def write(cls, addresses, out, page_size, progress=None, progress_step=10000):
+        """
+        Write addresses to the open binary file out, which must be empty,
+        page_size records to a page. progress, if given, is called with
+        the number of addresses written every progress_step addresses.
+        Returns the number written. Raises ValueError if a name or street
+        is longer than MAX_LENGTH bytes.
+        """
+        out.write(bytes(cls.HEADER.size))
+        page_offsets = array.array('q')
+        shared = {}     # city, state or zip -> its number in the string table
+        page = []
+        count = 0
+        for address in addresses:
+            page.append(address)
+            count += 1
+            if len(page) == page_size:
+                page_offsets.append(out.tell())
+                out.write(cls.pack_page(page, shared))
+                page = []
+            if progress is not None and count % progress_step == 0:
+                progress(count)
+        if len(page) > 0:
+            page_offsets.append(out.tell())
+            out.write(cls.pack_page(page, shared))
+
+        strings_offset = out.tell()
+        page_offsets.append(strings_offset)
+        table = [text.encode("utf-8") for text in shared]
+        lengths = array.array('I', [len(data) for data in table])
+        out.write(zlib.compress(little_endian(lengths) + b"".join(table)))
+        index_offset = out.tell()
+        out.write(little_endian(page_offsets))
+        out.seek(0)
+        out.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, page_size, count, len(page_offsets) - 1,
+                                  len(shared), strings_offset, index_offset))
+        return count
+
+    @classmethod
+    def pack_page(cls, page, shared):
+        """Return the compressed bytes of the list of addresses page, adding new strings to shared"""
+        text = [address.name.encode("utf-8") for address in page]
+        text += [address.street.encode("utf-8") for address in page]
+        lengths = array.array('H')
+        for data in text:
+            if len(data) > cls.MAX_LENGTH:
+                raise ValueError("%r is too long to save" % data[:40].decode("utf-8", "replace"))
+            lengths.append(len(data))
+
+        # The numbers are 2 bytes if no string added up to this page can need more
+        width = 2 if len(shared) + 3 * len(page) <= 0x10000 else 4
+        ids = array.array('H' if width == 2 else 'I')
+        for field in ["city", "state", "zip"]:
+            for address in page:
+                value = getattr(address, field)
+                number = shared.get(value)
+                if number is None:
+                    number = shared[value] = len(shared)
+                ids.append(number)
+        return zlib.compress(bytes([width]) + little_endian(lengths) + little_endian(ids) + b"".join(text))
+
+
+class AddressStore:
+    """
+    Records are numbered in the order they appear in the file, followed by
+    the ones added since it was opened. Numbers are never reused, so a
+    deleted record leaves a gap that navigation skips over.
+    """
+
+    LINES_PER_RECORD = 5
+    PAGE_SIZE = 256         # records read from the file at a time
+    MAX_PAGES = 64          # pages kept in memory
+    INDEX_SUFFIX = ".idx"   # file next to the address file holding its index
+    INDEX_HEADER = struct.Struct("<4sqqq") # magic, file size, file mtime, records
+    INDEX_MAGIC = b"AIDX"
+    PROGRESS_STEP = 10000   # records between progress reports
+    CHUNK_SIZE = 1 << 20    # bytes read at a time when counting the records of a file
+    JOURNAL_SUFFIX = ".journal" # file next to the address file holding the changes since it was saved
+    CHECKPOINT_CHANGES = 1000   # journal length at which the file should be saved again
+
+    def __init__(self):
+        """Create an empty store that is not backed by any file"""
+        self.filename = None
+        self.file = None
+        self.columns = None             # the ColumnFile, if the file is binary
+        self.offsets = array.array('q') # byte offset of each record in the file
+        self.indexed = True             # whether offsets covers the whole file
+        self.end_offset = 0             # where indexing continues
+        self.counted = None             # number of records in the file, once counted
+        self.last_lines = 0             # lines in the file's last record, once counted
+        self.ends_with_newline = False  # whether the file's last line has a newline, once counted
+        self.pages = OrderedDict()      # page number -> list of addresses
+        self.added = []                 # records added after the file's records
+        self.deleted = set()            # numbers of deleted records
+        self.edited = {}                # record -> its address, for edited records
+        self.journaling = False         # whether changes are written to the journal
+        self.journal = None             # the journal file, once there is one
+        self.journal_end = None         # length of the valid part of an existing journal
+        self.journal_length = 0         # number of changes in the journal
+
+    def open(self, filename, journal=True):
+        """
+        Use the address file filename, in either format. Only its saved
+        index (if it is up to date) or its header is read now; records are
+        indexed and read as needed. If journal is True, the changes in the
+        file's journal are replayed and new changes are journaled. Raises
+        OSError if the file cannot be opened.
+        """
+        new_file = open(filename, "rb")
+        new_columns = None
+        try:
+            if ColumnFile.is_binary(new_file):
+                new_columns = ColumnFile(new_file)
+        except OSError:
+            new_file.close()
+            raise
+        self.close()
+        self.filename = filename
+        self.file = new_file
+        self.columns = new_columns
+        self.offsets = array.array('q')
+        self.indexed = new_columns is not None
+        self.end_offset = 0
+        self.counted = None
+        self.last_lines = 0
+        self.ends_with_newline = False
+        self.pages = OrderedDict()
+        self.added = []
+        self.deleted = set()
+        self.edited = {}
+        if new_columns is None:
+            self.load_index()
+        self.journaling = journal
+        if journal:
+            self.replay_journal()
+
+    def close(self):
+        """Stop using the current file"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.journaling = False
+        self.journal_end = None
+        self.journal_length = 0
+        if self.columns is not None:
+            self.columns.close()
+            self.columns = None
+            self.file = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def load_index(self):
+        """Read the saved index of the current file, if it matches the file"""
+        try:
+            info = os.stat(self.filename)
+            with open(self.filename + self.INDEX_SUFFIX, "rb") as index_file:
+                header = index_file.read(self.INDEX_HEADER.size)
+                magic, size, mtime, records = self.INDEX_HEADER.unpack(header)
+                if (magic != self.INDEX_MAGIC or size != info.st_size
+                        or mtime != info.st_mtime_ns):
+                    return
+                offsets = array.array('q')
+                offsets.fromfile(index_file, records)
+        except (OSError, struct.error, EOFError):
+            return
+        self.offsets = offsets
+        self.indexed = True
+        self.end_offset = info.st_size
+
+    def save_index(self):
+        """Write the index of the current file next to it, to make opening it again instant"""
+        try:
+            info = os.stat(self.filename)
+            with open(self.filename + self.INDEX_SUFFIX, "wb") as index_file:
+                index_file.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, info.st_size,
+                                                        info.st_mtime_ns, len(self.offsets)))
+                self.offsets.tofile(index_file)
+        except OSError:
+            pass # the index is only a shortcut
+
+    def file_stamp(self):
+        """Return what identifies this version of the current file: its size and modification time"""
+        info = os.stat(self.filename)
+        return [info.st_size, info.st_mtime_ns]
+
+    def replay_journal(self):
+        """
+        Apply the changes in the journal of the current file, if the
+        journal was started for this version of the file. A change that
+        was only partly written when the program stopped is ignored.
+        """
+        try:
+            with open(self.filename + self.JOURNAL_SUFFIX, "rb") as journal:
+                lines = journal.read().split(b"\n")
+            if json.loads(lines[0]) != self.file_stamp():
+                return
+        except (OSError, ValueError):
+            return
+        end = len(lines[0]) + 1
+        for line in lines[1:-1]: # the last piece has no newline, so it is incomplete
+            try:
+                self.apply(json.loads(line))
+            except (ValueError, TypeError, IndexError, KeyError):
+                break
+            end += len(line) + 1
+            self.journal_length += 1
+        self.journal_end = end
+
+    def log(self, change):
+        """Append change to the journal and flush it to disk"""
+        if not self.journaling:
+            return
+        if self.journal is None:
+            self.open_journal()
+        self.journal.write(json.dumps(change).encode("utf-8") + b"\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.journal_length += 1
+
+    def open_journal(self):
+        """Open the journal for appending, starting a new one unless the current one is valid"""
+        journal_filename = self.filename + self.JOURNAL_SUFFIX
+        if self.journal_end is not None:
+            self.journal = open(journal_filename, "r+b")
+            self.journal.truncate(self.journal_end)
+            self.journal.seek(self.journal_end)
+        else:
+            self.journal = open(journal_filename, "wb")
+            self.journal.write(json.dumps(self.file_stamp()).encode("utf-8") + b"\n")
+
+    def apply(self, change):
+        """Make a change read from the journal"""
+        if change[0] == "add":
+            self.added.append(Address(change[1]))
+        elif change[0] == "delete":
+            self.deleted.add(change[1])
+            self.edited.pop(change[1], None)
+        elif change[0] == "edit":
+            self.edited[change[1]] = Address(change[2])
+        else:
+            raise ValueError("unknown change %r" % change[0])
+
+    def needs_checkpoint(self):
+        """Check if the journal is long enough that the file should be saved again"""
+        return self.journal_length >= self.CHECKPOINT_CHANGES
+
+    def index_until(self, record):
+        """Index the file until record is indexed or the file ends"""
+        if self.indexed or record < len(self.offsets):
+            return
+        self.file.seek(self.end_offset)
+        while record >= len(self.offsets):
+            start = self.file.tell()
+            line_count = 0
+            for i in range(self.LINES_PER_RECORD):
+                if self.file.readline():
+                    line_count += 1
+            if line_count == 0:
+                self.indexed = True
+                self.save_index()
+                break
+            self.offsets.append(start)
+        self.end_offset = self.file.tell()
+
+    def file_records(self):
+        """Return the number of records in the file (indexing all of it)"""
+        if self.columns is not None:
+            return self.columns.count
+        self.index_until(float("inf"))
+        return len(self.offsets)
+
+    def count_file_records(self):
+        """
+        Return the number of records in the file without indexing it: the
+        lines after the indexed part are only counted, five to a record as
+        index_until groups them. The count is kept, since the file does not
+        change while it is open.
+        """
+        if self.columns is not None:
+            return self.columns.count
+        if self.indexed:
+            return len(self.offsets)
+        if self.counted is None:
+            self.file.seek(self.end_offset)
+            lines = 0
+            last = b"\n"
+            while True:
+                data = self.file.read(self.CHUNK_SIZE)
+                if not data:
+                    break
+                lines += data.count(b"\n")
+                last = data[-1:]
+            self.ends_with_newline = last == b"\n"
+            if not self.ends_with_newline:
+                lines += 1 # the last line has no newline
+            self.counted = len(self.offsets) + -(-lines // self.LINES_PER_RECORD)
+            self.last_lines = (lines - 1) % self.LINES_PER_RECORD + 1
+        return self.counted
+
+    def is_far(self, record):
+        """
+        Check if record is more than a page past the indexed part of a text
+        file, so that it should be found without indexing up to it
+        """
+        return not self.indexed and record >= len(self.offsets) + self.PAGE_SIZE
+
+    def is_tail_page(self, page_number):
+        """Check if page page_number is one of the last two pages of a text file that is not indexed yet"""
+        if self.indexed:
+            return False
+        last_page = (self.count_file_records() - 1) // self.PAGE_SIZE
+        return page_number >= last_page - 1
+
+    def tail_offset(self, record):
+        """
+        Return where record starts in the file, looking back from the end
+        of the file for it, which is quick for records near the end
+        """
+        if record < len(self.offsets):
+            return self.offsets[record]
+        # the newlines from the end of the file back to the one before record
+        lines = (self.counted - 1 - record) * self.LINES_PER_RECORD + self.last_lines
+        newlines = lines + (1 if self.ends_with_newline else 0)
+        end = self.file.seek(0, os.SEEK_END)
+        while end > self.end_offset:
+            start = max(self.end_offset, end - self.CHUNK_SIZE)
+            self.file.seek(start)
+            data = self.file.read(end - start)
+            count = data.count(b"\n")
+            if count >= newlines:
+                position = len(data)
+                for i in range(newlines):
+                    position = data.rfind(b"\n", 0, position)
+                return start + position + 1
+            newlines -= count
+            end = start
+        return self.end_offset
+
+    def total(self):
+        """Return the number of record numbers in use, including deleted ones (counting, not indexing, the file)"""
+        return self.count_file_records() + len(self.added)
+
+    def known_total(self):
+        """Return the number of record numbers known so far, without indexing any more of the file"""
+        if self.columns is not None:
+            return self.columns.count + len(self.added)
+        if self.indexed:
+            return len(self.offsets) + len(self.added)
+        return len(self.offsets)
+
+    def __len__(self):
+        """Return the number of records that are not deleted"""
+        return self.total() - len(self.deleted)
+
+    def exists(self, record):
+        """Check if record is a record number that has not been deleted"""
+        if record is None or record < 0 or record in self.deleted:
+            return False
+        if self.columns is not None:
+            return record < self.columns.count + len(self.added)
+        if not self.is_far(record):
+            self.index_until(record)
+        if record < len(self.offsets):
+            return True
+        return record < self.count_file_records() + len(self.added)
+
+    def get(self, record):
+        """Return the address of record"""
+        if record in self.edited:
+            return self.edited[record]
+        if self.columns is not None:
+            if record >= self.columns.count:
+                return self.added[record - self.columns.count]
+            page_size = self.columns.page_size
+        else:
+            if self.is_far(record):
+                file_records = self.count_file_records()
+            else:
+                self.index_until(record)
+                file_records = len(self.offsets) if self.indexed else None
+            if file_records is not None and record >= file_records:
+                return self.added[record - file_records]
+            page_size = self.PAGE_SIZE
+        page_number = record // page_size
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.read_page(page_number)
+        else:
+            self.pages.move_to_end(page_number)
+        return page[record % page_size]
+
+    def read_page(self, page_number):
+        """Read a page of records from the file and keep it in memory"""
+        if self.columns is not None:
+            page = self.columns.read_page(page_number)
+        else:
+            first = page_number * self.PAGE_SIZE
+            if self.is_far(first) and self.is_tail_page(page_number):
+                # read from the end of the file, so Last and added records need no indexing
+                count = min(self.PAGE_SIZE, self.counted - first)
+                self.file.seek(self.tail_offset(first))
+            else:
+                self.index_until(first + self.PAGE_SIZE - 1)
+                count = min(self.PAGE_SIZE, len(self.offsets) - first)
+                self.file.seek(self.offsets[first])
+            page = []
+            for i in range(count):
+                fields = []
+                for j in range(self.LINES_PER_RECORD):
+                    fields.append(self.file.readline().decode("utf-8").rstrip())
+                page.append(Address(fields))
+
+        self.pages[page_number] = page
+        if len(self.pages) > self.MAX_PAGES:
+            self.pages.popitem(last = False)
+        return page
+
+    def add(self, address):
+        """
+        Add address after all the other records and return its record
+        number. The records in the file are counted rather than indexed
+        for this, so adding is quick even before the file is indexed.
+        """
+        self.added.append(address)
+        self.log(["add", fields_of(address)])
+        return self.count_file_records() + len(self.added) - 1
+
+    def update(self, record, address):
+        """Replace the address of record with address"""
+        self.edited[record] = address
+        self.log(["edit", record, fields_of(address)])
+
+    def delete(self, record):
+        """Delete record"""
+        self.deleted.add(record)
+        self.edited.pop(record, None)
+        self.log(["delete", record])
+
+    def first(self):
+        """Return the first record that is not deleted, or None"""
+        return self.next(-1)
+
+    def last(self):
+        """Return the last record that is not deleted, or None"""
+        return self.prev(self.total())
+
+    def next(self, record):
+        """Return the first record after record that is not deleted, or None"""
+        record += 1
+        while record in self.deleted:
+            record += 1
+        if self.exists(record):
+            return record
+        return None
+
+    def prev(self, record):
+        """Return the last record before record that is not deleted, or None"""
+        record -= 1
+        while record in self.deleted:
+            record -= 1
+        if record >= 0:
+            return record
+        return None
+
+    def items(self):
+        """Generator that yields (record, address) for every record that is not deleted"""
+        record = self.first()
+        while record is not None:
+            yield (record, self.get(record))
+            record = self.next(record)
+
+    def records(self):
+        """Generator that yields the address of every record that is not deleted"""
+        for record, address in self.items():
+            yield address
+
+    def copy(self):
+        """
+        Return a store with the same records that reads the file through
+        its own handle, so it can be used from another thread while this
+        one is still in use.
+        """
+        other = AddressStore()
+        if self.filename is not None:
+            other.open(self.filename, journal = False)
+            other.adopt_offsets(self.offsets, self.indexed, self.end_offset)
+        other.added = list(self.added)
+        other.deleted = set(self.deleted)
+        other.edited = dict(self.edited)
+        return other
+
+    def adopt_offsets(self, offsets, indexed, end_offset):
+        """Use offsets (for the same file) worked out by another store, if they cover more"""
+        if len(offsets) > len(self.offsets) or (indexed and not self.indexed):
+            self.offsets = array.array('q', offsets)
+            self.indexed = indexed
+            self.end_offset = end_offset
+
+    def is_open(self, filename):
+        """Check if filename is the current file"""
+        return (self.filename is not None
+                and os.path.abspath(filename) == os.path.abspath(self.filename))
+
+    def save(self, filename, progress=None, binary=None):
+        """
+        Write every record that is not deleted to filename, five lines per
+        address, or in the binary format if binary is True. If binary is
+        None, the format is chosen by binary_for. The records are written to a temporary file which then
+        replaces filename, so filename is never left half written. If
+        filename is the current file, this compacts it: it is opened
+        again, with the deleted records gone for good, and its journal is
+        started over. progress, if given,
+        is called with the number of records written every PROGRESS_STEP
+        records. Returns the number of records written. Raises OSError if
+        the file cannot be written, or ValueError if a record is too long
+        for the binary format; the temporary file is removed then.
+        """
+        temp_filename, count, offsets = self.write_temp(filename, progress, binary)
+        self.finish_save(filename, temp_filename, offsets)
+        return count
+
+    def binary_for(self, filename):
+        """
+        Check if filename should be saved in the binary format: if its name
+        ends with ColumnFile.SUFFIX, or if it is the current file and that
+        is binary
+        """
+        if filename.endswith(ColumnFile.SUFFIX):
+            return True
+        return self.is_open(filename) and self.columns is not None
+
+    def write_temp(self, filename, progress=None, binary=None):
+        """
+        First half of save: write the records to a temporary file next to
+        filename and flush it to disk. Returns the name of the temporary
+        file, the number of records written and, for a text file, the
+        offsets of the records in it (None for a binary file).
+        """
+        if binary is None:
+            binary = self.binary_for(filename)
+        temp_filename = filename + ".tmp"
+        try:
+            if binary:
+                with open(temp_filename, "wb") as out:
+                    count = ColumnFile.write(self.records(), out, self.PAGE_SIZE,
+                                             progress, self.PROGRESS_STEP)
+                    sync_file(out)
+                return (temp_filename, count, None)
+
+            offsets = array.array('q')
+            with open(temp_filename, "wb") as out:
+                for address in self.records():
+                    if len(offsets) > 0:
+                        out.write(b"\n")
+                    offsets.append(out.tell())
+                    out.write(address.string().encode("utf-8"))
+                    if progress is not None and len(offsets) % self.PROGRESS_STEP == 0:
+                        progress(len(offsets))
+                sync_file(out)
+        except BaseException:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+            raise
+        return (temp_filename, len(offsets), offsets)
+
+    def finish_save(self, filename, temp_filename, offsets):
+        """
+        Second half of save: replace filename with the temporary file,
+        opening it again if it is the current file. Changes made since the
+        first half are lost in that case. The replacement is on disk before
+        the journal is removed, so a crash never loses both.
+        """
+        compacting = self.is_open(filename)
+        if compacting:
+            self.close()
+        os.replace(temp_filename, filename)
+        sync_directory(filename)
+        if compacting:
+            # The old journal no longer matches the file, so it would be
+            # ignored anyway, even if removing it fails
+            try:
+                os.remove(filename + self.JOURNAL_SUFFIX)
+            except OSError:
+                pass
+            self.open(filename)
+        if compacting and offsets is not None:
+            self.offsets = offsets
+            self.indexed = True
+            self.end_offset = os.path.getsize(filename)
+            self.save_index()
+
+
+def fields_of(address):
+    """Return the list of the five fields of address"""
+    return [address.name, address.street, address.city, address.state, address.zip]
+
+
+def sync_file(out):
+    """Flush the open file out all the way to disk"""
+    out.flush()
+    os.fsync(out.fileno())
+
+
+def sync_directory(filename):
+    """
+    Flush the directory holding filename to disk, so that a file just
+    renamed to filename stays renamed after a crash. Not every system
+    can open a directory, and there it is left to the system.
+    """
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+
+
+def numbers_from(typecode, data):
+    """Return the array of little-endian numbers of type typecode in the bytes data"""
+    numbers = array.array(typecode)
+    numbers.frombytes(data)
+    if sys.byteorder != "little":
+        numbers.byteswap()
+    return numbers
+
+
+def little_endian(numbers):
+    """Return the bytes of the array numbers in little-endian order"""
+    if sys.byteorder != "little":
+        numbers = array.array(numbers.typecode, numbers)
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def split_strings(data, start, lengths):
+    """Return the list of strings in data from start on, whose UTF-8 byte lengths are lengths"""
+    strings = []
+    for length in lengths:
+        end = start + length
+        strings.append(data[start:end].decode("utf-8"))
+        start = end
+    return strings
+
+
+def convert(source, destination, binary, progress=None):
+    """
+    Convert the address file source (in either format) to destination,
+    in the binary format if binary is True, in the text format if it is
+    False, or as AddressStore.binary_for chooses if it is None. Returns the number of addresses converted.
+    """
+    store = AddressStore()
+    store.open(source)
+    try:
+        return store.save(destination, progress, binary)
+    finally:
+        store.close()
+
+
+def text_to_binary(text_filename, binary_filename):
+    """Convert a five-lines-per-address file to the binary format"""
+    return convert(text_filename, binary_filename, True)
+
+
+def binary_to_text(binary_filename, text_filename):
+    """Convert a binary address file to the five-lines-per-address format"""
+    return convert(binary_filename, text_filename, False)
+
+
+class AddressStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, "addresses.txt")
+        self.fields = [["Name %d" % i, "%d Main St" % i, "City %d" % (i % 7), "GA", "3%04d" % (i % 11)]
+                       for i in range(600)]
+        with open(self.filename, "w") as out:
+            out.write("\n".join("\n".join(fields) for fields in self.fields))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_store(self, filename):
+        store = AddressStore()
+        store.open(filename)
+        self.addCleanup(store.close)
+        return store
+
+    def test_journal_replay(self):
+        store = self.open_store(self.filename)
+        record = store.add(Address(["New Name", "1 New St", "Macon", "GA", "31201"]))
+        store.update(5, Address(["Edited", "5 Main St", "City 5", "GA", "30005"]))
+        store.delete(7)
+        store.close()
+        # a change cut short by a crash is ignored
+        with open(self.filename + AddressStore.JOURNAL_SUFFIX, "ab") as journal:
+            journal.write(b'["delete", 8')
+
+        store = self.open_store(self.filename)
+        self.assertEqual(record, 600)
+        self.assertEqual(fields_of(store.get(600)), ["New Name", "1 New St", "Macon", "GA", "31201"])
+        self.assertEqual(store.get(5).name, "Edited")
+        self.assertFalse(store.exists(7))
+        self.assertTrue(store.exists(8))
+        self.assertEqual(len(store), 600)
+
+        # a journal started for another version of the file is ignored
+        store.close()
+        with open(self.filename, "a") as out:
+            out.write("\nLast\n9 Elm St\nAthens\nGA\n30601")
+        store = self.open_store(self.filename)
+        self.assertEqual(len(store), 601)
+        self.assertTrue(store.exists(7))
+
+    def test_binary_round_trip(self):
+        binary_filename = os.path.join(self.temp_dir.name, "addresses" + ColumnFile.SUFFIX)
+        text_filename = os.path.join(self.temp_dir.name, "again.txt")
+        self.assertEqual(text_to_binary(self.filename, binary_filename), 600)
+        self.assertEqual(binary_to_text(binary_filename, text_filename), 600)
+        with open(self.filename, "rb") as original, open(text_filename, "rb") as again:
+            self.assertEqual(original.read(), again.read())
+
+        store = self.open_store(binary_filename)
+        self.assertIsNotNone(store.columns)
+        self.assertEqual([fields_of(address) for address in store.records()], self.fields)
+
+    def test_add_without_indexing(self):
+        store = self.open_store(self.filename)
+        store.get(0)
+        record = store.add(Address(["New Name", "1 New St", "Macon", "GA", "31201"]))
+        self.assertEqual(record, 600)
+        # the list is drawn from a few records before the added one, as after adding in the window
+        listed = []
+        row = store.next(record - 20)
+        while row is not None:
+            listed.append(fields_of(store.get(row)))
+            row = store.next(row)
+        self.assertEqual(listed[:-1], self.fields[-19:])
+        self.assertEqual(listed[-1], ["New Name", "1 New St", "Macon", "GA", "31201"])
+        self.assertEqual(store.last(), 600)
+        store.delete(600)
+        self.assertEqual(fields_of(store.get(store.last())), self.fields[-1])
+        self.assertEqual(len(store), 600)
+        self.assertFalse(store.indexed)
+
+    def test_failed_save_removes_temp_file(self):
+        store = self.open_store(self.filename)
+        store.update(3, Address(["x" * (ColumnFile.MAX_LENGTH + 1), "3 Main St", "City 3", "GA", "30003"]))
+        binary_filename = os.path.join(self.temp_dir.name, "addresses" + ColumnFile.SUFFIX)
+        with self.assertRaises(ValueError):
+            store.save(binary_filename)
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["addresses.txt", "addresses.txt.journal"])
+
+    def test_text_starting_like_binary(self):
+        with open(self.filename, "w") as out:
+            out.write("ABK1 Holdings" + "x" * 40 + "\n1 Main St\nAthens\nGA\n30601")
+        store = self.open_store(self.filename)
+        self.assertIsNone(store.columns)
+        self.assertEqual(store.get(0).street, "1 Main St")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Convert address files between the text and binary formats")
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    formats = parser.add_mutually_exclusive_group()
+    formats.add_argument("--binary", dest = "binary", action = "store_const", const = True,
+                         help = "write the binary format (default if destination ends with %s)"
+                         % ColumnFile.SUFFIX)
+    formats.add_argument("--text", dest = "binary", action = "store_const", const = False,
+                         help = "write the five-lines-per-address format")
+    args = parser.parse_args()
+
+    count = convert(args.source, args.destination, args.binary,
+                    lambda count: print("Converted %d addresses" % count))
+    print("Converted %d addresses: %d bytes -> %d bytes" % (count, os.path.getsize(args.source),
+                                                           os.path.getsize(args.destination)))
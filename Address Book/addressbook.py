@@ -5,10 +5,19 @@
 #       user can create, view, and edit a list of addresses, load a list from a file,
 #       or save the one they created. 
 
+import queue
+import threading
 import tkinter as tk
 
+from address_store import Address, AddressStore
+from address_search import AddressIndex
+
 class AddressBook:
 
+    POLL_MILLIS = 50 # how often messages from background work are checked
+    LIST_ROWS = 12   # records visible in the list panel
+    FRAME_MILLIS = 16 # the list is redrawn at most once a frame (about 60 a second)
+
     def __init__(self):
         """ Constructor for AddressBook class """
         # Create main window
@@ -85,6 +94,11 @@ class AddressBook:
                                         text = "Last", command = self.go_to_last)
         self.last_button.grid(row = 1, column = 6)
 
+        # Add update button, saving the entry fields into the address being displayed
+        self.update_button = tk.Button(self.button_frame, bg = 'green', 
+                                        text = "Update", command = self.update_entries)
+        self.update_button.grid(row = 1, column = 7)
+
 
         # Add file frame
         self.file_frame = tk.Frame(self.window)
@@ -113,146 +127,408 @@ class AddressBook:
                                         text = "Quit", command = self.quit)
         self.quit_button.grid(row = 1, column = 5)
 
+        # Add status label, showing how loading and saving are going
+        self.status = tk.StringVar()
+        self.status_label = tk.Label(self.file_frame, textvariable = self.status)
+        self.status_label.grid(row = 2, column = 1, columnspan = 5, sticky = "W")
+
         # Add a delete button
         self.delete_button = tk.Button(self.button_frame, 
                                         text = "Delete", command = self.delete)
         self.delete_button.grid(row = 1, column = 2)
 
+
+        # Add search frame
+        self.search_frame = tk.Frame(self.window)
+        self.search_frame.grid(row = 4)
+
+        # Add search label
+        self.search_label = tk.Label(self.search_frame, bg = 'white', text = "Search")
+        self.search_label.grid(row = 1, column = 1, sticky = "W")
+
+        # Add search field, searching again on every key press
+        self.query = tk.Entry(self.search_frame, bg = 'white', width = 40)
+        self.query.grid(row = 1, column = 2, sticky = 'W')
+        self.query.bind('<KeyRelease>', self.search)
+
+        # Add search results list, showing the address that is clicked
+        self.results = tk.Listbox(self.search_frame, width = 52, height = 6)
+        self.results.grid(row = 2, column = 1, columnspan = 2)
+        self.results.bind('<<ListboxSelect>>', self.show_result)
+
+
+        # Add list frame, showing the records around the one being displayed
+        self.list_frame = tk.Frame(self.window)
+        self.list_frame.grid(row = 5)
+
+        # Add record list. Only the visible records are ever put in it; the
+        # scrollbar is driven by hand to stand for the whole store.
+        self.record_list = tk.Listbox(self.list_frame, width = 52, height = self.LIST_ROWS,
+                                      exportselection = False)
+        self.record_list.grid(row = 1, column = 1)
+        self.record_list.bind('<<ListboxSelect>>', self.show_list_record)
+        self.record_list.bind('<MouseWheel>', self.wheel_list)
+        self.record_list.bind('<Button-4>', self.wheel_list)
+        self.record_list.bind('<Button-5>', self.wheel_list)
+
+        # Add scrollbar for the record list
+        self.list_scrollbar = tk.Scrollbar(self.list_frame, command = self.scroll_list)
+        self.list_scrollbar.grid(row = 1, column = 2, sticky = "NS")
+
         
-        # Initialize the address list and counter variable
-        self.address_list = []
-        self.count = 0
+        # Initialize the address store and the record being displayed
+        self.store = AddressStore()
+        self.current = None
+
+        # Initialize the record list: the record at its top, the records
+        # and lines it shows, and the pending redraw, if any
+        self.list_top = 0
+        self.list_records = []
+        self.list_lines = []
+        self.list_redraw = None
+
+        # Initialize the search indexes (built on the first search)
+        self.index = AddressIndex()
+        self.index_built = False
+        self.result_records = []
+
+        # Loading and saving run in background threads, which report back
+        # through this queue. Messages from replaced jobs are ignored.
+        self.messages = queue.Queue()
+        self.load_job = 0
+        self.save_job = 0
+        self.loading = False
+        self.window.after(self.POLL_MILLIS, self.poll_messages)
 
         # Start the GUI event loop
         self.window.mainloop()
 
 
     def add_entries(self):
-        """Creates an address object and adds it to the address list"""
+        """Creates an address object and adds it to the address store"""
         address = Address([self.name.get(), self.street.get(), self.city.get(), self.state.get(), self.zip.get()])
-        self.address_list.append(address)
-        self.count = len(self.address_list) - 1
+        self.current = self.store.add(address)
+        if self.index_built:
+            self.index.add(self.current, address)
+        self.follow_in_list(self.current)
+        self.checkpoint()
+
+    def update_entries(self):
+        """Replaces the address being displayed with the one in the entry fields"""
+        if self.current is not None:
+            address = Address([self.name.get(), self.street.get(), self.city.get(), self.state.get(), self.zip.get()])
+            self.store.update(self.current, address)
+            if self.index_built:
+                self.index.update(self.current, address)
+            self.schedule_list_redraw()
+            self.checkpoint()
         
     def delete(self):
         """Delete the address currently being displayed"""
-        if len(self.address_list) == 0:
+        if self.current is None:
             pass
-        elif len(self.address_list) == 1: # Empty address list
-            self.address_list.pop(self.count)
-            self.put_text(Address(['', '', '', '', '']))
-        elif self.count == len(self.address_list) - 1: # Last address
-            self.address_list.pop(self.count)
-            self.count -= 1
-            self.put_text(self.address_list[self.count])
         else:
-            self.address_list.pop(self.count)
-            self.put_text(self.address_list[self.count])
+            # Show the next address, or the previous one if it was the last
+            following = self.store.next(self.current)
+            if following is None:
+                following = self.store.prev(self.current)
+            self.store.delete(self.current)
+            self.current = following
+            if self.current is None: # Empty address store
+                self.put_text(Address(['', '', '', '', '']))
+            else:
+                self.put_text(self.store.get(self.current))
+            self.schedule_list_redraw()
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Every change is in the file's journal already; once the journal is
+        long, save the file again (in the background) to start a new one
+        """
+        if self.store.needs_checkpoint():
+            self.start_save(self.store.filename, "Checkpointing...")
         
     def go_to_first(self):
-        """Display the first address in the list"""
-        if(len(self.address_list) > 0):
-            self.count = 0
-            self.put_text(self.address_list[self.count])
+        """Display the first address in the store"""
+        self.go_to(self.store.first())
 
     def go_to_prev(self):
-        """Display the previous address in the list"""
-        if self.count > 0:
-            self.count -= 1
-            self.put_text(self.address_list[self.count])
+        """Display the previous address in the store"""
+        if self.current is not None:
+            self.go_to(self.store.prev(self.current))
 
     def go_to_next(self):
-        """Display the next address in the list"""
-        if self.count < len(self.address_list) - 1:
-            self.count += 1
-            self.put_text(self.address_list[self.count])
+        """Display the next address in the store"""
+        if self.current is not None:
+            self.go_to(self.store.next(self.current))
 
     def go_to_last(self):
-        """Display the last address in the list"""
-        if(len(self.address_list) > 0):
-            self.count = len(self.address_list) - 1
-            self.put_text(self.address_list[self.count])
+        """Display the last address in the store"""
+        self.go_to(self.store.last())
+
+    def go_to(self, record):
+        """Display the address of record, if there is one"""
+        if record is not None:
+            self.current = record
+            self.put_text(self.store.get(self.current))
+            self.follow_in_list(record)
+
+    def follow_in_list(self, record):
+        """Scroll the record list so that record is visible, and redraw it"""
+        if record not in self.list_records:
+            if record < self.list_top:
+                self.list_top = record
+            else:
+                self.list_top = max(0, record - self.LIST_ROWS + 1)
+        self.schedule_list_redraw()
+
+    def scroll_list(self, action, amount, unit = None):
+        """Move the record list as the scrollbar asks: to a fraction of the store, or by rows or pages"""
+        if action == "moveto":
+            total = self.store.known_total()
+            self.list_top = max(0, min(int(float(amount) * total), total - self.LIST_ROWS))
+        elif unit == "pages":
+            self.list_top = self.step_records(self.list_top, int(amount) * self.LIST_ROWS)
+        else:
+            self.list_top = self.step_records(self.list_top, int(amount))
+        self.schedule_list_redraw()
+
+    def wheel_list(self, event):
+        """Scroll the record list with the mouse wheel"""
+        if event.num == 4 or event.delta > 0:
+            self.scroll_list("scroll", -3, "units")
+        else:
+            self.scroll_list("scroll", 3, "units")
+        return "break"
+
+    def step_records(self, record, count):
+        """Return the record count records after record (or before, if count is negative), stopping at the ends"""
+        for i in range(abs(count)):
+            following = self.store.next(record) if count > 0 else self.store.prev(record)
+            if following is None:
+                break
+            record = following
+        return record
+
+    def schedule_list_redraw(self):
+        """Redraw the record list on the next frame, however many changes come before it"""
+        if self.list_redraw is None:
+            self.list_redraw = self.window.after(self.FRAME_MILLIS, self.redraw_list)
+
+    def redraw_list(self):
+        """Show the records from list_top on, changing only the lines that differ"""
+        self.list_redraw = None
+        records = []
+        record = self.store.next(self.list_top - 1)
+        while record is not None and len(records) < self.LIST_ROWS:
+            records.append(record)
+            record = self.store.next(record)
+        lines = [describe(self.store.get(record)) for record in records]
+
+        for i in range(len(lines)):
+            if i >= len(self.list_lines):
+                self.record_list.insert(tk.END, lines[i])
+            elif lines[i] != self.list_lines[i]:
+                self.record_list.delete(i)
+                self.record_list.insert(i, lines[i])
+        if len(self.list_lines) > len(lines):
+            self.record_list.delete(len(lines), tk.END)
+        self.list_records = records
+        self.list_lines = lines
+
+        self.record_list.selection_clear(0, tk.END)
+        if self.current in records:
+            self.record_list.selection_set(records.index(self.current))
+        total = self.store.known_total()
+        if total == 0:
+            self.list_scrollbar.set(0, 1)
+        else:
+            self.list_scrollbar.set(self.list_top / total, min(1, (self.list_top + self.LIST_ROWS) / total))
+
+    def show_list_record(self, event = None):
+        """Display the address selected in the record list"""
+        selection = self.record_list.curselection()
+        if len(selection) > 0:
+            self.go_to(self.list_records[selection[0]])
 
     def load_file(self):
-        """Load an address list from a file"""
+        """Load an address list from a file, in either the text or the binary format"""
         try:
-            # Open the file and reset the local address list
-            file_data = open(self.filename.get(), "r")
-            self.address_list = []
-
-            # Read every line from the file
-            line_list = []
-            for line in file_data:
-                line = line.rstrip()
-                line_list.append(line)
-
-            # Put the data into the appropriate locations
-            for i in range(0, len(line_list), 5):
-                name = line_list[i]
-                street = line_list[i + 1]
-                city = line_list[i + 2]
-                state = line_list[i + 3]
-                zipcode = line_list[i + 4]
-
-                address = Address([name, street, city, state, zipcode])
-                self.address_list.append(address)
-            file_data.close() 
-
-            # Display the first address
-            self.count = 0
-            self.go_to_first()
+            self.open_file(self.filename.get())
         except OSError:
             print("File cannot be opened. ")
+
+    def open_file(self, filename):
+        """
+        Open filename and display its first address right away, while the
+        rest of the file is indexed in the background
+        """
+        # Only the saved index (if any) and the first page are read here
+        self.store.open(filename)
+        self.index_built = False
+        self.current = None
+        self.list_top = 0
+        self.go_to_first()
+        self.schedule_list_redraw()
+
+        self.load_job += 1
+        self.loading = True
+        self.status.set("Loading...")
+        worker = threading.Thread(target = self.load_worker,
+                                  args = (self.load_job, self.store.copy()), daemon = True)
+        worker.start()
+
+    def load_worker(self, job, store):
+        """Index all of store and build the search indexes (runs in a background thread)"""
+        try:
+            index = AddressIndex()
+            index.build(store, lambda count: self.messages.put(
+                ("load progress", job, "Loaded %d addresses" % count)))
+            self.messages.put(("loaded", job, (store.offsets, store.end_offset, index)))
+        except (OSError, ValueError) as error:
+            self.messages.put(("load failed", job, "File cannot be read: %s" % error))
+        finally:
+            store.close()
     
     def save_to_file(self):
-        """Save the local address list to a file"""
+        """Save the address store to a file"""
         try:
-            file_data = open(self.filename.get(), "w")
-
-            if(len(self.address_list) > 0):
-                file_data.write(self.address_list[0].string())
-                for i in range(1, len(self.address_list)):
-                    file_data.write('\n' + self.address_list[i].string())
+            if self.store.first() is not None:
+                self.start_save(self.filename.get(), "Saving...")
             else:
                 print("Address list is empty, nothing will be saved to file\n")
+        except OSError:
+            print("File cannot be opened. ")
 
-            file_data.close()
+    def start_save(self, filename, message):
+        """Write the address store to filename in a background thread"""
+        self.save_job += 1
+        self.set_editing(False)
+        self.status.set(message)
+        worker = threading.Thread(target = self.save_worker, daemon = True,
+                                  args = (self.save_job, self.store.copy(), filename))
+        worker.start()
+
+    def save_worker(self, job, store, filename):
+        """Write store to a temporary file for filename (runs in a background thread)"""
+        try:
+            temp_filename, count, offsets = store.write_temp(filename, lambda count: self.messages.put(
+                ("save progress", job, "Saved %d addresses" % count)))
+        except (OSError, ValueError) as error: # ValueError: a field too long for the binary format
+            self.messages.put(("save failed", job, "File cannot be saved: %s" % error))
+            return
+        finally:
+            store.close() # before the temporary file replaces the file it reads
+        self.messages.put(("saved", job, (filename, temp_filename, count, offsets)))
+
+    def set_editing(self, enabled):
+        """Enable or disable the buttons that change the addresses or the file"""
+        state = tk.NORMAL if enabled else tk.DISABLED
+        for button in [self.add_button, self.update_button, self.delete_button,
+                       self.loadfile_button, self.save_button]:
+            button.configure(state = state)
+
+    def poll_messages(self):
+        """Handle the messages from background loading and saving"""
+        while True:
+            try:
+                kind, job, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind.startswith("load") and job != self.load_job:
+                continue
+            if kind.startswith("save") and job != self.save_job:
+                continue
+
+            if kind in ["load progress", "save progress"]:
+                self.status.set(value)
+            elif kind == "loaded":
+                self.finish_loading(*value)
+            elif kind == "saved":
+                self.finish_saving(*value)
+            else: # load or save failed
+                print(value)
+                self.status.set(value)
+                self.loading = False
+                self.set_editing(True)
+        self.window.after(self.POLL_MILLIS, self.poll_messages)
+
+    def finish_loading(self, offsets, end_offset, index):
+        """Use the file index and search indexes built in the background"""
+        self.store.adopt_offsets(offsets, True, end_offset)
+        # Addresses added or edited while loading are not in the search indexes yet
+        file_records = self.store.file_records()
+        for i in range(len(self.store.added)):
+            if file_records + i not in index.keys:
+                index.add(file_records + i, self.store.added[i])
+        for record, address in self.store.edited.items():
+            index.update(record, address)
+        self.index = index
+        self.index_built = True
+        self.loading = False
+        self.status.set("Loaded %d addresses" % len(self.store))
+        self.schedule_list_redraw() # the scrollbar now knows how many records there are
+
+    def finish_saving(self, filename, temp_filename, count, offsets):
+        """Put the saved file in place, opening it again if it replaced the current file"""
+        try:
+            compacted = self.store.is_open(filename)
+            position = None
+            if compacted and self.current is not None:
+                # Where the address being displayed ends up once the deleted ones are gone
+                position = self.current - sum(1 for record in self.store.deleted if record < self.current)
+            self.store.finish_save(filename, temp_filename, offsets)
+            self.status.set("Saved %d addresses" % count)
+            if compacted:
+                # Deleted addresses are gone, so the records are renumbered
+                self.open_file(filename)
+                if self.store.exists(position):
+                    self.go_to(position)
         except OSError:
             print("File cannot be opened. ")
- 
+            self.status.set("File cannot be opened. ")
+        self.set_editing(True)
+
+    def search(self, event = None):
+        """List the addresses matching the search field"""
+        if not self.index_built:
+            if self.loading:
+                self.status.set("Search is available once loading finishes")
+                return
+            self.index.build(self.store)
+            self.index_built = True
+
+        self.result_records = self.index.search(self.query.get(), self.store)
+        self.results.delete(0, tk.END)
+        for record in self.result_records:
+            self.results.insert(tk.END, describe(self.store.get(record)))
+
+    def show_result(self, event = None):
+        """Display the address selected in the search results"""
+        selection = self.results.curselection()
+        if len(selection) > 0:
+            self.go_to(self.result_records[selection[0]])
+
     def quit(self):
         """DESTROY everything"""
         self.window.destroy()
     
     def put_text(self, address):
-        """Display address in the entry fields"""
-        self.name.delete(0, tk.END) # Delete current text
-        self.name.insert(0, address.name) # Insert new text
-        self.street.delete(0, tk.END)
-        self.street.insert(0, address.street)
-        self.city.delete(0, tk.END)
-        self.city.insert(0, address.city)
-        self.state.delete(0, tk.END)
-        self.state.insert(0, address.state)
-        self.zip.delete(0, tk.END)
-        self.zip.insert(0, address.zip)
+        """Display address in the entry fields, only changing the fields that differ"""
+        for entry, text in [(self.name, address.name), (self.street, address.street),
+                            (self.city, address.city), (self.state, address.state),
+                            (self.zip, address.zip)]:
+            if entry.get() != text:
+                entry.delete(0, tk.END) # Delete current text
+                entry.insert(0, text) # Insert new text
+
+
+def describe(address):
+    """Return address as one line for the lists"""
+    return "%s - %s, %s %s" % (address.name, address.city, address.state, address.zip)
         
         
-class Address:
-    
-    def __init__(self, address):
-        """Initialize the address object"""
-        self.name = address[0]
-        self.street = address[1]
-        self.city = address[2]
-        self.state = address[3]
-        self.zip = address[4]
-
-    def string(self):
-        """Format the address as a string"""
-        return "%s\n%s\n%s\n%s\n%s" % (self.name, self.street, self.city, self.state, self.zip)
-
-
-
 if __name__ == "__main__":
     # Create GUI
     AddressBook()
@@ -0,0 +1,205 @@
+# File: statement_bench.py
+# Description: Generates large statement files for statement_eval.py and
+#    measures how fast (lines/sec) and how much memory each way of
+#    interpreting them takes, checking that every engine prints exactly
+#    the same output line for line.
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import statement_eval
+
+# Ways a valid statement is broken to make an invalid one
+CORRUPTIONS = ["missing operand", "double operator", "bad name",
+               "undefined variable", "bad assignment", "two operands"]
+
+
+def generate_statements(filename, num_lines, invalid_ratio=0.2, reuse=0.8,
+                        comment_ratio=0.1, max_operands=6, arithmetic=False,
+                        seed=None):
+    """
+    Function that writes num_lines lines of statements to filename.
+    invalid_ratio is the fraction of statements that are invalid, reuse is
+    the chance that an assignment (or operand) uses an existing variable
+    rather than a new one, and comment_ratio is the fraction of lines that
+    are comments or blank, or carry a trailing comment. If arithmetic is
+    True, statements also use *, / and parentheses. The same seed always
+    gives the same file.
+    """
+    rng = random.Random(seed)
+    defined = []
+
+    def operand():
+        if len(defined) > 0 and rng.random() < reuse:
+            return rng.choice(defined)
+        return "%.2f" % rng.uniform(-1000, 1000)
+
+    def expression():
+        parts = [operand()]
+        for i in range(rng.randint(0, max_operands - 1)):
+            if arithmetic:
+                parts.append(rng.choice("+-*/"))
+            else:
+                parts.append(rng.choice("+-"))
+            parts.append(operand())
+        if arithmetic and len(parts) >= 3 and rng.random() < 0.3:
+            parts[0] = "(" + parts[0]
+            parts[2] = parts[2] + ")"
+        return " ".join(parts)
+
+    with open(filename, "w") as statement_file:
+        for i in range(num_lines):
+            if rng.random() < comment_ratio / 2:
+                statement_file.write(rng.choice(["", "# a comment line", "   "]) + "\n")
+                continue
+
+            if len(defined) > 0 and rng.random() < reuse:
+                name = rng.choice(defined)
+            else:
+                name = "v%d" % len(defined)
+            line = "%s = %s" % (name, expression())
+
+            if rng.random() < invalid_ratio:
+                line = corrupt(line, rng)
+            elif name not in defined:
+                defined.append(name)
+
+            if rng.random() < comment_ratio / 2:
+                line += "   # trailing comment"
+            statement_file.write(line + "\n")
+
+
+def corrupt(line, rng):
+    """ Function that returns line broken in one of the CORRUPTIONS ways """
+    kind = rng.choice(CORRUPTIONS)
+    if kind == "missing operand":
+        return line + " +"
+    elif kind == "double operator":
+        return line.replace(" = ", " = + ", 1)
+    elif kind == "bad name":
+        return "1" + line
+    elif kind == "undefined variable":
+        return line + " - undefinedName"
+    elif kind == "bad assignment":
+        return line.replace(" = ", " == ", 1)
+    else:
+        return line + " 42"
+
+
+def run_compiled(filename):
+    """ Engine that compiles the whole file with compile_program and then runs it """
+    with open(filename, "r") as statement_file:
+        program = statement_eval.compile_program(statement_eval.read_statements(statement_file))
+    for line_num, result in statement_eval.run_program(program, {}):
+        print("Line %d: %s" % (line_num, result))
+
+
+# The engines that are compared, the first one being the reference
+ENGINES = {
+    "serial": statement_eval.interpret_statements,
+    "compiled": run_compiled,
+    "parallel": statement_eval.interpret_statements_parallel,
+}
+
+
+def measure(engine, filename, track_memory=False):
+    """
+    Function that runs engine on filename, capturing what it prints.
+    Returns (output lines, seconds, peak bytes allocated). Memory is only
+    traced if track_memory is True, since tracing slows everything down.
+    """
+    output = io.StringIO()
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        engine(filename)
+    seconds = time.perf_counter() - start
+    peak = 0
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return (output.getvalue().splitlines(), seconds, peak)
+
+
+def benchmark(filename, engines=ENGINES, repeat=3, track_memory=True):
+    """
+    Function that times every engine on filename (best of repeat runs)
+    and prints lines/sec and peak memory for each. The output of every
+    engine is compared line for line with the first one. Returns True if
+    all of them match.
+    """
+    with open(filename, "r") as statement_file:
+        num_lines = sum(1 for line in statement_file)
+
+    all_match = True
+    reference = None
+    print("%-10s %14s %12s  %s" % ("engine", "lines/sec", "peak MiB", "output"))
+    for name, engine in engines.items():
+        best = None
+        for i in range(repeat):
+            lines, seconds, peak = measure(engine, filename)
+            if best is None or seconds < best:
+                best = seconds
+        if track_memory:
+            peak = measure(engine, filename, track_memory = True)[2]
+
+        if reference is None:
+            reference = lines
+            status = "reference"
+        else:
+            status = compare(reference, lines)
+            all_match = all_match and status == "matches"
+        if track_memory:
+            memory = "%.2f" % (peak / 2 ** 20)
+        else:
+            memory = "n/a"
+        print("%-10s %14.0f %12s  %s" % (name, num_lines / best, memory, status))
+    return all_match
+
+
+def compare(expected, actual):
+    """
+    Function that describes the first difference between two lists of
+    output lines, which must be exactly the same to match.
+    """
+    for i in range(min(len(expected), len(actual))):
+        if expected[i] != actual[i]:
+            return "differs at output line %d: %r != %r" % (i + 1, expected[i], actual[i])
+    if len(expected) != len(actual):
+        return "has %d output lines instead of %d" % (len(actual), len(expected))
+    return "matches"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generate and benchmark statement files")
+    parser.add_argument("--output", help = "keep the generated file here "
+                                           "(by default it is written to a temporary directory)")
+    parser.add_argument("--lines", type = int, default = 100000)
+    parser.add_argument("--invalid", type = float, default = 0.2,
+                        help = "fraction of invalid statements")
+    parser.add_argument("--reuse", type = float, default = 0.8,
+                        help = "chance of reusing an existing variable")
+    parser.add_argument("--comments", type = float, default = 0.1,
+                        help = "fraction of comment or blank lines and trailing comments")
+    parser.add_argument("--arithmetic", action = "store_true",
+                        help = "also use *, / and parentheses")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--no-memory", action = "store_true",
+                        help = "skip the (slow) memory measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = args.output or os.path.join(temp_dir, "generated_statements.txt")
+        generate_statements(filename, args.lines, args.invalid, args.reuse,
+                            args.comments, arithmetic = args.arithmetic, seed = args.seed)
+        all_match = benchmark(filename, repeat = args.repeat, track_memory = not args.no_memory)
+    if not all_match:
+        raise SystemExit(1)
@@ -7,64 +7,378 @@
 
 from pathlib import Path
 import re  # For regular expressions
+import heapq
+import math
+import os
+import contextlib
+import io
+import random
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np  # Only needed for batch evaluation
+except ImportError:
+    np = None
+
+# Token kinds produced by tokenize
+NUMBER = "number"
+NAME = "name"
+OPERATOR = "operator"
+BAD = "bad"
+END = "end"
+
+# Whitespace between tokens is optional, so "x = (a+b)*2" is fine.
+# Anything that is not part of a token is a BAD token of one character.
+NUMBER_PATTERN = r"(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+NAME_PATTERN = r"[a-zA-Z][a-zA-Z0-9]*"
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number> %s )
+      | (?P<name> %s )
+      | (?P<operator> [-+*/=()] )
+      | (?P<bad> \S )
+    )
+""" % (NUMBER_PATTERN, NAME_PATTERN), re.VERBOSE)
+
+NUMBER_TEXT_PATTERN = re.compile(NUMBER_PATTERN)
+
+# The same tokens as TOKEN_PATTERN, as plain strings.  This is what the
+# parser reads, since it is much quicker than building match objects.
+TOKEN_TEXT_PATTERN = re.compile(r"\s*(%s|%s|\S)" % (NUMBER_PATTERN, NAME_PATTERN))
+
+# A statement that is only a chain of + and - between space separated
+# operands, checked in a single scan.  These are by far the most common,
+# so they skip the parser and are added up directly.
+OPERAND = r"(?:[+-]?%s|%s)" % (NUMBER_PATTERN, NAME_PATTERN)
+STATEMENT_PATTERN = re.compile(
+    r"\s*%s\s+=\s+%s(?:\s+[-+]\s+%s)*\s*" % (NAME_PATTERN, OPERAND, OPERAND))
+
+# How tightly each operator binds.  A higher number binds tighter.
+BINARY_PRECEDENCE = {"+": 10, "-": 10, "*": 20, "/": 20}
+UNARY_PRECEDENCE = 30
+
+# How deep parse_expression may recurse (each parenthesis, unary minus
+# and operator takes one level), so that a statement like
+# "z = ((((...1" is rejected instead of overflowing the stack
+MAX_DEPTH = 200
+
+# Instructions of compiled code, besides the binary operators themselves
+PUSH = "push"      # push the number arg
+LOAD = "load"      # push the value of the variable named arg
+NEGATE = "negate"  # negate the top of the stack
+
+# Marks the end of the tokens given to the parser
+END_TOKEN = ""
 
 class BadStatement(Exception):
-    pass
+    """
+    Exception raised for an invalid statement. reason says what was wrong
+    and index is the position of the token where it was found. The 1-based
+    column of that token is only worked out if it is asked for, so that
+    rejecting a statement stays cheap.
+    """
+    def __init__(self, statement, index, reason):
+        self.statement = statement
+        self.index = index
+        self.reason = reason
 
-def interpret_statements(filename):
+    def __str__(self):
+        return "column %d: %s" % (self.column, self.reason)
+
+    @property
+    def column(self):
+        tokens = tokenize(self.statement)
+        if self.index < len(tokens):
+            return tokens[self.index][2]
+        return len(self.statement.rstrip()) + 1
+
+def interpret_statements(filename, show_errors=False, final_only=False):
     """
     Function that reads statements from the file whose
     name is filename, and prints the result of each statement,
     formatted exactly as described in the psa1 problem
-    statement.  
-    interpret_statements must use the interpret_one_statement function,
-    which appears next in this file.
+    statement.
+    Each statement is evaluated by evaluate_statement, which
+    interpret_one_statement uses as well.
+    If show_errors is True, invalid statements also report the column
+    and reason for the error. If final_only is True, only the final value
+    of each variable is printed, in order of name, and assignments that
+    are overwritten before being read are not evaluated at all.
 
     Algorithm:
     Step 1: Get the file name
     Step 2: Try to open the file (if unable print message)
-    Step 3: Create a dictionary to store variables and values
-    Step 4: Create a for loop to store the lines in a list
-    Step 5: Remove all comments from the file
-    Step 6: If line is not empty
-        Step A: Split statement into tokens
-        Step B: Call interpret_one_statement on the list of tokens
-        Step C: If it is a bad line, print an appropriate message
-        Step D: Print the result of the statement
-    Step 7: Close file and end the program
+    Step 3: Read the statements, skipping comments and empty lines
+    Step 4: For each statement (in interpret_lines)
+        Step A: Call evaluate_statement on the statement
+        Step B: If it is a bad line, print an appropriate message
+        Step C: Print the result of the statement
+    Step 5: Close file and end the program
     """
     try:
         statement_file = open(filename, 'r')
-        variables = {}
-        line_num = 0
-        for line in statement_file:
-            # remove comments
-            hashtag = line.find("#")
-            if hashtag >= 0:
-                line = line[0:hashtag]
-
-            # splitt the line into tokens
-            tokens = line.split()
-
-            # increment the line count
-            line_num += 1
-
-            # if the line is not empty try to evaluate the statement
-            if len(tokens) > 0:
-                print("Line %d:" % line_num, end = " ")
-                try:
-                    key = tokens[0] # the variable name
-                    variables[key] = interpret_one_statement(tokens, variables)
-                    print("%s = %.6f" % (key, variables[key]))
-                except BadStatement:
-                    print("Invalid statement")
-
+        if final_only:
+            program = compile_program(read_statements(statement_file),
+                                      final_only = True)
+            variables = {}
+            for line_num, result in run_program(program, variables):
+                pass
+            for key in sorted(variables):
+                print("%s = %.6f" % (key, variables[key]))
+        else:
+            for line_num, result in interpret_lines(read_statements(statement_file),
+                                                    show_errors):
+                print("Line %d: %s" % (line_num, result))
         statement_file.close()
     except OSError:
         print("Bad filename. Program ending. ")
 
 
+def read_statements(statement_file):
+    """
+    Generator that yields a (line number, statement) pair for every line
+    of statement_file that is not empty once its comment is removed.
+    """
+    line_num = 0
+    for line in statement_file:
+        line_num += 1
+        statement = strip_comment(line)
+        if len(statement) > 0 and not statement.isspace():
+            yield (line_num, statement)
+
+
+def interpret_lines(statements, show_errors=False):
+    """
+    Generator that interprets (line number, statement) pairs in order,
+    sharing one dictionary of variables, and yields a (line number, result)
+    pair for each one. The result is "var = value" or "Invalid statement".
+    """
+    variables = {}
+    for line_num, statement in statements:
+        try:
+            key, value = evaluate_statement(statement, variables)
+            variables[key] = value
+            yield (line_num, "%s = %.6f" % (key, value))
+        except BadStatement as error:
+            if show_errors:
+                yield (line_num, "Invalid statement (column %d: %s)"
+                                 % (error.column, error.reason))
+            else:
+                yield (line_num, "Invalid statement")
+
+
+def interpret_statements_parallel(filename, workers=None, show_errors=False):
+    """
+    Function that prints the same output as interpret_statements, but
+    evaluates independent parts of the file on a pool of worker processes.
+    Statements that never share a variable cannot affect each other, so
+    each group from partition_statements is evaluated on its own and the
+    results are merged back into line order.
+
+    Algorithm:
+    Step 1: Read all statements and partition them into groups
+    Step 2: Deal the groups out into one batch of work per task
+    Step 3: Interpret each batch in a worker process
+    Step 4: Merge the results of all batches by line number and print them
+    """
+    try:
+        with open(filename, 'r') as statement_file:
+            groups = partition_statements(read_statements(statement_file))
+    except OSError:
+        print("Bad filename. Program ending. ")
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(groups) <= 1:
+        results = [interpret_groups(groups, show_errors)]
+    else:
+        # largest groups first, each to the currently smallest batch
+        batches = [[] for i in range(min(workers * 4, len(groups)))]
+        sizes = [(0, i) for i in range(len(batches))]
+        for group in sorted(groups, key = len, reverse = True):
+            size, i = heapq.heappop(sizes)
+            batches[i].append(group)
+            heapq.heappush(sizes, (size + len(group), i))
+
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            results = list(pool.map(interpret_groups, batches,
+                                    [show_errors] * len(batches)))
+
+    for line_num, result in heapq.merge(*results):
+        print("Line %d: %s" % (line_num, result))
+
+
+def partition_statements(statements):
+    """
+    Function that splits (line number, statement) pairs into groups that
+    share no variables, using union-find over the names each statement
+    reads and writes. Each group keeps its statements in line order, and
+    the groups are returned in order of their first line.
+    """
+    parent = {}
+
+    def find(name):
+        root = parent.setdefault(name, name)
+        while root != parent[root]:
+            parent[root] = parent[parent[root]] # path halving
+            root = parent[root]
+        return root
+
+    statements = list(statements)
+    statement_names = []
+    for line_num, statement in statements:
+        names = [text for kind, text, column in tokenize(statement) if kind == NAME]
+        for name in names[1:]:
+            parent[find(name)] = find(names[0])
+        statement_names.append(names)
+
+    groups = {}
+    for (line_num, statement), names in zip(statements, statement_names):
+        # a statement without any names is a group on its own
+        key = find(names[0]) if len(names) > 0 else line_num
+        groups.setdefault(key, []).append((line_num, statement))
+    return list(groups.values())
+
+
+def interpret_groups(groups, show_errors=False):
+    """
+    Function that interprets each group of statements with its own
+    variables and returns all (line number, result) pairs in line order.
+    """
+    results = []
+    for group in groups:
+        results.extend(interpret_lines(group, show_errors))
+    results.sort()
+    return results
+
+
+def interpret_statements_batch(filename, inputs):
+    """
+    Function that evaluates the statements in the file whose name is
+    filename once for a whole sweep of scenarios. inputs is a dictionary
+    that maps variable names to sequences (or NumPy arrays) of values, one
+    value per scenario. Every operator in the program becomes a single
+    array operation, so the program is walked once no matter how many
+    scenarios there are.
+    Returns a dictionary that maps every assigned variable to a NumPy
+    array holding its final value in each scenario. Invalid statements
+    are skipped, just like interpret_statements does. A statement can be
+    invalid in some scenarios only (when it divides by zero there, or
+    reads a variable that is not defined there); it is then skipped in
+    those scenarios. A variable that is not defined in a scenario is nan
+    there.
+
+    Algorithm:
+    Step 1: Convert the inputs to float arrays
+    Step 2: For each statement, compile it and run it with the arrays as
+        the variables, finding the scenarios it fails in
+    Step 3: Assign the result where the statement did not fail, and
+        keep track of where each variable is still undefined
+    Step 4: Broadcast the results to the shape of the scenario sweep
+    Step 5: Return the variables, with nan where they are undefined
+    """
+    if np is None:
+        raise ImportError("interpret_statements_batch requires NumPy")
+
+    variables = {}
+    for name, values in inputs.items():
+        variables[name] = np.asarray(values, dtype=float)
+    shape = np.broadcast_shapes(*(v.shape for v in variables.values()))
+    undefined = {} # variable -> mask of the scenarios it is not defined in
+
+    with open(filename, 'r') as statement_file:
+        for line_num, statement in read_statements(statement_file):
+            try:
+                key, code = compile_statement(statement)
+                value, failed = run_code_batch(code, statement, variables, undefined)
+            except BadStatement:
+                continue
+            if failed is None or not failed.any():
+                variables[key] = value
+                undefined.pop(key, None)
+            elif not failed.all():
+                if key in variables:
+                    variables[key] = np.where(failed, variables[key], value)
+                    if key in undefined:
+                        undefined[key] = failed & undefined[key]
+                else:
+                    variables[key] = np.where(failed, np.nan, value)
+                    undefined[key] = failed
+
+    # statements built only from numbers evaluate to plain floats
+    for name, value in variables.items():
+        variables[name] = np.broadcast_to(value, shape).copy()
+        if name in undefined:
+            variables[name][np.broadcast_to(undefined[name], shape)] = np.nan
+    return variables
+
+def run_code_batch(code, statement, variables, undefined):
+    """
+    Function that runs code like run_code, but with arrays of values, one
+    per scenario, and finds the scenarios the statement is invalid in.
+    undefined maps variables to masks of the scenarios they are not
+    defined in. Returns (value, failed) where failed is the mask of the
+    scenarios that read an undefined variable or divide by zero, or None
+    if there are none. A statement that is invalid whatever the scenario
+    raises BadStatement, as with run_code.
+    """
+    stack = []
+    failed = None
+    for instruction, argument in code:
+        if instruction == LOAD:
+            if argument not in variables:
+                raise BadStatement(statement, index_of_name(statement, argument),
+                                   "undefined variable '%s'" % argument)
+            stack.append(variables[argument])
+            if argument in undefined:
+                failed = undefined[argument] if failed is None else failed | undefined[argument]
+        elif instruction == PUSH:
+            stack.append(argument)
+        elif instruction == NEGATE:
+            stack[-1] = -stack[-1]
+        else:
+            right = stack.pop()
+            if instruction == "+":
+                stack[-1] = stack[-1] + right
+            elif instruction == "-":
+                stack[-1] = stack[-1] - right
+            elif instruction == "*":
+                stack[-1] = stack[-1] * right
+            elif isinstance(right, np.ndarray):
+                zero = right == 0
+                failed = zero if failed is None else failed | zero
+                with np.errstate(divide = "ignore", invalid = "ignore"):
+                    stack[-1] = stack[-1] / right
+            elif right == 0:
+                # NumPy would give inf rather than raise
+                raise BadStatement(statement, argument, "division by zero")
+            else:
+                stack[-1] = stack[-1] / right
+    return (stack[0], failed)
+
+
+def strip_comment(line):
+    """ Function that removes the comment (if any) from line """
+    hashtag = line.find("#")
+    if hashtag >= 0:
+        line = line[0:hashtag]
+    return line
+
 
+def tokenize(line):
+    """
+    Function that splits line into tokens and classifies each of them in
+    a single scan. Returns a list of (kind, text, column) tuples where kind
+    is NUMBER, NAME, OPERATOR or BAD and column is 1-based. For example,
+    "x = y+2" gives [(NAME, "x", 1), (OPERATOR, "=", 3), (NAME, "y", 5),
+    (OPERATOR, "+", 6), (NUMBER, "2", 7)].
+    """
+    return [(match.lastgroup, match.group(match.lastgroup),
+             match.start(match.lastgroup) + 1)
+            for match in TOKEN_PATTERN.finditer(line)]
 
 
 def interpret_one_statement(tokens, variables):
@@ -73,90 +387,539 @@ def interpret_one_statement(tokens, variables):
     strings that are the tokens of the statement.  For example, if
     the statement is "xyz = salary + time - 150", then tokens would be
     ["xyz", "=", "salary", "+", "time", "-", "150"].
-    variables is a dictionary that maps previously assigned variables to 
+    variables is a dictionary that maps previously assigned variables to
     their values.
-    This function should return the value that is assigned.
+    This function should return the value that is assigned. If the
+    statement is invalid, BadStatement is raised.
+    """
+    return evaluate_statement(" ".join(tokens), variables)[1]
+
+def evaluate_statement(statement, variables):
+    """
+    Function that evaluates the statement string statement, for example
+    "xyz = (salary + time) * 2", using the values in variables.
+    Returns a (variable name, value) pair without assigning it. Raises
+    BadStatement if the statement is invalid.
 
     Algorithm:
-    Step 1: Check if the statement is valid
-    Step 2: Evaluate the statement
-    Step 3: Return the result
+    Step 1: If the statement is a plain chain of + and -, add it up
+    Step 2: Otherwise compile the statement
+    Step 3: Run the compiled code and return the result
     """
-    
-    if is_valid(tokens, variables):
+    if STATEMENT_PATTERN.fullmatch(statement) is not None:
+        tokens = statement.split()
         sum_of_values = 0
         # iterate over the entire statement by operator-operand pairs
-        for i in range(1, len(tokens) - 1, 2):
-            operand = tokens[i+1]
-            operator = tokens[i]
+        for i in range(2, len(tokens), 2):
+            operand = tokens[i]
 
-            # convert variable name to its value
+            # convert variable name to its value (which may be an array)
             if operand in variables:
                 operand = variables[operand]
-            
+            elif operand[0].isalpha():
+                break # undefined, let the compiled code report it
+            else:
+                operand = float(operand)
+
             # do the maths
-            if operator == "-":
-                sum_of_values -= float(operand)
-            elif operator in ['=', '+']:
-                sum_of_values += float(operand)
-        
-        return sum_of_values
+            if tokens[i - 1] == "-":
+                sum_of_values -= operand
+            else:
+                sum_of_values += operand
+        else:
+            return (tokens[0], sum_of_values)
+
+    name, code = compile_statement(statement)
+    return (name, run_code(code, statement, variables))
+
+def compile_statement(statement):
+    """
+    Function that parses the statement string statement with a Pratt
+    (precedence climbing) parser. Returns (name, code) where name is the
+    variable assigned and code is a tuple of (instruction, argument) pairs
+    in postfix order for run_code. Raises BadStatement for a syntax error.
+    For example, "x = -a * (b + 2)" compiles to the code
+    ((LOAD, "a"), (NEGATE, 2), (LOAD, "b"), (PUSH, 2.0), ("+", 7), ("*", 4)),
+    where the argument of an operator is the index of its token. As on the
+    fast path, a + written right before a number (as in "2 * +5") is the
+    sign of the number, but a + on its own is not an operand.
+    """
+    tokens = TOKEN_TEXT_PATTERN.findall(statement)
+    tokens.append(END_TOKEN)
+
+    # validate the variable name and the assignment operator
+    name = tokens[0]
+    if not name[:1].isalpha():
+        raise BadStatement(statement, 0, "invalid variable name")
+    if tokens[1] != "=":
+        raise BadStatement(statement, 1, "expected '='")
+
+    # indexes of the + tokens written right before a number
+    signs = ()
+    if "+" in statement:
+        matches = list(TOKEN_TEXT_PATTERN.finditer(statement))
+        signs = {i for i in range(len(matches) - 1)
+                 if matches[i].group(1) == "+" and matches[i + 1].start(1) == matches[i].end(1)
+                 and NUMBER_TEXT_PATTERN.fullmatch(matches[i + 1].group(1))}
+
+    code = []
+    position = parse_expression(statement, tokens, 2, 0, code, signs)
+
+    # anything left over means two operands in a row, a stray ")" etc.
+    if tokens[position] != END_TOKEN:
+        raise BadStatement(statement, position, "expected an operator")
+    return (name, tuple(code))
+
+def parse_expression(statement, tokens, position, min_precedence, code, signs=(), depth=0):
+    """
+    Function that parses the expression starting at tokens[position],
+    appending its code to code, and stops at the first binary operator
+    that does not bind tighter than min_precedence. Returns the position
+    of the first token after the expression. signs holds the indexes of
+    the + tokens that are the sign of the number after them, and depth
+    is how deep the parse already is.
+
+    Algorithm:
+    Step 1: Parse the prefix: a number, a signed number, a variable,
+        unary minus or (...)
+    Step 2: While the next token is an operator that binds tighter than
+        min_precedence, parse its right side and append the operator
+    """
+    start = position
+    token = tokens[start]
+    if depth > MAX_DEPTH:
+        raise BadStatement(statement, start, "nested too deeply")
+    if token == END_TOKEN:
+        raise BadStatement(statement, start, "missing operand")
+    elif token[0].isalpha():
+        code.append((LOAD, token))
+        position = start + 1
+    elif token[0].isdigit() or (token[0] == "." and len(token) > 1):
+        code.append((PUSH, float(token)))
+        position = start + 1
+    elif token == "+" and start in signs:
+        code.append((PUSH, float(tokens[start + 1])))
+        position = start + 2
+    elif token == "-":
+        position = parse_expression(statement, tokens, start + 1,
+                                    UNARY_PRECEDENCE, code, signs, depth + 1)
+        code.append((NEGATE, start))
+    elif token == "(":
+        position = parse_expression(statement, tokens, start + 1, 0, code, signs, depth + 1)
+        if tokens[position] != ")":
+            raise BadStatement(statement, position, "expected ')'")
+        position += 1
     else:
-        raise BadStatement
+        raise BadStatement(statement, start, "expected a number or variable")
+
+    while True:
+        token = tokens[position]
+        precedence = BINARY_PRECEDENCE.get(token)
+        if precedence is None or precedence <= min_precedence:
+            return position
+        operator = position
+        position = parse_expression(statement, tokens, operator + 1, precedence, code,
+                                    signs, depth + 1)
+        code.append((token, operator))
+
+def run_code(code, statement, variables):
+    """
+    Function that runs code compiled from statement on a stack and returns
+    the value it computes. An undefined variable raises BadStatement, as
+    does division by zero.
+    """
+    stack = []
+    for instruction, argument in code:
+        if instruction == LOAD:
+            if argument not in variables:
+                raise BadStatement(statement, index_of_name(statement, argument),
+                                   "undefined variable '%s'" % argument)
+            stack.append(variables[argument])
+        elif instruction == PUSH:
+            stack.append(argument)
+        elif instruction == NEGATE:
+            stack[-1] = -stack[-1]
+        else:
+            # never update in place: the operands may be variables' arrays
+            right = stack.pop()
+            if instruction == "+":
+                stack[-1] = stack[-1] + right
+            elif instruction == "-":
+                stack[-1] = stack[-1] - right
+            elif instruction == "*":
+                stack[-1] = stack[-1] * right
+            else:
+                try:
+                    stack[-1] = stack[-1] / right
+                except ZeroDivisionError:
+                    raise BadStatement(statement, argument, "division by zero")
+    return stack[0]
+
+def index_of_name(statement, name):
+    """ Function that returns the index of the first use of name on the right side of statement """
+    tokens = TOKEN_TEXT_PATTERN.findall(statement)
+    return tokens.index(name, 2)
+
+def compile_program(statements, final_only=False, defined=()):
+    """
+    Function that compiles (line number, statement) pairs once so they can
+    be run many times with run_program. Returns a list of
+    (line number, statement, name, code) entries, where the code has been
+    through fold_constants. A statement with a syntax error has name None
+    and its BadStatement in place of the code.
+    If final_only is True, only the final values of the variables matter,
+    so assignments that are always overwritten before being read are left
+    out (see eliminate_dead_stores). defined names the variables that will
+    already be set when the program is run.
+    """
+    program = []
+    for line_num, statement in statements:
+        try:
+            name, code = compile_statement(statement)
+            program.append((line_num, statement, name, fold_constants(code)))
+        except BadStatement as error:
+            program.append((line_num, statement, None, error))
+    if final_only:
+        program = eliminate_dead_stores(program, defined)
+    return program
+
+def run_program(program, variables, show_errors=False):
+    """
+    Generator that runs a program from compile_program, assigning to
+    variables, and yields (line number, result) pairs just like
+    interpret_lines.
+    """
+    for line_num, statement, name, code in program:
+        try:
+            if name is None:
+                raise code
+            variables[name] = run_code(code, statement, variables)
+            yield (line_num, "%s = %.6f" % (name, variables[name]))
+        except BadStatement as error:
+            if show_errors:
+                yield (line_num, "Invalid statement (column %d: %s)"
+                                 % (error.column, error.reason))
+            else:
+                yield (line_num, "Invalid statement")
+
+def fold_constants(code):
+    """
+    Function that returns code with its constant parts computed ahead of
+    time. An operator whose operands are both numbers is replaced by the
+    number it gives, so "x = 2 * 3.5 + y / (4 - 2)" runs as
+    "x = 7 + y / 2", and adding or subtracting a zero is left out, so
+    "t = -123.33 + s - 123 + 23 + 0 + -123" runs without the "+ 0".
+    Nothing is regrouped, so every operation is done in the same order as
+    before and the results are exactly the same: that is also why "+ 0"
+    is only left out when the value before it cannot be -0.0 (which
+    "+ 0" turns into 0.0). Division by a constant zero is left in, so
+    that it is still reported when the code runs.
+
+    Algorithm:
+    Step 1: Copy the instructions one at a time, keeping track for each
+        value on the stack of whether it could be -0.0
+    Step 2: If the copied instruction is a negation or an operator whose
+        operands were just pushed as numbers, replace them with the result
+    Step 3: If it adds or subtracts a zero that cannot change the value
+        before it, leave out both the zero and the operator
+    """
+    folded = []
+    may_be_negative_zero = [] # for each value on the stack
+    for instruction, argument in code:
+        if instruction == PUSH:
+            folded.append((instruction, argument))
+            may_be_negative_zero.append(is_negative_zero(argument))
+        elif instruction == LOAD:
+            folded.append((instruction, argument))
+            may_be_negative_zero.append(True)
+        elif instruction == NEGATE:
+            if folded[-1][0] == PUSH:
+                folded[-1] = (PUSH, -folded[-1][1])
+                may_be_negative_zero[-1] = is_negative_zero(folded[-1][1])
+            else:
+                folded.append((instruction, argument))
+                may_be_negative_zero[-1] = True
+        elif (len(folded) >= 2 and folded[-1][0] == PUSH and folded[-2][0] == PUSH
+                and (instruction != "/" or folded[-1][1] != 0)):
+            right = folded.pop()[1]
+            left = folded[-1][1]
+            if instruction == "+":
+                folded[-1] = (PUSH, left + right)
+            elif instruction == "-":
+                folded[-1] = (PUSH, left - right)
+            elif instruction == "*":
+                folded[-1] = (PUSH, left * right)
+            else:
+                folded[-1] = (PUSH, left / right)
+            may_be_negative_zero.pop()
+            may_be_negative_zero[-1] = is_negative_zero(folded[-1][1])
+        else:
+            right_zero = may_be_negative_zero.pop()
+            left_zero = may_be_negative_zero[-1]
+            right = folded[-1][1] if folded[-1][0] == PUSH else None
+            if instruction in ("+", "-") and right == 0:
+                # x + -0.0 and x - 0.0 are always x, x + 0.0 and x - -0.0 unless x is -0.0
+                if (instruction == "+") == is_negative_zero(right) or not left_zero:
+                    folded.pop()
+                    continue
+            folded.append((instruction, argument))
+            if instruction == "+":
+                # a sum is only -0.0 if both of its operands are
+                may_be_negative_zero[-1] = left_zero and right_zero
+            elif instruction == "-":
+                may_be_negative_zero[-1] = left_zero and (right is None or right == 0)
+            else:
+                may_be_negative_zero[-1] = True
+    return tuple(folded)
+
+def is_negative_zero(value):
+    """ Function that checks if the number value is -0.0 """
+    return value == 0 and math.copysign(1.0, value) < 0
+
+def eliminate_dead_stores(program, defined=()):
+    """
+    Function that removes the entries of a compiled program whose value
+    can never be seen in the final variables, because the same variable
+    is certainly assigned again before it is read. Statements with syntax
+    errors are removed too, since they assign nothing.
+    An assignment only counts as certain if it reads variables that are
+    certainly defined and does no division, because otherwise it might
+    fail and leave the earlier value in place.
+
+    Algorithm:
+    Step 1: Going forward, find which statements cannot fail
+    Step 2: Going backward, keep a statement only if its variable is not
+        certainly assigned again before being read
+    Step 3: Return the kept statements in their original order
+    """
+    certainly_defined = set(defined)
+    certain = []
+    for line_num, statement, name, code in program:
+        can_fail = (name is None
+                    or any(instruction == "/" for instruction, argument in code)
+                    or any(instruction == LOAD and argument not in certainly_defined
+                           for instruction, argument in code))
+        certain.append(not can_fail)
+        if not can_fail:
+            certainly_defined.add(name)
+
+    kept = []
+    overwritten = set()
+    for entry, is_certain in zip(reversed(program), reversed(certain)):
+        line_num, statement, name, code = entry
+        if name is None or name in overwritten:
+            continue
+        kept.append(entry)
+        if is_certain:
+            overwritten.add(name)
+        for instruction, argument in code:
+            if instruction == LOAD:
+                overwritten.discard(argument)
+    kept.reverse()
+    return kept
 
 def is_valid(tokens, variables):
     """
-    Function that checks if all of the tokens in the statement are valid. If 
-    there is an invalid token, it will return false which will raise the 
+    Function that checks if all of the tokens in the statement are valid. If
+    there is an invalid token, it will return false which will raise the
     BadStatement exception in the interpret_statements function.
+    """
+    return find_error(" ".join(tokens), variables) is None
 
-    Algorithm:
-    Step 1: Check if the variable is a valid variable name
-    Step 2: Check if the operands are either numbers or pre-defined variables
-    Step 3: Check if the operators are valid
-    Step 4: Check if the syntax is correct
+def find_error(statement, variables):
     """
+    Function that checks the statement string statement. Returns None if
+    it is valid, otherwise a (column, reason) pair describing the first
+    problem found. Division by zero is only found by evaluating.
+    """
+    try:
+        name, code = compile_statement(statement)
+    except BadStatement as error:
+        return (error.column, error.reason)
+    for instruction, argument in code:
+        if instruction == LOAD and argument not in variables:
+            error = BadStatement(statement, index_of_name(statement, argument),
+                                 "undefined variable '%s'" % argument)
+            return (error.column, error.reason)
+    return None
 
-    # validate the variable name
-    if not re.fullmatch(r"[a-zA-Z][a-zA-Z0-9]*", tokens[0]):
-        return False
 
-    # validate the statement length
-    if len(tokens) < 3:
-        return False
-    
-    # validate last token
-    if re.match(r"(\+|-)", tokens[-1]):
-        return False
+class StatementEvalTest(unittest.TestCase):
+    """ Checks the other engines against interpret_statements on the same lines """
 
-    # validate assignment operator
-    if tokens[1] != '=':
-        return False
+    LINES = ["x = 2 + 3 - 1",
+             "y = x * (x - 1) / 4",
+             "# only a comment",
+             "bad = x +",
+             "z = y / (x - 4)",
+             "w = -x * -2 + z",
+             "",
+             "p = 1.5 - q   # q is never defined",
+             "x = x + 1",
+             "k = 7",
+             "k = k * k - 3 # a group of its own"]
 
-    for i in range(2, len(tokens) - 1, 2):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
 
-        # validate the operand
-        operand = tokens[i]
-        try:
-            float(operand) # throws exception if operand is not number
-        except ValueError:
-            if operand not in variables:
-                return False
-        
-        # validate the operator
-        operator = tokens[i + 1]
-        if operator not in ['+', '-']:
-            return False
+    def write(self, lines):
+        """ Write lines to a statement file and return its name """
+        filename = os.path.join(self.temp_dir.name, "statements.txt")
+        with open(filename, "w") as statement_file:
+            statement_file.write("\n".join(lines) + "\n")
+        return filename
+
+    def output(self, engine, filename, **options):
+        """ Return the lines engine prints for filename """
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            engine(filename, **options)
+        return printed.getvalue().splitlines()
+
+    def serial(self, lines, variables):
+        """ Evaluate lines one by one with evaluate_statement, starting from variables """
+        variables = dict(variables)
+        for line_num, statement in read_statements(lines):
+            try:
+                key, value = evaluate_statement(statement, variables)
+                variables[key] = value
+            except BadStatement:
+                pass
+        return variables
+
+    @unittest.skipIf(np is None, "needs NumPy")
+    def test_batch_matches_serial(self):
+        lines = self.LINES + ["d = 10 / (a - 1)", "e = d + b", "e = b / a", "f = b / 0"]
+        inputs = {"a": [0.0, 1.0, 2.0, -3.5], "b": [4.0, 0.25, -1.0, 8.0]}
+        results = interpret_statements_batch(self.write(lines), inputs)
+        for i in range(4):
+            expected = self.serial(lines, {name: values[i] for name, values in inputs.items()})
+            for name, values in results.items():
+                if name in expected:
+                    self.assertEqual(values[i], expected[name], (name, i))
+                else:
+                    self.assertTrue(np.isnan(values[i]), (name, i))
+            self.assertLessEqual(set(expected), set(results))
+        # a division by zero is only skipped in the scenarios it happens in
+        self.assertTrue(np.isnan(results["d"][1]))
+        self.assertEqual(list(results["e"]), [-6.0, 0.25, -0.5, 8.0 / -3.5])
+        self.assertNotIn("f", results)
+
+    def test_partition(self):
+        groups = partition_statements(read_statements(self.LINES))
+        self.assertEqual([[line_num for line_num, statement in group] for group in groups],
+                         [[1, 2, 4, 5, 6, 9], [8], [10, 11]])
+
+    def test_parallel_matches_serial(self):
+        # m and n only join the group of k on the last line
+        lines = self.LINES + ["m = 3", "n = m - 1", "j = n * k"]
+        filename = self.write(lines)
+        for show_errors in [False, True]:
+            expected = self.output(interpret_statements, filename, show_errors = show_errors)
+            for workers in [1, 3]:
+                self.assertEqual(self.output(interpret_statements_parallel, filename,
+                                             workers = workers, show_errors = show_errors), expected)
 
-    return True
-        
-        
+    def test_precedence_and_signs(self):
+        variables = {"a": 2.0, "b": 5.0}
+        for statement, value in [("x = 1 + 2 * 3", 7.0), ("x = (1 + 2) * 3", 9.0),
+                                 ("x = 8 / 4 / 2", 1.0), ("x = 8 - 4 - 2", 2.0),
+                                 ("x = -a * -b", 10.0), ("x = - -a", 2.0), ("x = -(a + b) * 2", -14.0),
+                                 ("x = b - -a", 7.0), ("x = 2 * +5", 10.0), ("x = a*(b-+1.5e1)", -20.0),
+                                 ("x = +5", 5.0), ("x = a - +3", -1.0)]:
+            self.assertEqual(evaluate_statement(statement, variables), ("x", value), statement)
 
+    def test_bad_statements(self):
+        variables = {"a": 2.0}
+        for statement, column, reason in [("x = 1 +", 8, "missing operand"),
+                                          ("x = 2 * * 3", 9, "expected a number or variable"),
+                                          ("x = 2 * + 5", 9, "expected a number or variable"),
+                                          ("x = +a", 5, "expected a number or variable"),
+                                          ("1x = 2", 1, "invalid variable name"),
+                                          ("x 2", 3, "expected '='"),
+                                          ("x = (1 + 2", 11, "expected ')'"),
+                                          ("x = 1 + 2)", 10, "expected an operator"),
+                                          ("x = 3 $ 4", 7, "expected an operator"),
+                                          ("x = a + y", 9, "undefined variable 'y'"),
+                                          ("x = a / (a - 2)", 7, "division by zero")]:
+            with self.assertRaises(BadStatement, msg = statement) as caught:
+                evaluate_statement(statement, variables)
+            self.assertEqual((caught.exception.column, caught.exception.reason), (column, reason), statement)
+
+    def test_nesting_is_capped(self):
+        fine = "x = " + "(" * 60 + "-1" + ")" * 60
+        self.assertEqual(evaluate_statement(fine, {}), ("x", -1.0))
+        for statement in ["x = " + "(" * 5000 + "1" + ")" * 5000, "x = " + "-" * 5000 + "1",
+                          "x = 1" + " * (1" * 5000 + ")" * 5000]:
+            with self.assertRaises(BadStatement) as caught:
+                evaluate_statement(statement, {})
+            self.assertEqual(caught.exception.reason, "nested too deeply")
+
+    def random_expression(self, rng, depth=0):
+        """ Return a random expression over a, b and c, with plenty of zeros and signs """
+        if depth > 3 or rng.random() < 0.3:
+            return rng.choice(["a", "b", "c", "0", "0.0", "1", "2.5", "1e-300", "3"])
+        left = self.random_expression(rng, depth + 1)
+        right = self.random_expression(rng, depth + 1)
+        operator = rng.choice(["+", "-", "+", "-", "*", "/"])
+        expression = "%s %s %s" % (left, operator, right)
+        return rng.choice(["(%s)", "-(%s)", "%s"]) % expression
+
+    def test_folding_gives_the_same_results(self):
+        rng = random.Random(0)
+        values = [0.0, -0.0, 1.0, -2.5, 1e300, float("inf"), float("nan")]
+        def result(code, statement, variables):
+            try:
+                return repr(run_code(code, statement, variables))
+            except BadStatement as error:
+                return error.reason
+        for i in range(2000):
+            statement = "x = " + self.random_expression(rng)
+            code = compile_statement(statement)[1]
+            folded = fold_constants(code)
+            for j in range(5):
+                variables = {name: rng.choice(values) for name in "abc"}
+                self.assertEqual(result(folded, statement, variables),
+                                 result(code, statement, variables), (statement, variables))
+
+    def test_folding(self):
+        def folded(statement):
+            return [instruction for instruction, argument in fold_constants(compile_statement(statement)[1])]
+        self.assertEqual(folded("x = 2 * 3.5 + y / (4 - 2)"), [PUSH, LOAD, PUSH, "/", "+"])
+        self.assertEqual(folded("t = -123.33 + s - 123 + 23 + 0 + -123"),
+                         [PUSH, LOAD, "+", PUSH, "-", PUSH, "+", PUSH, "+"])
+        self.assertEqual(folded("x = s - 0 + -0"), [LOAD])
+        self.assertEqual(folded("x = s + 0"), [LOAD, PUSH, "+"]) # s could be -0.0
+        self.assertEqual(folded("x = 1 / (2 - 2)"), [PUSH, PUSH, "/"])
+
+    def test_final_only(self):
+        lines = self.LINES + ["x = 1 + 2", "y = 4 / 0", "p = k", "k = k * 2"]
+        statements = list(read_statements(lines))
+        everything = {}
+        for line_num, result in run_program(compile_program(statements), everything):
+            pass
+        final = {}
+        program = compile_program(statements, final_only = True)
+        for line_num, result in run_program(program, final):
+            pass
+        self.assertEqual(final, everything)
+        self.assertEqual([line_num for line_num, statement, name, code in program], [1, 2, 5, 6, 10, 11, 12, 13, 14, 15])
+        self.assertEqual(self.output(interpret_statements, self.write(lines), final_only = True),
+                         ["k = 92.000000", "p = 46.000000", "x = 3.000000", "y = 3.000000"])
+
+    def test_file_output(self):
+        filename = self.write(self.LINES)
+        self.assertEqual(self.output(interpret_statements, filename),
+                         ["Line 1: x = 4.000000", "Line 2: y = 3.000000", "Line 4: Invalid statement",
+                          "Line 5: Invalid statement", "Line 6: Invalid statement",
+                          "Line 8: Invalid statement", "Line 9: x = 5.000000",
+                          "Line 10: k = 7.000000", "Line 11: k = 46.000000"])
 
 
 if __name__ == "__main__":
     file_name = "statements.txt"  # you can create another file with statements
                                   # and change the name of this variable to that
                                   # filename.
-    
-    interpret_statements(file_name)
\ No newline at end of file
+
+    interpret_statements(file_name)
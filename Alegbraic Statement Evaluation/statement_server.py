@@ -0,0 +1,141 @@
+# File: statement_server.py
+# Description: A long-lived asyncio server around statement_eval.py.
+#    Each connection is a session with its own variables. The client
+#    sends one statement per line and gets back one line per statement,
+#    formatted like interpret_statements ("var = value" or
+#    "Invalid statement"), without paying for a new Python process.
+
+import argparse
+import asyncio
+import os
+import tempfile
+import unittest
+
+from statement_eval import BadStatement, evaluate_statement, strip_comment
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def answer(line, variables):
+    """
+    Function that evaluates one line sent by a client against the
+    session's variables and returns the reply (without a newline).
+    Empty lines and comments get an empty reply, so every line sent gets
+    exactly one line back. Anything that cannot be evaluated, even a
+    statement too deeply nested for the parser, is an invalid statement,
+    so that it never ends the session.
+    """
+    statement = strip_comment(line)
+    if len(statement) == 0 or statement.isspace():
+        return ""
+    try:
+        key, value = evaluate_statement(statement, variables)
+        variables[key] = value
+        return "%s = %.6f" % (key, value)
+    except (BadStatement, RecursionError):
+        return "Invalid statement"
+
+
+async def read_line(reader):
+    """
+    Coroutine that reads the next line sent by a client. Returns the line,
+    b"" once the client has stopped sending, or None for a line longer than
+    the reader's limit, in which case all of it has been read and dropped.
+    """
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            line = error.partial # the last line has no newline
+        except asyncio.LimitOverrunError as error:
+            # drop what has come of the line so far and look again
+            await reader.readexactly(error.consumed)
+            too_long = True
+            continue
+        if too_long:
+            return None
+        return line
+
+
+async def handle_session(reader, writer):
+    """
+    Coroutine that serves one client until it disconnects. Evaluating a
+    statement takes microseconds, so it is done right here on the event
+    loop; only reading and writing ever wait. A line that is too long is
+    answered as an invalid statement and the session goes on.
+    """
+    variables = {}
+    try:
+        while True:
+            line = await read_line(reader)
+            if line is None:
+                reply = "Invalid statement"
+            elif not line:
+                break
+            else:
+                reply = answer(line.decode(errors = "replace"), variables)
+            writer.write(reply.encode() + b"\n")
+            # only waits when the client is not keeping up
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+    """
+    Coroutine that runs the server until it is cancelled. If path is
+    given the server listens on that Unix socket instead of host and port.
+    """
+    if path is not None:
+        server = await asyncio.start_unix_server(handle_session, path = path)
+    else:
+        server = await asyncio.start_server(handle_session, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+class StatementServerTest(unittest.TestCase):
+    """ Tests a session on a server listening on a temporary Unix socket """
+
+    async def talk(self, lines):
+        """ Coroutine that sends lines in one session and returns the replies """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "statements.sock")
+            server = await asyncio.start_unix_server(handle_session, path = path)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b"".join(line + b"\n" for line in lines))
+                await writer.drain()
+                replies = []
+                for line in lines:
+                    replies.append((await reader.readline()).decode().rstrip("\n"))
+                writer.close()
+        return replies
+
+    def test_session(self):
+        replies = asyncio.run(self.talk([b"x = 2", b"# comment", b"y = x * +3", b"z = q + 1"]))
+        self.assertEqual(replies, ["x = 2.000000", "", "y = 6.000000", "Invalid statement"])
+
+    def test_bad_lines_keep_the_session(self):
+        deep = b"z = " + b"(" * 5000 + b"1" + b")" * 5000
+        long = b"w = " + b" + ".join([b"1"] * 40000)
+        replies = asyncio.run(self.talk([b"x = 2", deep, long, b"y = x + 1"]))
+        self.assertEqual(replies, ["x = 2.000000", "Invalid statement", "Invalid statement",
+                                   "y = 3.000000"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve statement evaluation sessions")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    parser.add_argument("--unix", metavar = "PATH", help = "listen on a Unix socket instead")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
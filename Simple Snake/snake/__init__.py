@@ -0,0 +1,10 @@
+"""
+Package: snake
+
+The snake game. snake.model is the game itself and does not import
+tkinter, so the modules that play without a window (snake.headless,
+snake.vector, snake.parallel, snake.replay, snake.autopilot,
+snake.server, snake.loadtest) load fast; only snake.view, snake.game and
+snake.client need tkinter. Run the game with python -m snake.game (or
+snake6.py).
+"""
@@ -0,0 +1,453 @@
+"""
+Module: snake.autopilot
+
+A player for SnakeModel that can keep up on large boards. It looks for
+the shortest path from the head to the food with a breadth-first search
+over the board, where a cell of the body counts as free from the step
+its segment moves away. The path is kept between steps: while the snake
+follows it and the food stays put, a step needs no search at all.
+
+On boards with a Hamiltonian cycle (a round trip through every cell;
+there is one unless both sides are odd) the body is kept in cycle order,
+from the tail round to the head. A step along the path is only taken if
+it keeps that order and does not go past the food along the cycle;
+otherwise the snake falls back on the cycle, taking the cell next to it
+that gets nearest the food along the cycle without passing its tail,
+and searches again a few steps later. As the order always holds, the
+snake can never run into itself and goes on until the board is full.
+
+Without a cycle (or after someone steered the body out of cycle order)
+a path is only taken if the snake could still reach its tail once it
+has eaten. If the snake leaves its path, the search only goes as far as
+the nearest cell of the rest of the path and joins it there. When there
+is no safe path the snake follows the cycle, if there is one, until its
+body is lined up with it again, or else follows its tail round until a
+safe path opens up.
+
+Every search stops after max_visits cells, so planning a step takes a
+bounded time however big the board is; the time taken is measured.
+"""
+import argparse
+import random
+import time
+import unittest
+from collections import deque
+
+from snake.model import SnakeModel
+
+DIRECTIONS = ["Up", "Down", "Left", "Right"]
+ROW_STEP = {"Up": -1, "Down": 1, "Left": 0, "Right": 0}
+COLUMN_STEP = {"Up": 0, "Down": 0, "Left": -1, "Right": 1}
+
+
+def hamiltonian_cycle(num_rows, num_cols):
+    """
+    Function that returns a list of the cells (row * num_cols + column)
+    of a num_rows x num_cols board in an order where each one is next to
+    the one before and the last is next to the first, or None if there is
+    no such order (when both sizes are odd, or the board is one cell
+    wide). Row 0 is crossed first, then the other rows back and forth
+    leaving out column 0, which is the way back.
+    """
+    if num_rows < 2 or num_cols < 2 or num_rows * num_cols % 2 == 1:
+        return None
+    if num_rows % 2 == 1:
+        # Go down the columns instead
+        order = hamiltonian_cycle(num_cols, num_rows)
+        return [(cell % num_rows) * num_cols + cell // num_rows for cell in order]
+    order = [column for column in range(num_cols)]
+    for row in range(1, num_rows):
+        columns = range(num_cols - 1, 0, -1) if row % 2 == 1 else range(1, num_cols)
+        order.extend(row * num_cols + column for column in columns)
+    order.extend(row * num_cols for row in range(num_rows - 1, 0, -1))
+    return order
+
+
+class Autopilot:
+    """
+    Policy (see snake.headless) that plays by searching for paths. One
+    Autopilot can play several games in turn; it starts afresh when it
+    is given a different model.
+    """
+
+    RETRY_STEPS = 8 # steps on the cycle before searching again, after a search found nothing safe
+
+    def __init__(self, max_visits=20000):
+        """ Create a player whose searches look at no more than max_visits cells each """
+        self.max_visits = max_visits
+        self.model = None
+        self.steps = 0
+        self.plans = 0            # full searches for the food
+        self.repairs = 0          # times the snake was led back onto its path
+        self.cycle_steps = 0      # steps taken on the Hamiltonian cycle (or just staying alive)
+        self.total_seconds = 0.0  # time spent choosing directions
+        self.worst_seconds = 0.0  # longest time choosing one direction
+
+    def start(self, model):
+        """ Get ready to play model """
+        self.model = model
+        self.num_cells = model.num_rows * model.num_cols
+        self.wraparound = model.wraparound
+        self.neighbours = [self.neighbours_of(cell) for cell in range(self.num_cells)]
+        order = hamiltonian_cycle(model.num_rows, model.num_cols)
+        self.cycle_next = None
+        self.cycle_index = None # where each cell is along the cycle
+        if order is not None:
+            self.cycle_next = [0] * self.num_cells
+            self.cycle_index = [0] * self.num_cells
+            for i in range(len(order)):
+                self.cycle_next[order[i - 1]] = order[i]
+                self.cycle_index[order[i]] = i
+        self.on_cycle = 0        # steps in a row taken along the cycle, lining the body up with it
+        self.cycle_mode = False  # whether the body lies in cycle order, so the snake stays on the cycle
+        self.expected_head = None
+        self.random = random.Random(0) # only for following the tail on boards without a cycle
+        self.free_at = [0] * self.num_cells # steps until a body cell is free, during a search
+        self.path = deque()                 # cells still to go through, up to the food
+        self.path_food = None
+        self.retry_at = 0
+
+    def neighbours_of(self, cell):
+        """ Return the (direction, cell) pairs the head can move to from cell """
+        row, column = divmod(cell, self.model.num_cols)
+        neighbours = []
+        for direction in DIRECTIONS:
+            new_row = row + ROW_STEP[direction]
+            new_column = column + COLUMN_STEP[direction]
+            if self.wraparound:
+                new_row %= self.model.num_rows
+                new_column %= self.model.num_cols
+            elif not (0 <= new_row < self.model.num_rows and 0 <= new_column < self.model.num_cols):
+                continue
+            neighbours.append((direction, new_row * self.model.num_cols + new_column))
+        return neighbours
+
+    def __call__(self, model):
+        """ Return the direction model's snake should go next, timing how long that takes """
+        start_time = time.perf_counter()
+        if model is not self.model or model.wraparound != self.wraparound:
+            self.start(model)
+        direction = self.choose(model)
+        seconds = time.perf_counter() - start_time
+        self.steps += 1
+        self.total_seconds += seconds
+        self.worst_seconds = max(self.worst_seconds, seconds)
+        return direction
+
+    def choose(self, model):
+        """ Return the direction to go, keeping to the cycle order while the body lies in it """
+        head = model.cell(model.snake_locations[0])
+        food = model.cell(model.food_location) if model.food_location is not None else None
+        if head != self.expected_head:
+            # A new game, or someone steered: the body may not be in cycle order
+            body = [model.cell(location) for location in model.snake_locations]
+            self.cycle_mode = self.cycle_next is not None and self.is_lined_up(body)
+            self.on_cycle = 0
+        if self.cycle_mode:
+            cell = self.cycle_cell(model, head, food)
+        else:
+            body = [model.cell(location) for location in model.snake_locations]
+            cell = self.next_cell(head, body, food)
+            if cell is None:
+                self.expected_head = None
+                return model.direction # nowhere to go
+        self.expected_head = cell
+        return self.direction_to(head, cell)
+
+    def cycle_cell(self, model, head, food):
+        """
+        Return the cell to go to while the body lies in cycle order: along
+        the path to the food while that keeps the order and does not go
+        past the food along the cycle, else a shortcut along the cycle
+        """
+        tail = model.cell(model.snake_locations[-1])
+        if food != self.path_food:
+            self.path.clear()
+        if len(self.path) == 0 and food is not None and self.steps >= self.retry_at:
+            self.plans += 1
+            path = self.search(head, {food}, [model.cell(location) for location in model.snake_locations])
+            if path is not None:
+                self.path = deque(path)
+                self.path_food = food
+        if (len(self.path) > 0 and self.keeps_order(head, tail, self.path[0])
+                and self.ahead(head, self.path[0]) <= self.ahead(head, food)):
+            return self.path.popleft()
+        if len(self.path) > 0 or self.steps >= self.retry_at:
+            self.path.clear()
+            self.retry_at = self.steps + self.RETRY_STEPS
+        return self.shortcut(head, tail, food)
+
+    def next_cell(self, head, body, food):
+        """ Return the cell to go to while the snake is not lined up with the cycle, or None """
+        if food is not None and food != self.path_food:
+            self.path.clear()
+        if len(self.path) > 0 and not self.follows(head, self.path[0]):
+            self.repair(head, body)
+        # Once lining up with the cycle, keep at it rather than searching again
+        if (len(self.path) == 0 and food is not None and self.on_cycle == 0
+                and self.steps >= self.retry_at):
+            self.plan(head, food, body)
+            if len(self.path) == 0:
+                self.retry_at = self.steps + self.RETRY_STEPS
+
+        if len(self.path) > 0:
+            cell = self.path.popleft()
+            if self.is_free(cell, body, food):
+                self.on_cycle = 0
+                return cell
+            self.path.clear()
+        return self.stay_alive(head, body, food)
+
+    def follows(self, head, cell):
+        """ Check if cell is next to head, so the path can go on from there """
+        return any(neighbour == cell for direction, neighbour in self.neighbours[head])
+
+    def direction_to(self, head, cell):
+        """ Return the direction from head to the cell next to it """
+        for direction, neighbour in self.neighbours[head]:
+            if neighbour == cell:
+                return direction
+        return None
+
+    def is_free(self, cell, body, food):
+        """ Check if the head can move onto cell now (the tail moves away unless the snake eats) """
+        if not self.model.occupied[cell]:
+            return True
+        return cell == body[-1] and food != body[0] and len(body) > 1
+
+    def search(self, start, targets, body):
+        """
+        Return the shortest list of cells from next to start to one of
+        targets (a set of cells), where a cell of body (head first) can be
+        used from the step its segment moves away, or None if there is no
+        such path within max_visits cells.
+        """
+        free_at = self.free_at
+        for i in range(len(body)):
+            free_at[body[i]] = len(body) - i
+        parent = {start: None}
+        frontier = [start]
+        distance = 0
+        found = None
+        while len(frontier) > 0 and found is None and len(parent) < self.max_visits:
+            distance += 1
+            next_frontier = []
+            for cell in frontier:
+                for direction, neighbour in self.neighbours[cell]:
+                    if neighbour in parent or free_at[neighbour] > distance:
+                        continue
+                    parent[neighbour] = cell
+                    if neighbour in targets:
+                        found = neighbour
+                        break
+                    next_frontier.append(neighbour)
+                if found is not None:
+                    break
+            frontier = next_frontier
+        for cell in body:
+            free_at[cell] = 0
+        if found is None:
+            return None
+        path = []
+        while found != start:
+            path.append(found)
+            found = parent[found]
+        path.reverse()
+        return path
+
+    def is_safe_path(self, path, body, grows=True):
+        """
+        Check if the snake could still reach its tail after following
+        path, eating at its end if grows
+        """
+        # The body after the path: the path's cells, then the old body
+        new_body = path[::-1] + body
+        del new_body[len(body) + grows:]
+        if len(new_body) >= self.num_cells:
+            return True # the board is full: the game is won
+        return self.search(new_body[0], {new_body[-1]}, new_body) is not None
+
+    def plan(self, head, food, body):
+        """ Search for a safe path from head to food and keep it """
+        self.plans += 1
+        path = self.search(head, {food}, body)
+        if path is not None and self.is_safe_path(path, body):
+            self.path = deque(path)
+            self.path_food = food
+
+    def repair(self, head, body):
+        """ Lead the snake back onto its path from wherever it is, or drop the path """
+        self.repairs += 1
+        rest = list(self.path)
+        joins = set(rest)
+        joins.discard(head)
+        path = self.search(head, joins, body)
+        if path is not None:
+            path.extend(rest[rest.index(path[-1]) + 1:])
+            if self.is_safe_path(path, body):
+                self.path = deque(path)
+                return
+        self.path.clear()
+
+    def shortcut(self, head, tail, food):
+        """
+        Return the cell to go to once the body lies in cycle order: the
+        free cell next to head that gets nearest the food along the cycle
+        without passing the tail
+        """
+        self.cycle_steps += 1
+        best = self.cycle_next[head]
+        if food is None:
+            return best
+        for direction, neighbour in self.neighbours[head]:
+            if (self.keeps_order(head, tail, neighbour)
+                    and self.ahead(neighbour, food) < self.ahead(best, food)):
+                best = neighbour
+        return best
+
+    def ahead(self, cell, other):
+        """ Return how many steps along the cycle other is from cell """
+        return (self.cycle_index[other] - self.cycle_index[cell]) % self.num_cells
+
+    def keeps_order(self, head, tail, cell):
+        """ Check if the head can move onto cell and the body still lie in cycle order """
+        room = self.ahead(head, tail) if tail != head else self.num_cells
+        return 0 < self.ahead(head, cell) < room and not self.model.occupied[cell]
+
+    def stay_alive(self, head, body, food):
+        """
+        Return the next cell along the Hamiltonian cycle if the tail can
+        still be reached from there, else the first such cell (following
+        the tail round), else the free cell with the most room behind it,
+        or None if there is no free cell
+        """
+        self.cycle_steps += 1
+        choices = [neighbour for direction, neighbour in self.neighbours[head]]
+        if self.cycle_next is not None:
+            choices.insert(0, self.cycle_next[head])
+        else:
+            # Following the tail the same way round could leave the food shut in for ever
+            self.random.shuffle(choices)
+        for cell in choices:
+            if self.is_free(cell, body, food) and self.is_safe_path([cell], body, grows = cell == food):
+                if self.cycle_next is not None and cell == self.cycle_next[head]:
+                    self.on_cycle += 1
+                    new_body = [cell] + body
+                    if cell != food:
+                        new_body.pop()
+                    self.cycle_mode = self.is_lined_up(new_body)
+                else:
+                    self.on_cycle = 0
+                return cell
+        self.on_cycle = 0
+        best = None
+        best_room = -1
+        for direction, neighbour in self.neighbours[head]:
+            if self.is_free(neighbour, body, food):
+                room = self.room(neighbour)
+                if room > best_room:
+                    best, best_room = neighbour, room
+        return best
+
+    def is_lined_up(self, body):
+        """ Check if body (head first) lies in cycle order, from the tail round to the head """
+        index = self.cycle_index
+        tail = index[body[-1]]
+        last = -1
+        for i in range(len(body) - 1, -1, -1):
+            ahead = (index[body[i]] - tail) % self.num_cells
+            if ahead <= last:
+                return False
+            last = ahead
+        return True
+
+    def room(self, start):
+        """ Return how many free cells can be reached from start (up to max_visits) """
+        seen = {start}
+        frontier = [start]
+        while len(frontier) > 0 and len(seen) < self.max_visits:
+            cell = frontier.pop()
+            for direction, neighbour in self.neighbours[cell]:
+                if neighbour not in seen and not self.model.occupied[neighbour]:
+                    seen.add(neighbour)
+                    frontier.append(neighbour)
+        return len(seen)
+
+    def report(self):
+        """ Return the planning figures as a line of text """
+        return ("%d steps, %d searches, %d repairs, %d cycle steps, mean %.3f ms, worst %.2f ms a step"
+                % (self.steps, self.plans, self.repairs, self.cycle_steps,
+                   self.total_seconds * 1000 / max(1, self.steps), self.worst_seconds * 1000))
+
+
+class AutopilotTest(unittest.TestCase):
+
+    def test_hamiltonian_cycle(self):
+        for num_rows, num_cols in [(2, 2), (4, 5), (5, 4), (6, 6), (3, 8)]:
+            order = hamiltonian_cycle(num_rows, num_cols)
+            self.assertEqual(sorted(order), list(range(num_rows * num_cols)))
+            for i in range(len(order)):
+                row, column = divmod(order[i - 1], num_cols)
+                next_row, next_column = divmod(order[i], num_cols)
+                self.assertEqual(abs(row - next_row) + abs(column - next_column), 1)
+        self.assertIsNone(hamiltonian_cycle(5, 5))
+        self.assertIsNone(hamiltonian_cycle(1, 6))
+
+    def test_goes_for_the_food(self):
+        model = SnakeModel(10, 10, random.Random(0))
+        model.set_state([(5, 5), (5, 4), (5, 3)], (2, 8))
+        autopilot = Autopilot()
+        for i in range(6):
+            model.direction = autopilot(model)
+            self.assertTrue(model.one_step())
+        self.assertEqual(model.points_scored, 1)
+        self.assertEqual(autopilot.plans, 1) # the path was kept, not searched for every step
+
+    def test_rejoins_its_path(self):
+        # On a board with no cycle, so the path is all there is to follow
+        model = SnakeModel(9, 9, random.Random(0))
+        model.set_state([(4, 4)], (4, 8))
+        autopilot = Autopilot()
+        model.direction = autopilot(model)
+        model.one_step()
+        model.direction = "Up" # steered off the path
+        model.one_step()
+        model.direction = autopilot(model)
+        self.assertEqual(autopilot.repairs, 1)
+        self.assertEqual(autopilot.plans, 1)
+
+    def test_fills_the_board(self):
+        model = SnakeModel(6, 6, random.Random(3))
+        autopilot = Autopilot()
+        for i in range(20000):
+            model.direction = autopilot(model)
+            self.assertTrue(model.one_step())
+            if model.food_location is None:
+                break
+        self.assertEqual(len(model.snake_locations), 36)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Let the autopilot play snake and time its planning")
+    parser.add_argument("--rows", type = int, default = 100)
+    parser.add_argument("--cols", type = int, default = 100)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--steps", type = int, default = 100000)
+    parser.add_argument("--max-visits", type = int, default = 20000)
+    parser.add_argument("--wraparound", action = "store_true")
+    args = parser.parse_args()
+
+    model = SnakeModel(args.rows, args.cols, random.Random(args.seed))
+    model.wraparound = args.wraparound
+    autopilot = Autopilot(args.max_visits)
+    end = "max steps"
+    for i in range(args.steps):
+        model.direction = autopilot(model)
+        if not model.one_step():
+            end = "died"
+            break
+        if model.food_location is None:
+            end = "won"
+            break
+    print("Score %d (%s)" % (model.points_scored, end))
+    print(autopilot.report())
@@ -0,0 +1,111 @@
+"""
+Module: snake.client
+
+Plays a match on a snake.server in a SnakeView. The arrow keys send the
+direction to the server, and the board is drawn from the events the
+server sends back, redrawing only the cells they change. The server
+runs the game, so of the view's buttons only Quit does anything here.
+"""
+import argparse
+import socket
+
+from snake.server import DEFAULT_HOST, DEFAULT_PORT, MatchMirror, decode_frames
+from snake.view import SnakeView
+
+
+class SnakeClient:
+    """ A thin controller between a connection to the server and a SnakeView """
+
+    POLL_MILLIS = 10 # how often the connection is checked for frames
+
+    def __init__(self, connection):
+        """ Join a match over connection (a connected socket) and show it until the window is closed """
+        self.connection = connection
+        self.buffer = b""
+        frames = []
+        while len(frames) == 0:
+            data = connection.recv(65536)
+            if not data:
+                raise ConnectionError("the server closed the connection")
+            frames, self.buffer = decode_frames(self.buffer + data)
+        kind, num_rows, num_cols, number = frames[0]
+        connection.setblocking(False)
+
+        self.mirror = MatchMirror(num_rows, num_cols, number)
+        self.view = SnakeView(num_rows, num_cols)
+        self.view.reset()
+        self.view.set_up_handler(lambda event: self.send(b"U"))
+        self.view.set_down_handler(lambda event: self.send(b"D"))
+        self.view.set_left_handler(lambda event: self.send(b"L"))
+        self.view.set_right_handler(lambda event: self.send(b"R"))
+        self.view.set_quit_handler(self.quit_handler)
+        self.apply(frames[1:])
+        self.view.schedule_next_step(self.POLL_MILLIS, self.poll)
+        self.view.window.mainloop()
+
+    def send(self, code):
+        """ Send a direction code to the server """
+        try:
+            self.connection.send(code)
+        except OSError:
+            pass
+
+    def poll(self):
+        """ Apply the frames that have come in, then check again a little later """
+        try:
+            while True:
+                data = self.connection.recv(65536)
+                if not data:
+                    self.view.show_game_over()
+                    return # the server has gone
+                frames, self.buffer = decode_frames(self.buffer + data)
+                self.apply(frames)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.view.show_game_over()
+            return
+        self.view.schedule_next_step(self.POLL_MILLIS, self.poll)
+
+    def apply(self, frames):
+        """ Apply change frames to the mirror and redraw the cells they changed """
+        mirror = self.mirror
+        for frame in frames:
+            if frame[0] != "D":
+                continue
+            mirror.tick = frame[1]
+            for cell in mirror.apply(frame[2]):
+                row, column = divmod(cell, mirror.num_cols)
+                if cell in mirror.food:
+                    self.view.make_food(row, column)
+                elif mirror.owner.get(cell) == mirror.number:
+                    self.view.make_alive(row, column)
+                elif cell in mirror.owner:
+                    self.view.fill_cell(row, column, 'green') # another player's snake
+                else:
+                    self.view.make_dead(row, column)
+        self.view.set_points(mirror.points.get(mirror.number, 0))
+        if mirror.number in mirror.snakes:
+            self.view.hide_game_over()
+        else:
+            self.view.show_game_over() # until the snake is put back
+
+    def quit_handler(self):
+        """ Leave the match and close the window """
+        self.connection.close()
+        self.view.window.destroy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Play a match on a snake server")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    parser.add_argument("--unix", metavar = "PATH", help = "connect to a Unix socket instead")
+    args = parser.parse_args()
+
+    if args.unix:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(args.unix)
+    else:
+        connection = socket.create_connection((args.host, args.port))
+    SnakeClient(connection)
@@ -0,0 +1,157 @@
+"""
+Module: snake.game
+
+The controller of the snake game: it connects the window (snake.view)
+to the model (snake.model), runs the steps on time and records the game.
+"""
+import random
+import time
+
+from snake.model import SnakeModel
+from snake.replay import Replay
+from snake.timing import StepTimer
+from snake.view import SnakeView
+
+
+class Snake:
+    """ This is the controller """
+    def __init__(self):
+        """ Initializes the snake game """
+        # Define parameters
+        self.NUM_ROWS = 30
+        self.NUM_COLS = 30
+        self.step_time_millis = 200
+        self.running = False
+        self.REPLAY_FILE = "snake" + Replay.SUFFIX
+        self.OVERLAY_SECONDS = 0.25 # how often the timing overlay is refreshed
+
+        # Keep steps on time and measure where the time goes
+        self.timer = StepTimer(self.step_time_millis / 1000)
+        self.model_seconds = 0.0
+        self.render_seconds = 0.0
+        self.overlay_time = 0.0
+
+        # Create model and view
+        self.view = SnakeView(self.NUM_ROWS, self.NUM_COLS)
+        self.new_game()
+
+        # Set up the event handlers
+        self.view.set_up_handler(self.up_handler)
+        self.view.set_down_handler(self.down_handler)
+        self.view.set_right_handler(self.right_handler)
+        self.view.set_left_handler(self.left_handler)
+        self.view.set_start_handler(self.start_handler)
+        self.view.set_pause_handler(self.pause_handler)
+        self.view.set_step_handler(self.step_handler)
+        self.view.set_reset_handler(self.reset_handler)
+        self.view.set_quit_handler(self.quit_handler)
+        self.view.set_step_speed_handler(self.step_speed_handler)
+        self.view.set_wraparound_handler(self.wraparound_handler)
+        self.view.set_save_replay_handler(self.save_replay_handler)
+
+        # Start the simulation
+        self.view.window.mainloop()
+    
+    def new_game(self):
+        """ Start a new game with a new seed, recording it in a new replay """
+        seed = random.randrange(2 ** 31)
+        self.model = SnakeModel(self.NUM_ROWS, self.NUM_COLS, random.Random(seed))
+        self.model.wraparound = self.view.wraparound.get()
+        self.replay = Replay(self.NUM_ROWS, self.NUM_COLS, seed, self.model.wraparound)
+        self.game_over = False
+        self.view.draw_model(self.model)
+        self.view.set_points(0)
+
+    def up_handler(self, event = None):
+        """ Set the direction to up """
+        self.model.direction = "Up"
+    
+    def down_handler(self, event = None):
+        """ Set the direction to down """
+        self.model.direction = "Down"
+    
+    def right_handler(self, event = None):
+        """ Set the direction to right """
+        self.model.direction = "Right"
+    
+    def left_handler(self, event = None):
+        """ Set the direction to left """
+        self.model.direction = "Left"
+
+    def start_handler(self):
+        """ Start simulation  """
+        if not self.running:
+            self.running = True
+            delay = self.timer.start()
+            self.view.schedule_next_step(round(delay * 1000), self.continue_simulation)
+    
+    def pause_handler(self):
+        """ Pause simulation """
+        if self.running:
+            self.running = False
+            self.view.cancel_next_step()
+
+    def continue_simulation(self):
+        """
+        Perform a step and schedule the next one, until the game is over.
+        The next step is due a step time after this one was due, however
+        long this one took.
+        """
+        if self.step_handler():
+            delay = self.timer.frame_done(self.model_seconds, self.render_seconds)
+            if time.perf_counter() - self.overlay_time >= self.OVERLAY_SECONDS:
+                self.overlay_time = time.perf_counter()
+                self.view.show_overlay(self.timer.overlay_text())
+            self.view.schedule_next_step(round(delay * 1000), self.continue_simulation)
+        else:
+            self.running = False
+        
+    def step_handler(self):
+        """ Perform one step of simulation, redrawing only the cells it changed """
+        if self.game_over:
+            return False
+        self.replay.record(self.model.direction)
+        start = time.perf_counter()
+        alive = self.model.one_step()
+        model_done = time.perf_counter()
+        self.replay.score = self.model.points_scored
+        self.view.update_cells(self.model)
+        self.view.set_points(self.model.points_scored)
+        self.model_seconds = model_done - start
+        self.render_seconds = time.perf_counter() - model_done
+        if not alive:
+            self.game_over = True
+            self.view.show_game_over()
+        return alive
+
+    def reset_handler(self):
+        """ Reset simulation """
+        self.pause_handler()
+        self.new_game()
+
+    def quit_handler(self):
+        """ Quit life program """
+        self.view.window.destroy()
+
+    def step_speed_handler(self, value):
+        """ Adjust simulation speed"""
+        self.step_time_millis = 1000 // int(value)
+        self.timer.set_period(self.step_time_millis / 1000)
+
+    def wraparound_handler(self):
+        """ Check to have wraparound feature """
+        if self.model.wraparound != self.view.wraparound.get():
+            self.model.wraparound = self.view.wraparound.get()
+            self.replay.toggle_wraparound()
+
+    def save_replay_handler(self):
+        """ Save the replay of the game so far (play it with python -m snake.replay) """
+        try:
+            self.replay.save(self.REPLAY_FILE)
+            print("Saved %d steps to %s" % (self.replay.steps, self.REPLAY_FILE))
+        except OSError:
+            print("Replay cannot be saved. ")
+
+
+if __name__ == "__main__":
+   snake_game = Snake()
@@ -0,0 +1,177 @@
+"""
+Module: snake.headless
+
+Runs the snake model without a window, as fast as it can, for trying out
+policies: functions that look at the model and choose the direction.
+A policy that keeps state between steps is given as its class instead,
+and every episode gets a new one. Every episode is seeded, so the same
+seed always plays the same game.
+This module must not import tkinter.
+"""
+import argparse
+import random
+import time
+import unittest
+
+from snake.model import SnakeModel
+from snake.autopilot import Autopilot
+
+DIRECTIONS = ["Up", "Down", "Left", "Right"]
+
+
+def straight_policy(model):
+    """ Policy that keeps going the way the snake is going """
+    return model.direction
+
+
+def random_policy(model):
+    """ Policy that picks a random direction that does not end the game, if there is one """
+    safe = [direction for direction in DIRECTIONS if model.is_safe(direction)]
+    if len(safe) == 0:
+        return model.direction
+    return model.random.choice(safe)
+
+
+def greedy_policy(model):
+    """ Policy that heads for the food, taking the first safe direction that gets closer """
+    head_row, head_column = model.snake_locations[0]
+    food_row, food_column = model.food_location
+    def distance(direction):
+        row, column = model.next_location(direction)
+        return abs(row - food_row) + abs(column - food_column)
+    for direction in sorted(DIRECTIONS, key = distance):
+        if model.is_safe(direction):
+            return direction
+    return model.direction
+
+
+POLICIES = {
+    "straight": straight_policy,
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "autopilot": Autopilot,
+}
+
+
+def run_episode(policy, num_rows=30, num_cols=30, seed=0, wraparound=False, max_steps=None):
+    """
+    Function that plays one game with policy choosing the direction
+    before every step. If policy is a class, the game is played by a new
+    instance of it. The game ends when the snake dies, fills the
+    board, reaches max_steps, or goes num_rows * num_cols steps without
+    eating (it is going round in circles). Returns a dict with the
+    score, the number of steps and how the game ended.
+    """
+    if isinstance(policy, type):
+        policy = policy()
+    model = SnakeModel(num_rows, num_cols, random.Random(seed))
+    model.wraparound = wraparound
+    model.direction = "Right"
+    starve_steps = num_rows * num_cols
+    steps = 0
+    since_food = 0
+    end = "max steps"
+    while max_steps is None or steps < max_steps:
+        model.direction = policy(model)
+        points = model.points_scored
+        if not model.one_step():
+            end = "died"
+            break
+        steps += 1
+        if model.points_scored > points:
+            since_food = 0
+        else:
+            since_food += 1
+        if model.food_location is None:
+            end = "won"
+            break
+        if since_food > starve_steps:
+            end = "starved"
+            break
+    return {"seed": seed, "score": model.points_scored, "steps": steps, "end": end}
+
+
+def run_batch(policy, episodes, seed=0, **options):
+    """
+    Function that plays episodes games, seeded seed, seed + 1, ... The
+    options are passed to run_episode. Returns (list of episode results,
+    summary statistics).
+    """
+    start = time.perf_counter()
+    results = [run_episode(policy, seed = seed + i, **options) for i in range(episodes)]
+    return (results, summarize(results, time.perf_counter() - start))
+
+
+def summarize(results, seconds):
+    """ Function that returns the statistics of a list of episode results played in seconds """
+    scores = [result["score"] for result in results]
+    total_steps = sum(result["steps"] for result in results)
+    ends = {}
+    for result in results:
+        ends[result["end"]] = ends.get(result["end"], 0) + 1
+    return {
+        "episodes": len(results),
+        "mean score": sum(scores) / max(1, len(scores)),
+        "max score": max(scores, default = 0),
+        "mean steps": total_steps / max(1, len(results)),
+        "steps/sec": total_steps / seconds if seconds > 0 else 0.0,
+        "points/sec": sum(scores) / seconds if seconds > 0 else 0.0,
+        "ends": ends,
+    }
+
+
+def report(summary):
+    """ Function that formats summary statistics, one per line """
+    lines = []
+    for name, value in summary.items():
+        if isinstance(value, float):
+            value = "%.2f" % value
+        lines.append("%-12s %s" % (name, value))
+    return "\n".join(lines)
+
+
+class HeadlessTest(unittest.TestCase):
+
+    def test_same_seed_same_game(self):
+        for name, policy in sorted(POLICIES.items()):
+            first = [run_episode(policy, 8, 8, seed, max_steps = 300) for seed in range(3)]
+            again = [run_episode(policy, 8, 8, seed, max_steps = 300) for seed in range(3)]
+            self.assertEqual(first, again, name)
+            self.assertEqual([result["seed"] for result in first], [0, 1, 2])
+
+    def test_each_episode_has_its_own_autopilot(self):
+        alone = run_episode(Autopilot, 8, 8, seed = 5)
+        run_batch(Autopilot, 3, seed = 0, num_rows = 8, num_cols = 8)
+        self.assertEqual(run_episode(Autopilot, 8, 8, seed = 5), alone)
+        self.assertEqual(alone["end"], "won")
+
+    def test_summarize(self):
+        results = [{"seed": 0, "score": 3, "steps": 10, "end": "died"},
+                   {"seed": 1, "score": 5, "steps": 30, "end": "starved"},
+                   {"seed": 2, "score": 1, "steps": 20, "end": "died"}]
+        summary = summarize(results, 2.0)
+        self.assertEqual(summary["episodes"], 3)
+        self.assertEqual(summary["mean score"], 3.0)
+        self.assertEqual(summary["max score"], 5)
+        self.assertEqual(summary["mean steps"], 20.0)
+        self.assertEqual(summary["steps/sec"], 30.0)
+        self.assertEqual(summary["points/sec"], 4.5)
+        self.assertEqual(summary["ends"], {"died": 2, "starved": 1})
+        self.assertEqual(summarize([], 0)["mean score"], 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Play snake without a window")
+    parser.add_argument("--policy", choices = sorted(POLICIES), default = "greedy")
+    parser.add_argument("--episodes", type = int, default = 100)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--max-steps", type = int, default = None)
+    parser.add_argument("--wraparound", action = "store_true")
+    args = parser.parse_args()
+
+    results, summary = run_batch(POLICIES[args.policy], args.episodes, args.seed,
+                                 num_rows = args.rows, num_cols = args.cols,
+                                 wraparound = args.wraparound, max_steps = args.max_steps)
+    print(report(summary))
@@ -0,0 +1,144 @@
+"""
+Module: snake.loadtest
+
+Load test for snake.server. Starts a server in a process of its own (or
+uses one already running), connects games * players bots to it, each
+turning at random now and then, and checks that every bot gets every
+tick, on time. Prints what the bots saw next to the server's own
+figures: tick time, worst tick and dropped ticks.
+
+The bots share a machine with the server, so on few cores they take
+some of its time: the server's figures are the ones to go by.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from snake.headless import report
+from snake.server import DEFAULT_HOST, DEFAULT_PORT, EVENT, HEADER, MatchMirror, decode_frames
+
+
+async def bot(connect, seconds, seed, stats):
+    """ Coroutine that plays as one player for seconds, adding what it saw to stats """
+    rng = random.Random(seed)
+    reader, writer = await connect()
+    stats["connected"] += 1
+    buffer = b""
+    mirror = None
+    last_tick = None
+    last_time = None
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    try:
+        while loop.time() < end:
+            try:
+                data = await asyncio.wait_for(reader.read(65536), end - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                stats["disconnected"] += 1
+                break
+            now = loop.time()
+            frames, buffer = decode_frames(buffer + data)
+            for frame in frames:
+                if frame[0] == "W":
+                    mirror = MatchMirror(frame[1], frame[2], frame[3])
+                    continue
+                tick, events = frame[1], frame[2]
+                mirror.apply(events)
+                stats["frames"] += 1
+                stats["bytes"] += HEADER.size + EVENT.size * len(events)
+                if last_tick is not None:
+                    stats["ticks missed"] += tick - last_tick - 1
+                    stats["worst gap"] = max(stats["worst gap"], now - last_time)
+                last_tick, last_time = tick, now
+            if rng.random() < 0.1:
+                writer.write(rng.choice([b"U", b"D", b"L", b"R"]))
+    finally:
+        writer.close()
+
+
+async def read_reports(stream, reports):
+    """ Coroutine that keeps the lines the server prints """
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        reports.append(line.decode().strip())
+
+
+async def run_load(games, players, seconds, tick_rate, num_rows, num_cols, path=None,
+                   host=DEFAULT_HOST, port=DEFAULT_PORT, start_server=True):
+    """
+    Coroutine that runs the load test and returns (stats of the bots,
+    last line the server printed). If start_server, a server is started
+    on the Unix socket path (a temporary one if None).
+    """
+    server = None
+    reports = []
+    temp_dir = None
+    if start_server:
+        if path is None:
+            temp_dir = tempfile.mkdtemp()
+            path = os.path.join(temp_dir, "snake.sock")
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "snake.server", "--unix", path, "--players", str(players),
+            "--tick-rate", str(tick_rate), "--rows", str(num_rows), "--cols", str(num_cols),
+            "--report", "1", cwd = package_dir, stdout = asyncio.subprocess.PIPE)
+        reading = asyncio.create_task(read_reports(server.stdout, reports))
+        for i in range(200):
+            if os.path.exists(path):
+                break
+            await asyncio.sleep(0.05)
+
+    if path is not None:
+        connect = lambda: asyncio.open_unix_connection(path)
+    else:
+        connect = lambda: asyncio.open_connection(host, port)
+    stats = {"bots": games * players, "connected": 0, "frames": 0, "bytes": 0,
+             "ticks missed": 0, "worst gap": 0.0, "disconnected": 0}
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[bot(connect, seconds, seed, stats) for seed in range(games * players)])
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            await server.wait()
+            await reading
+        if temp_dir is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            os.rmdir(temp_dir)
+    stats["frames/sec per bot"] = stats["frames"] / max(1, stats["connected"]) / elapsed
+    stats["target"] = float(tick_rate)
+    stats["worst gap"] = "%.1f ms" % (stats["worst gap"] * 1000)
+    return (stats, reports[-1] if len(reports) > 0 else "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Load test a snake server with bot players")
+    parser.add_argument("--games", type = int, default = 200)
+    parser.add_argument("--players", type = int, default = 2, help = "snakes per match")
+    parser.add_argument("--seconds", type = float, default = 10)
+    parser.add_argument("--tick-rate", type = int, default = 10)
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--unix", metavar = "PATH", help = "Unix socket for the server")
+    parser.add_argument("--connect", action = "store_true",
+                        help = "use a server that is already running (on --unix, or --host and --port)")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    args = parser.parse_args()
+
+    stats, server_report = asyncio.run(run_load(args.games, args.players, args.seconds, args.tick_rate,
+                                                args.rows, args.cols, args.unix, args.host, args.port,
+                                                not args.connect))
+    print(report(stats))
+    if server_report:
+        print("server       " + server_report)
@@ -0,0 +1,273 @@
+"""
+Module: snake.model
+
+The model of the snake game, without any user interface, so it can be
+used (and tested) without tkinter
+"""
+import argparse
+import array
+import random
+import time
+import unittest
+from collections import deque
+
+class SnakeModel:
+    """
+    Model of the game. Every step takes the same time however big the
+    board or the snake is: the body is a deque, a bytearray tells which
+    cells it covers, and the free cells are kept in an array with each
+    cell's position in it, so a cell is removed by swapping the last one
+    into its place and the food is placed with one random pick.
+    """
+    def __init__(self, num_rows, num_cols, rng=None):
+        """
+        initialize the model of the game. rng is the random.Random that
+        places the snake and the food (the random module if not given),
+        so a seeded one makes a game repeatable.
+        """
+
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.random = rng if rng is not None else random
+
+        self.points_scored = 0
+        self.direction = None
+        self.wraparound = False
+        self.new_head = None
+        self.dirty_cells = [] # the cells the last step changed, for the view to redraw
+
+        # Randomly choose the snake head location, then the food location,
+        # from the empty cells
+        self.set_state([], None)
+        head = self.random_pop()
+        food = self.random_pop()
+        self.set_state([head], food)
+
+    def set_state(self, snake_locations, food_location, free_cells=None):
+        """
+        Put the snake on snake_locations (head first) and the food on
+        food_location, every other cell being empty. free_cells, if given,
+        is the order of the free cells (as in free_cells of the model the
+        state was taken from), which decides where the food goes next.
+        """
+        num_cells = self.num_rows * self.num_cols
+        self.snake_locations = deque(snake_locations) # The snake head will always be the first
+        self.food_location = food_location
+
+        # occupied[cell] is 1 where the snake is
+        self.occupied = bytearray(num_cells)
+        for location in self.snake_locations:
+            self.occupied[self.cell(location)] = 1
+
+        # free_cells holds every empty cell (not snake nor food), and
+        # free_position[cell] is where cell is in it, or -1
+        self.free_cells = array.array('i', range(num_cells))
+        self.free_position = array.array('i', range(num_cells))
+        if free_cells is not None:
+            self.free_cells = array.array('i', free_cells)
+            self.free_position = array.array('i', [-1]) * num_cells
+            for position, cell in enumerate(self.free_cells):
+                self.free_position[cell] = position
+            return
+        taken = list(self.snake_locations)
+        if food_location is not None:
+            taken.append(food_location)
+        for location in taken:
+            self.remove_free(self.cell(location))
+
+    def cell(self, location):
+        """ Return the number of the cell at location (row, column) """
+        return location[0] * self.num_cols + location[1]
+
+    def location(self, cell):
+        """ Return the location (row, column) of cell number cell """
+        return divmod(cell, self.num_cols)
+
+    def remove_free(self, cell):
+        """ Remove cell from the free cells, by moving the last free cell into its place """
+        position = self.free_position[cell]
+        if position < 0:
+            return
+        last = self.free_cells.pop()
+        if last != cell:
+            self.free_cells[position] = last
+            self.free_position[last] = position
+        self.free_position[cell] = -1
+
+    def add_free(self, cell):
+        """ Add cell to the free cells """
+        self.free_position[cell] = len(self.free_cells)
+        self.free_cells.append(cell)
+
+    def random_pop(self):
+        """ Remove and return the location of a random free cell, or None if there is none """
+        if len(self.free_cells) == 0:
+            return None
+        cell = self.free_cells[self.random.randrange(len(self.free_cells))]
+        self.remove_free(cell)
+        return self.location(cell)
+
+    @property
+    def empty_cells(self):
+        """ List of the locations of the free cells (slow: for tests and debugging) """
+        return [self.location(cell) for cell in self.free_cells]
+
+    def is_game_over(self):
+        """ Checks if the snake has collided with a wall (no wraparound) or itself """
+        row, column = self.new_head
+        if row < 0 or column < 0 or row >= self.num_rows or column >= self.num_cols:
+            return True
+        if not self.occupied[self.cell(self.new_head)]:
+            return False
+        # Moving onto the tail is fine unless eating, since the tail moves away
+        return self.new_head != self.snake_locations[-1] or self.is_eating()
+
+    def is_eating(self):
+        return self.food_location == self.new_head
+
+    def next_location(self, direction):
+        """ Return where the head goes in direction (Right if None), wrapping around if that is on """
+        new_row, new_column = self.snake_locations[0]
+        if direction == "Up":
+            new_row -= 1
+        elif direction == "Down":
+            new_row += 1
+        elif direction == "Left":
+            new_column -= 1
+        else:
+            new_column += 1
+        if self.wraparound:
+            new_row %= self.num_rows
+            new_column %= self.num_cols
+        return (new_row, new_column)
+
+    def is_safe(self, direction):
+        """ Check if moving in direction would not end the game """
+        location = self.next_location(direction)
+        row, column = location
+        if row < 0 or column < 0 or row >= self.num_rows or column >= self.num_cols:
+            return False
+        if not self.occupied[self.cell(location)]:
+            return True
+        return location == self.snake_locations[-1] and location != self.food_location
+
+    def one_step(self):
+        """ Simulates one time step of simulation """
+        self.new_head = self.next_location(self.direction)
+        self.dirty_cells = []
+
+        if self.is_game_over():
+            return False
+        elif self.is_eating():
+            self.snake_locations.appendleft(self.new_head)
+            self.occupied[self.cell(self.new_head)] = 1
+            self.food_location = self.random_pop() # None once the board is full
+            self.points_scored += 1
+            self.dirty_cells.append(self.new_head)
+            if self.food_location is not None:
+                self.dirty_cells.append(self.food_location)
+        else:
+            last = self.snake_locations.pop()
+            self.occupied[self.cell(last)] = 0
+            self.add_free(self.cell(last))
+            self.snake_locations.appendleft(self.new_head)
+            self.occupied[self.cell(self.new_head)] = 1
+            self.remove_free(self.cell(self.new_head))
+            self.dirty_cells.append(last)
+            self.dirty_cells.append(self.new_head)
+        return True
+
+
+def benchmark(num_rows, num_cols, num_steps, length=10):
+    """
+    Function that moves a snake of length cells round and round a row of
+    a num_rows x num_cols board (with wraparound, never eating) num_steps
+    times and returns steps/sec
+    """
+    model = SnakeModel(num_rows, num_cols, random.Random(0))
+    model.set_state([(0, column) for column in range(length - 1, -1, -1)], (num_rows - 1, 0))
+    model.wraparound = True
+    model.direction = "Right"
+    one_step = model.one_step
+    start = time.perf_counter()
+    for i in range(num_steps):
+        one_step()
+    return num_steps / (time.perf_counter() - start)
+
+
+class SnakeModelTest(unittest.TestCase):
+
+    def setUp(self):
+        """     Initial state
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, S, F, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        """
+        self.model = SnakeModel(10, 10)
+
+        snake_location = (5, 3)
+        self.model.set_state([snake_location], (5, 4))
+        
+        self.model.direction = "Right"
+
+        """   Correct next step
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, S, S, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        """
+
+        self.new_snake_locations = [self.model.food_location, snake_location]
+
+    def test_one_step(self):
+        self.model.one_step()
+        self.assertEqual(list(self.model.snake_locations), self.new_snake_locations)
+        self.assertEqual(self.model.points_scored, 1)
+        self.assertEqual(len(self.model.empty_cells), 100 - 3)
+
+    def test_moving_keeps_head_first(self):
+        self.model.one_step()
+        self.model.direction = "Down"
+        self.model.one_step()
+        self.assertEqual(list(self.model.snake_locations), [(6, 4), (5, 4)])
+        self.assertNotIn((6, 4), self.model.empty_cells)
+        self.assertIn((5, 3), self.model.empty_cells)
+
+    def test_wall_and_wraparound(self):
+        self.model.set_state([(5, 9)], (0, 0))
+        self.assertFalse(self.model.one_step())
+        self.model.wraparound = True
+        self.assertTrue(self.model.one_step())
+        self.assertEqual(list(self.model.snake_locations), [(5, 0)])
+
+    def test_running_into_itself(self):
+        self.model.set_state([(5, 3), (5, 4), (6, 4), (6, 3), (6, 2)], (0, 0))
+        self.model.direction = "Down"
+        self.assertFalse(self.model.one_step())
+        # The tail moves out of the way
+        self.model.set_state([(5, 3), (5, 4), (6, 4), (6, 3)], (0, 0))
+        self.assertTrue(self.model.one_step())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure steps/sec of SnakeModel.one_step")
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--length", type = int, default = 10)
+    parser.add_argument("--steps", type = int, default = 1000000)
+    args = parser.parse_args()
+
+    print("%.0f steps/sec" % benchmark(args.rows, args.cols, args.steps, args.length))
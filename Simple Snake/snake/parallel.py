@@ -0,0 +1,203 @@
+"""
+Module: snake.parallel
+
+Plays many headless snake games on a pool of worker processes. Seeds are
+handed out in chunks and the results stream back as each chunk is done.
+If a worker process dies, the pool is started again and the chunks that
+were not done yet are played again, which gives the same results since
+every game depends only on its seed.
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+import unittest
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from snake.headless import POLICIES, greedy_policy, run_episode, summarize, report
+
+
+def play_chunk(policy, seeds, options):
+    """ Function that plays one game per seed (in a worker process) and returns their results """
+    return [run_episode(policy, seed = seed, **options) for seed in seeds]
+
+
+def run_parallel(policy, seeds, workers=None, chunk_size=10, max_restarts=3, restarted=None,
+                 **options):
+    """
+    Generator that plays one game with policy per seed in seeds on
+    workers processes (one per CPU if None), yielding each game's result
+    (see run_episode) as soon as its chunk is done, so not in seed
+    order. policy must be a module-level function or class, so it can be
+    sent to the workers. The options are passed to run_episode. If a
+    worker dies, restarted, if given, is called with the number of chunks
+    that will be played again. Raises BrokenProcessPool if the workers
+    die more than max_restarts times.
+    """
+    todo = deque(list(seeds[i:i + chunk_size]) for i in range(0, len(seeds), chunk_size))
+    restarts = 0
+    while len(todo) > 0:
+        pending = {}
+        pool = ProcessPoolExecutor(workers)
+        try:
+            while len(todo) > 0:
+                chunk = todo.popleft()
+                pending[pool.submit(play_chunk, policy, chunk, options)] = chunk
+            for future in as_completed(list(pending)):
+                results = future.result()
+                del pending[future]
+                yield from results
+        except BrokenProcessPool:
+            restarts += 1
+            if restarts > max_restarts:
+                raise
+            if restarted is not None:
+                restarted(len(pending))
+            todo.extend(pending.values())
+        finally:
+            pool.shutdown(wait = True, cancel_futures = True)
+
+
+def distribution(scores, buckets=10):
+    """
+    Function that describes a list of scores: mean, standard deviation,
+    percentiles and a histogram with buckets equal-width buckets
+    """
+    scores = sorted(scores)
+    if len(scores) == 0:
+        return {}
+    mean = sum(scores) / len(scores)
+    spread = math.sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+    def percentile(p):
+        return scores[min(len(scores) - 1, int(p / 100 * len(scores)))]
+    width = max(1, math.ceil((scores[-1] - scores[0] + 1) / buckets))
+    histogram = {}
+    for score in scores:
+        low = scores[0] + (score - scores[0]) // width * width
+        histogram[low] = histogram.get(low, 0) + 1
+    return {
+        "mean": mean,
+        "std dev": spread,
+        "percentiles": {p: percentile(p) for p in [0, 10, 25, 50, 75, 90, 100]},
+        "histogram": {"%d-%d" % (low, low + width - 1): count
+                      for low, count in sorted(histogram.items())},
+    }
+
+
+def evaluate(policy, seeds, workers=None, chunk_size=10, progress=None, max_restarts=3, restarted=None,
+             **options):
+    """
+    Function that plays a game per seed in parallel and returns (results
+    sorted by seed, summary). progress, if given, is called with each
+    result as it comes in; max_restarts and restarted are as for
+    run_parallel.
+    """
+    start = time.perf_counter()
+    results = []
+    for result in run_parallel(policy, seeds, workers, chunk_size, max_restarts, restarted, **options):
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    seconds = time.perf_counter() - start
+    results.sort(key = lambda result: result["seed"])
+    summary = summarize(results, seconds)
+    summary["scores"] = distribution([result["score"] for result in results])
+    return (results, summary)
+
+
+class CrashingPolicy:
+    """
+    Greedy policy that kills its worker process the first crashes times
+    it is used, for testing that the pool is restarted. Each crash leaves
+    a marker file in directory, so it is counted across processes.
+    """
+
+    def __init__(self, directory, crashes=1):
+        """Initialize the policy"""
+        self.directory = directory
+        self.crashes = crashes
+
+    def __call__(self, model):
+        """Crash if there are crashes left, otherwise choose like greedy_policy"""
+        for i in range(self.crashes):
+            try:
+                os.close(os.open(os.path.join(self.directory, "crash%d" % i), os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                continue
+            os._exit(1)
+        return greedy_policy(model)
+
+
+class ParallelTest(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        options = {"num_rows": 8, "num_cols": 8, "max_steps": 500}
+        seeds = list(range(7))
+        for name in ["greedy", "autopilot"]:
+            results, summary = evaluate(POLICIES[name], seeds, workers = 2, chunk_size = 3, **options)
+            serial = [run_episode(POLICIES[name], seed = seed, **options) for seed in seeds]
+            self.assertEqual(results, serial, name)
+            self.assertEqual(summary["episodes"], 7)
+
+    def test_restart_after_crash(self):
+        options = {"num_rows": 8, "num_cols": 8, "max_steps": 500}
+        seeds = list(range(7))
+        serial = [run_episode(greedy_policy, seed = seed, **options) for seed in seeds]
+        with tempfile.TemporaryDirectory() as directory:
+            restarts = []
+            results, summary = evaluate(CrashingPolicy(directory), seeds, workers = 2, chunk_size = 3,
+                                        restarted = restarts.append, **options)
+            self.assertEqual(results, serial)
+            self.assertEqual(len(restarts), 1)
+            self.assertGreater(restarts[0], 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(BrokenProcessPool):
+                evaluate(CrashingPolicy(directory, crashes = 100), seeds, workers = 2, chunk_size = 3,
+                         max_restarts = 2, **options)
+
+    def test_no_seeds(self):
+        results, summary = evaluate(greedy_policy, [])
+        self.assertEqual(results, [])
+        self.assertEqual(summary["scores"], {})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Play snake games on several processes")
+    parser.add_argument("--policy", choices = sorted(POLICIES), default = "greedy")
+    parser.add_argument("--episodes", type = int, default = 1000)
+    parser.add_argument("--seed", type = int, default = 0, help = "first seed (seeds are consecutive)")
+    parser.add_argument("--seeds", help = "comma-separated seeds to play instead")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--chunk-size", type = int, default = 10)
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--max-steps", type = int, default = None)
+    parser.add_argument("--wraparound", action = "store_true")
+    parser.add_argument("--results", help = "file to write every game's seed, score, steps and end to")
+    args = parser.parse_args()
+
+    if args.seeds is not None:
+        seeds = [int(seed) for seed in args.seeds.split(",") if seed.strip() != ""]
+    else:
+        seeds = list(range(args.seed, args.seed + args.episodes))
+    results, summary = evaluate(POLICIES[args.policy], seeds, args.workers, args.chunk_size,
+                                restarted = lambda chunks: print(
+                                    "A worker died, restarting the pool (%d chunks to play again)" % chunks),
+                                num_rows = args.rows, num_cols = args.cols,
+                                wraparound = args.wraparound, max_steps = args.max_steps)
+    scores = summary.pop("scores")
+    print(report(summary))
+    if len(results) > 0: # no seeds, no scores to describe
+        print("score std dev %.2f" % scores["std dev"])
+        print("percentiles  " + "  ".join("p%d: %d" % item for item in scores["percentiles"].items()))
+        for bucket, count in scores["histogram"].items():
+            print("%12s %s" % (bucket, "#" * max(1, count * 50 // len(results))))
+    if args.results:
+        with open(args.results, "w") as results_file:
+            results_file.write("seed,score,steps,end\n")
+            for result in results:
+                results_file.write("%(seed)d,%(score)d,%(steps)d,%(end)s\n" % result)
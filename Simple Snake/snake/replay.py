@@ -0,0 +1,373 @@
+"""
+Module: snake.replay
+
+Recording and replaying snake games. A game is fully determined by the
+seed of its model and the direction of every step, so that is all a
+replay holds: a small header, then the directions as runs (direction
+and how many steps in a row), each run one variable-length number whose
+low 2 bits are the direction. A run of 0 steps marks that wraparound
+was switched.
+
+The Replayer plays a replay through SnakeModel, keeping a snapshot of
+the game every SNAPSHOT_INTERVAL steps, so seeking only plays from the
+nearest one. A snapshot is only what the rest of the game depends on:
+the body, the food, the score, the order of the free cells and the state
+of the random generator; the rest of the model is rebuilt from it. The
+snapshots can be saved next to the replay (only load snapshot files you
+made yourself: they are pickles).
+"""
+import argparse
+import array
+import bisect
+import os
+import pickle
+import random
+import struct
+import tempfile
+import time
+import unittest
+
+from snake.model import SnakeModel
+
+DIRECTIONS = ["Up", "Down", "Left", "Right"] # direction codes are indexes into this
+
+
+class Replay:
+    """ The seed, board and directions of one game """
+
+    MAGIC = b"SNKR"
+    VERSION = 1
+    SUFFIX = ".snr"
+    # magic, version, rows, columns, wraparound at the start, seed, steps, final score
+    HEADER = struct.Struct("<4sBHHBqqq")
+
+    def __init__(self, num_rows, num_cols, seed, wraparound=False):
+        """ Start an empty replay of a game with these settings """
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.seed = seed
+        self.wraparound = wraparound
+        self.steps = 0
+        self.score = 0
+        self.run_starts = []     # step each run starts at
+        self.run_directions = [] # direction code of each run
+        self.toggles = set()     # steps before which wraparound was switched
+
+    def record(self, direction):
+        """ Add a step in direction (None means Right, as in SnakeModel) """
+        code = DIRECTIONS.index(direction or "Right")
+        if (len(self.run_directions) == 0 or self.run_directions[-1] != code
+                or self.steps in self.toggles):
+            self.run_starts.append(self.steps)
+            self.run_directions.append(code)
+        self.steps += 1
+
+    def toggle_wraparound(self):
+        """ Record that wraparound is switched before the next step """
+        self.toggles ^= {self.steps}
+
+    def direction_at(self, step):
+        """ Return the direction of step step """
+        return DIRECTIONS[self.run_directions[bisect.bisect_right(self.run_starts, step) - 1]]
+
+    def new_model(self):
+        """ Return the model at the start of the game """
+        model = SnakeModel(self.num_rows, self.num_cols, random.Random(self.seed))
+        model.wraparound = self.wraparound
+        return model
+
+    def encode(self):
+        """ Return the replay as bytes """
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.num_rows, self.num_cols,
+                                          self.wraparound, self.seed, self.steps, self.score))
+        ends = self.run_starts[1:] + [self.steps]
+        for i in range(len(self.run_starts)):
+            if self.run_starts[i] in self.toggles:
+                add_number(data, 0)
+            add_number(data, (ends[i] - self.run_starts[i]) << 2 | self.run_directions[i])
+        if self.steps in self.toggles:
+            add_number(data, 0)
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data):
+        """ Return the replay in data. Raises ValueError if data is not a replay. """
+        try:
+            (magic, version, num_rows, num_cols, wraparound,
+             seed, steps, score) = cls.HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("not a snake replay")
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("not a snake replay")
+        replay = cls(num_rows, num_cols, seed, bool(wraparound))
+        replay.score = score
+        position = cls.HEADER.size
+        while position < len(data):
+            value, position = read_number(data, position)
+            if value == 0:
+                replay.toggles ^= {replay.steps}
+            else:
+                replay.run_starts.append(replay.steps)
+                replay.run_directions.append(value & 3)
+                replay.steps += value >> 2
+        if replay.steps != steps:
+            raise ValueError("replay is cut short")
+        return replay
+
+    def save(self, filename):
+        """ Write the replay to filename. Raises OSError if it cannot be written. """
+        with open(filename, "wb") as replay_file:
+            replay_file.write(self.encode())
+
+    @classmethod
+    def load(cls, filename):
+        """ Read the replay in filename. Raises OSError or ValueError. """
+        with open(filename, "rb") as replay_file:
+            return cls.decode(replay_file.read())
+
+
+def add_number(data, value):
+    """ Append value to the bytearray data, 7 bits a byte, low bits first """
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def read_number(data, position):
+    """ Return the number at position in data, and the position after it """
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("replay is cut short")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return (value, position)
+
+
+class Replayer:
+    """ Plays a replay through SnakeModel, forwards or from any step """
+
+    SNAPSHOT_INTERVAL = 10000 # steps between the snapshots kept for seeking
+    SNAPSHOT_FORMAT = 2       # changes whenever what a snapshot holds changes
+
+    def __init__(self, replay):
+        """ Get ready to play replay from its start """
+        self.replay = replay
+        self.model = replay.new_model()
+        self.step = 0          # the next step to play
+        self.over = False      # whether the snake died
+        self.snapshots = {0: self.snapshot()}
+
+    def snapshot(self):
+        """ Return what the rest of the game depends on, to restore the model from later """
+        model = self.model
+        return (tuple(model.snake_locations), model.food_location, model.points_scored,
+                model.wraparound, model.free_cells.tobytes(), model.random.getstate())
+
+    def restore(self, snapshot):
+        """ Set the model to the game in snapshot, rebuilding which cells are taken """
+        body, food, score, wraparound, free_cells, random_state = snapshot
+        model = self.model
+        cells = array.array('i')
+        cells.frombytes(free_cells)
+        model.set_state(body, food, cells)
+        model.points_scored = score
+        model.wraparound = wraparound
+        model.random.setstate(random_state)
+
+    def seek(self, step):
+        """ Go to just before step step, starting from the nearest snapshot before it """
+        step = max(0, min(step, self.replay.steps))
+        start = step - step % self.SNAPSHOT_INTERVAL
+        while start not in self.snapshots:
+            start -= self.SNAPSHOT_INTERVAL
+        if not start <= self.step <= step:
+            self.restore(self.snapshots[start])
+            self.step = start
+            self.over = False
+        self.advance(step - self.step)
+
+    def advance(self, count=1):
+        """
+        Play up to count steps, stopping at the end of the replay or when
+        the snake dies. Returns the number of steps played.
+        """
+        replay = self.replay
+        model = self.model
+        played = 0
+        run = bisect.bisect_right(replay.run_starts, self.step) - 1
+        while played < count and self.step < replay.steps and not self.over:
+            if self.step % self.SNAPSHOT_INTERVAL == 0 and self.step not in self.snapshots:
+                self.snapshots[self.step] = self.snapshot()
+            while run + 1 < len(replay.run_starts) and replay.run_starts[run + 1] <= self.step:
+                run += 1
+            if self.step in replay.toggles:
+                model.wraparound = not model.wraparound
+            model.direction = DIRECTIONS[replay.run_directions[run]]
+            if not model.one_step():
+                self.over = True
+            self.step += 1
+            played += 1
+        return played
+
+    def save_snapshots(self, filename):
+        """ Write the snapshots made so far to filename, so seeking is fast next time too """
+        with open(filename, "wb") as snapshot_file:
+            pickle.dump((self.SNAPSHOT_FORMAT, self.replay.encode(), self.SNAPSHOT_INTERVAL,
+                         self.snapshots), snapshot_file)
+
+    def load_snapshots(self, filename):
+        """ Use the snapshots in filename, if they were made from this replay """
+        try:
+            with open(filename, "rb") as snapshot_file:
+                snapshot_format, data, interval, snapshots = pickle.load(snapshot_file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return
+        if (snapshot_format == self.SNAPSHOT_FORMAT and data == self.replay.encode()
+                and interval == self.SNAPSHOT_INTERVAL):
+            self.snapshots.update(snapshots)
+
+    def run(self):
+        """ Play the rest of the replay and return the model at the end """
+        self.advance(self.replay.steps - self.step)
+        return self.model
+
+
+class ReplayTest(unittest.TestCase):
+
+    def record_game(self, steps, seed=3):
+        """ Record a game of up to steps random safe steps, switching wraparound now and then """
+        replay = Replay(6, 6, seed)
+        model = replay.new_model()
+        rng = random.Random(seed)
+        for step in range(steps):
+            if step % 37 in [0, 5, 6]:
+                model.wraparound = not model.wraparound
+                replay.toggle_wraparound()
+            safe = [direction for direction in DIRECTIONS if model.is_safe(direction)]
+            if len(safe) == 0:
+                break
+            model.direction = rng.choice(safe)
+            replay.record(model.direction)
+            if not model.one_step() or model.food_location is None:
+                break
+        replay.score = model.points_scored
+        return replay
+
+    def test_encode_decode(self):
+        replay = Replay(20, 30, 12345, wraparound = True)
+        replay.toggle_wraparound()              # before the first step
+        for direction in ["Up", "Up", None, "Left"]:
+            replay.record(direction)
+        replay.toggle_wraparound()              # in the middle of a run
+        replay.record("Left")
+        replay.toggle_wraparound()              # switched and back: no change
+        replay.toggle_wraparound()
+        replay.record("Left")
+        replay.toggle_wraparound()              # after the last step
+        replay.score = 7
+
+        again = Replay.decode(replay.encode())
+        for name in ["num_rows", "num_cols", "seed", "wraparound", "steps", "score",
+                     "run_starts", "run_directions", "toggles"]:
+            self.assertEqual(getattr(again, name), getattr(replay, name), name)
+        self.assertEqual(again.toggles, {0, 4, 6})
+        self.assertEqual([again.direction_at(step) for step in range(6)],
+                         ["Up", "Up", "Right", "Left", "Left", "Left"])
+        self.assertEqual(again.encode(), replay.encode())
+        self.assertRaises(ValueError, Replay.decode, replay.encode()[:-2])
+        self.assertRaises(ValueError, Replay.decode, b"SNKX" + replay.encode()[4:])
+
+    def test_seek(self):
+        replay = self.record_game(400)
+        final = Replayer(replay).run()
+        self.assertEqual(final.points_scored, replay.score)
+
+        replayer = Replayer(replay)
+        replayer.SNAPSHOT_INTERVAL = 25
+        replayer.run()
+        for step in [replay.steps, 130, 3, 0, 260, 259, 51, replay.steps // 2]:
+            replayer.seek(step)
+            expected = Replayer(replay)
+            expected.advance(step)
+            self.assertEqual(replayer.step, step)
+            for name in ["snake_locations", "food_location", "points_scored", "wraparound",
+                         "occupied", "free_cells", "free_position"]:
+                self.assertEqual(getattr(replayer.model, name), getattr(expected.model, name), name)
+            self.assertEqual(replayer.model.random.getstate(), expected.model.random.getstate())
+        replayer.run()
+        self.assertEqual(replayer.model.points_scored, replay.score)
+
+    def test_saved_snapshots(self):
+        replay = self.record_game(300)
+        replayer = Replayer(replay)
+        replayer.SNAPSHOT_INTERVAL = 20
+        replayer.run()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, "game.snaps")
+            replayer.save_snapshots(filename)
+            other = Replayer(replay)
+            other.SNAPSHOT_INTERVAL = 20
+            other.load_snapshots(filename)
+        self.assertEqual(other.snapshots, replayer.snapshots)
+        other.seek(replay.steps - 1)
+        replayer.seek(replay.steps - 1)
+        self.assertEqual(other.model.snake_locations, replayer.model.snake_locations)
+
+
+def show(replay, step_time_millis=100):
+    """
+    Play replay in a SnakeView window, one step every step_time_millis.
+    This is the only part of the module that needs tkinter.
+    """
+    from snake.view import SnakeView
+
+    replayer = Replayer(replay)
+    view = SnakeView(replay.num_rows, replay.num_cols)
+    view.draw_model(replayer.model)
+
+    def next_step():
+        if replayer.advance() == 1:
+            view.update_cells(replayer.model)
+            view.set_points(replayer.model.points_scored)
+            view.schedule_next_step(step_time_millis, next_step)
+        if replayer.over:
+            view.show_game_over()
+
+    view.schedule_next_step(step_time_millis, next_step)
+    view.window.mainloop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replay a recorded snake game")
+    parser.add_argument("replay")
+    parser.add_argument("--show", action = "store_true", help = "play it in a window")
+    parser.add_argument("--step-millis", type = int, default = 100)
+    parser.add_argument("--seek", type = int, default = None, help = "show the state before this step")
+    parser.add_argument("--snapshots", action = "store_true",
+                        help = "keep the model copies in a file next to the replay, for faster seeking")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    if args.show:
+        show(replay, args.step_millis)
+    else:
+        replayer = Replayer(replay)
+        start = time.perf_counter()
+        if args.snapshots:
+            replayer.load_snapshots(args.replay + ".snaps")
+        if args.seek is not None:
+            replayer.seek(args.seek)
+        else:
+            replayer.run()
+        seconds = time.perf_counter() - start
+        if args.snapshots:
+            replayer.save_snapshots(args.replay + ".snaps")
+        print("Step %d of %d, score %d (recorded final score %d), %.0f steps/sec"
+              % (replayer.step, replay.steps, replayer.model.points_scored, replay.score,
+                 replayer.step / seconds if seconds > 0 else 0))
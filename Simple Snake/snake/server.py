@@ -0,0 +1,553 @@
+"""
+Module: snake.server
+
+An asyncio server that hosts many snake matches at once, each a board
+shared by up to players_per_match snakes. One task ticks every match at
+a fixed rate (kept on time by snake.timing); the server is the only one
+that moves snakes, clients just send the direction they want.
+
+After each tick a match sends its players what changed, as a compact
+binary frame of 6-byte events (head added, tail removed, food placed,
+snake died, points), so a tick costs a few bytes however big the board
+is. A player that joins gets a welcome frame and the whole board as the
+same kind of events, then the changes from the next tick on. All the
+changes happen during a tick, so every player sees the same events in
+the same order; MatchMirror rebuilds a board from them.
+
+Frames from the server:
+    welcome: "W", rows, columns, player number   (struct WELCOME)
+    changes: "D", tick, number of events, events (struct HEADER, then EVENT each)
+From a client: one byte per direction change, b"U", b"D", b"L" or b"R".
+
+This module does not import tkinter: snake.client shows a match in a
+SnakeView.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import struct
+import sys
+import time
+import traceback
+import unittest
+from collections import deque
+
+from snake.model import SnakeModel
+from snake.timing import StepTimer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+WELCOME = struct.Struct("<cHHB") # b"W", rows, columns, player number
+HEADER = struct.Struct("<cII")   # b"D", tick, number of events
+EVENT = struct.Struct("<BBI")    # kind, player, cell (or points)
+MAX_SIDE = 0xFFFF                # most rows or columns a frame can describe
+MAX_PLAYERS = 0x100              # most players in a match, numbered from 0
+
+HEAD, TAIL, FOOD, DEAD, POINTS = range(5) # kinds of event
+DIRECTION_CODES = {ord("U"): "Up", ord("D"): "Down", ord("L"): "Left", ord("R"): "Right"}
+ROW_STEP = {"Up": -1, "Down": 1, "Left": 0, "Right": 0}
+COLUMN_STEP = {"Up": 0, "Down": 0, "Left": -1, "Right": 1}
+
+
+class Player:
+    """ One snake on a match's board """
+
+    def __init__(self, number):
+        self.number = number
+        self.body = deque()      # cells, head first
+        self.direction = "Right"
+        self.points = 0
+        self.alive = False
+        self.spawn_at = 0        # tick at which a snake that is not alive is put on the board
+        self.leaving = False
+        self.writer = None       # the player's connection, for the server
+
+
+class Match:
+    """
+    A board with several snakes and as many pieces of food. The board's
+    cells are kept by a SnakeModel (which cells are occupied, and the
+    free cells to place things on), so the rules are the same as for one
+    snake: the head moves into a cell, the tail leaves its cell unless
+    the snake is eating, and a snake dies running off the board (unless
+    wraparound is on) or into a snake. Two heads moving into the same
+    cell both die. A dead snake is put back RESPAWN_TICKS later.
+    """
+
+    RESPAWN_TICKS = 10
+
+    def __init__(self, num_rows, num_cols, max_players=2, seed=None, wraparound=False):
+        """ Create an empty match; its food and snakes are placed by the same seeded random.Random """
+        self.board = SnakeModel(num_rows, num_cols, random.Random(seed))
+        self.board.set_state([], None)
+        self.board.wraparound = wraparound
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.max_players = max_players
+        self.players = {} # player number -> Player
+        self.food = set()
+        self.tick_count = 0
+        self.events = []  # (kind, player, cell) since the last tick
+
+    def add_player(self):
+        """ Add a player, whose snake appears at the next tick. Returns its number, or None if the match is full. """
+        for number in range(self.max_players):
+            if number not in self.players:
+                player = Player(number)
+                player.spawn_at = self.tick_count
+                self.players[number] = player
+                return number
+        return None
+
+    def remove_player(self, number):
+        """ Take a player's snake off the board at the next tick, if the player is still in the match """
+        if number in self.players:
+            self.players[number].leaving = True
+
+    def set_state(self, snakes, food):
+        """
+        Put the snakes on the board: snakes maps player number to the
+        locations of its snake (head first), food lists the food
+        locations, every other cell being empty
+        """
+        self.board.set_state([location for locations in snakes.values() for location in locations], None)
+        self.food = set()
+        for location in food:
+            self.food.add(self.board.cell(location))
+            self.board.remove_free(self.board.cell(location))
+        for number, locations in snakes.items():
+            player = self.players.setdefault(number, Player(number))
+            player.body = deque(self.board.cell(location) for location in locations)
+            player.alive = True
+
+    def next_cell(self, player):
+        """ Return the cell player's head moves to, or None if that is off the board """
+        row, column = divmod(player.body[0], self.num_cols)
+        row += ROW_STEP[player.direction]
+        column += COLUMN_STEP[player.direction]
+        if self.board.wraparound:
+            row %= self.num_rows
+            column %= self.num_cols
+        elif row < 0 or column < 0 or row >= self.num_rows or column >= self.num_cols:
+            return None
+        return row * self.num_cols + column
+
+    def tick(self):
+        """ Move every snake one step and return the list of events that happened, as (kind, player, cell) """
+        board = self.board
+        occupied = board.occupied
+        events = self.events
+
+        for player in [player for player in self.players.values() if player.leaving]:
+            if player.alive:
+                self.clear(player)
+            del self.players[player.number]
+
+        # Tails move out of the way first, so a head may follow a tail
+        moving = [player for player in self.players.values() if player.alive]
+        heads = [self.next_cell(player) for player in moving]
+        for i in range(len(moving)):
+            if heads[i] not in self.food:
+                cell = moving[i].body.pop()
+                occupied[cell] = 0
+                board.add_free(cell)
+                events.append((TAIL, moving[i].number, cell))
+
+        head_count = {}
+        for cell in heads:
+            head_count[cell] = head_count.get(cell, 0) + 1
+        # Who dies is decided before anything moves, so it does not depend on the order of the players
+        dying = [cell is None or occupied[cell] or head_count[cell] > 1 for cell in heads]
+        for i in range(len(moving)):
+            player = moving[i]
+            cell = heads[i]
+            if dying[i]:
+                continue
+            player.body.appendleft(cell)
+            occupied[cell] = 1
+            events.append((HEAD, player.number, cell))
+            if cell in self.food:
+                self.food.discard(cell)
+                player.points += 1
+                events.append((POINTS, player.number, player.points))
+            else:
+                board.remove_free(cell)
+        for i in range(len(moving)):
+            if dying[i]:
+                events.append((DEAD, moving[i].number, 0))
+                self.clear(moving[i])
+                moving[i].spawn_at = self.tick_count + self.RESPAWN_TICKS
+
+        for player in self.players.values():
+            if not player.alive and not player.leaving and player.spawn_at <= self.tick_count:
+                self.spawn(player)
+        while len(self.food) < len(self.players):
+            location = board.random_pop()
+            if location is None:
+                break
+            cell = board.cell(location)
+            self.food.add(cell)
+            events.append((FOOD, 0, cell))
+
+        self.tick_count += 1
+        self.events = []
+        return events
+
+    def spawn(self, player):
+        """ Put a new snake for player on a random free cell, if there is one """
+        location = self.board.random_pop()
+        if location is None:
+            return
+        cell = self.board.cell(location)
+        self.board.occupied[cell] = 1
+        player.body = deque([cell])
+        player.direction = "Right"
+        player.points = 0
+        player.alive = True
+        self.events.append((HEAD, player.number, cell))
+        self.events.append((POINTS, player.number, 0))
+
+    def clear(self, player):
+        """ Take player's snake off the board, tail first """
+        for cell in reversed(player.body):
+            self.board.occupied[cell] = 0
+            self.board.add_free(cell)
+            self.events.append((TAIL, player.number, cell))
+        player.body.clear()
+        player.alive = False
+
+    def snapshot(self):
+        """ Return the events that build the board as it is now: each snake tail first, the points and the food """
+        events = []
+        for player in self.players.values():
+            for i in range(len(player.body) - 1, -1, -1):
+                events.append((HEAD, player.number, player.body[i]))
+            if player.alive:
+                events.append((POINTS, player.number, player.points))
+        for cell in self.food:
+            events.append((FOOD, 0, cell))
+        return events
+
+
+def encode_frame(tick, events):
+    """ Return the frame of the events of tick """
+    frame = bytearray(HEADER.pack(b"D", tick, len(events)))
+    for event in events:
+        frame += EVENT.pack(*event)
+    return bytes(frame)
+
+
+def decode_frames(data):
+    """
+    Return (frames, rest): the whole frames at the start of data, as
+    ("W", rows, columns, player) or ("D", tick, events), and the bytes
+    after them, which are the start of a frame still to come
+    """
+    frames = []
+    position = 0
+    while position < len(data):
+        kind = data[position:position + 1]
+        if kind == b"W":
+            if len(data) - position < WELCOME.size:
+                break
+            frames.append(("W",) + WELCOME.unpack_from(data, position)[1:])
+            position += WELCOME.size
+        elif kind == b"D":
+            if len(data) - position < HEADER.size:
+                break
+            tick, count = HEADER.unpack_from(data, position)[1:]
+            end = position + HEADER.size + count * EVENT.size
+            if len(data) < end:
+                break
+            events = list(EVENT.iter_unpack(data[position + HEADER.size:end]))
+            frames.append(("D", tick, events))
+            position = end
+        else:
+            raise ValueError("not a snake server frame")
+    return (frames, data[position:])
+
+
+class MatchMirror:
+    """ A match's board as a client sees it, rebuilt from the server's events """
+
+    def __init__(self, num_rows, num_cols, number):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.number = number # the client's own player
+        self.snakes = {}     # player number -> deque of cells, head first
+        self.owner = {}      # cell -> player number of the snake in it
+        self.points = {}
+        self.food = set()
+        self.tick = 0
+
+    def apply(self, events):
+        """ Apply (kind, player, cell) events and return the cells they changed """
+        for kind, player, cell in events:
+            if kind == HEAD:
+                self.snakes.setdefault(player, deque()).appendleft(cell)
+                self.owner[cell] = player
+                self.food.discard(cell)
+            elif kind == TAIL:
+                body = self.snakes[player]
+                body.pop()
+                del self.owner[cell]
+                if len(body) == 0:
+                    del self.snakes[player]
+            elif kind == FOOD:
+                self.food.add(cell)
+            elif kind == POINTS:
+                self.points[player] = cell
+        return [cell for kind, player, cell in events if kind in (HEAD, TAIL, FOOD)]
+
+
+class SnakeServer:
+    """ Hosts the matches and their players' connections """
+
+    MAX_BUFFERED = 64 * 1024 # bytes waiting to be sent before a client counts as stuck and is dropped
+
+    def __init__(self, num_rows=30, num_cols=30, players_per_match=2, tick_rate=10,
+                 wraparound=False, seed=0):
+        """
+        Create a server whose matches tick tick_rate times a second.
+        Raises ValueError if the frames cannot describe its matches: a
+        side of more than MAX_SIDE cells or more than MAX_PLAYERS players.
+        """
+        if not (0 < num_rows <= MAX_SIDE and 0 < num_cols <= MAX_SIDE):
+            raise ValueError("the board must have 1 to %d rows and columns" % MAX_SIDE)
+        if not 0 < players_per_match <= MAX_PLAYERS:
+            raise ValueError("a match must have 1 to %d players" % MAX_PLAYERS)
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.players_per_match = players_per_match
+        self.wraparound = wraparound
+        self.seed = seed
+        self.matches = []
+        # a stuck client may still have a whole board's snapshot to read
+        self.max_buffered = self.MAX_BUFFERED + EVENT.size * num_rows * num_cols
+        self.timer = StepTimer(1 / tick_rate)
+        self.ticks = 0
+        self.tick_seconds = 0.0 # time spent moving snakes and sending frames
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    def join(self):
+        """ Return (match, player number) for a new player, in the first match with room """
+        for match in self.matches:
+            number = match.add_player()
+            if number is not None:
+                return (match, number)
+        match = Match(self.num_rows, self.num_cols, self.players_per_match,
+                      self.seed + len(self.matches), self.wraparound)
+        self.matches.append(match)
+        return (match, match.add_player())
+
+    async def handle_client(self, reader, writer):
+        """ Coroutine that serves one player until it disconnects """
+        match, number = self.join()
+        player = match.players[number]
+        writer.write(WELCOME.pack(b"W", match.num_rows, match.num_cols, number))
+        writer.write(encode_frame(match.tick_count, match.snapshot()))
+        player.writer = writer
+        try:
+            while True:
+                data = await reader.read(64)
+                if not data:
+                    break
+                for code in data:
+                    if code in DIRECTION_CODES:
+                        player.direction = DIRECTION_CODES[code]
+        except ConnectionError:
+            pass
+        finally:
+            player.writer = None
+            match.remove_player(number)
+            writer.close()
+
+    def tick(self):
+        """
+        Tick every match and send each one's players its frame. A match
+        that fails is reported and ended, closing its players'
+        connections, so that it cannot stop the other matches.
+        """
+        for number, match in enumerate(self.matches):
+            try:
+                self.tick_match(match)
+            except Exception:
+                print("Match %d failed and is ended:" % number, file = sys.stderr)
+                traceback.print_exc()
+                for player in match.players.values():
+                    if player.writer is not None:
+                        player.writer.close()
+                        player.writer = None
+                match.players.clear()
+        self.matches = [match for match in self.matches if len(match.players) > 0]
+
+    def tick_match(self, match):
+        """ Tick match and send its players its frame """
+        # A frame goes out every tick, even with no events, so clients can tell the ticks keep coming
+        events = match.tick()
+        frame = encode_frame(match.tick_count, events)
+        for player in match.players.values():
+            writer = player.writer
+            if writer is None:
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffered:
+                writer.close() # not reading: its handle_client removes it
+                player.writer = None
+                continue
+            writer.write(frame)
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+
+    async def run_ticks(self):
+        """ Coroutine that ticks the matches at the tick rate, for ever """
+        await asyncio.sleep(self.timer.start())
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            seconds = time.perf_counter() - start
+            self.ticks += 1
+            self.tick_seconds += seconds
+            await asyncio.sleep(self.timer.frame_done(seconds, 0.0))
+
+    def report(self):
+        """ Return the server's figures as a line of text """
+        players = sum(len(match.players) for match in self.matches)
+        return ("%d matches, %d players, %d ticks/s, tick %.2f ms (worst %.2f), %d dropped, %d frames, %d bytes sent"
+                % (len(self.matches), players, self.timer.steps_per_second(),
+                   self.tick_seconds * 1000 / max(1, self.ticks), self.timer.worst_seconds * 1000,
+                   self.timer.dropped, self.frames_sent, self.bytes_sent))
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, report_seconds=None):
+        """
+        Coroutine that runs the server until it is cancelled. If path is
+        given the server listens on that Unix socket instead of host and
+        port. Prints report() every report_seconds, if given.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path = path, backlog = 1024)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, backlog = 1024)
+        ticking = asyncio.create_task(self.run_ticks())
+        try:
+            async with server:
+                if report_seconds is None:
+                    await server.serve_forever()
+                while True:
+                    await asyncio.sleep(report_seconds)
+                    print(self.report(), flush = True)
+        finally:
+            ticking.cancel()
+
+
+class MatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.match = Match(10, 10, 3, seed = 0)
+
+    def test_moves_and_eats(self):
+        self.match.set_state({0: [(5, 3), (5, 2)]}, [(5, 4)])
+        self.match.tick()
+        self.assertEqual(list(self.match.players[0].body), [54, 53, 52])
+        self.assertEqual(self.match.players[0].points, 1)
+        events = self.match.tick()
+        self.assertIn((TAIL, 0, 52), events)
+        self.assertIn((HEAD, 0, 55), events)
+        self.assertEqual(len(self.match.food), 1) # new food for the one player
+
+    def test_heads_into_the_same_cell(self):
+        self.match.set_state({0: [(5, 3)], 1: [(5, 5)]}, [(0, 0), (0, 1)])
+        self.match.players[1].direction = "Left"
+        events = self.match.tick()
+        self.assertIn((DEAD, 0, 0), events)
+        self.assertIn((DEAD, 1, 0), events)
+        self.assertEqual(self.match.board.occupied.count(1), 0)
+
+    def test_following_a_tail(self):
+        self.match.set_state({0: [(5, 3)], 1: [(5, 5), (5, 4)]}, [(0, 0), (0, 1)])
+        self.match.tick()
+        self.assertTrue(self.match.players[0].alive)
+        self.assertEqual(list(self.match.players[0].body), [54])
+
+    def test_mirror_sees_the_same_board(self):
+        match = Match(8, 8, 3, seed = 1)
+        for i in range(3):
+            match.add_player()
+        rng = random.Random(2)
+        mirror = None
+        for tick in range(300):
+            events = match.tick()
+            frames, rest = decode_frames(encode_frame(match.tick_count, events))
+            if mirror is None:
+                # A player joining after the first tick gets the snapshot instead
+                mirror = MatchMirror(8, 8, 0)
+                mirror.apply(decode_frames(encode_frame(match.tick_count, match.snapshot()))[0][0][2])
+            else:
+                mirror.apply(frames[0][2])
+            self.assertEqual(rest, b"")
+            self.assertEqual({number: list(player.body) for number, player in match.players.items()
+                              if player.alive}, {number: list(body) for number, body in mirror.snakes.items()})
+            self.assertEqual(mirror.food, match.food)
+            self.assertEqual(len(mirror.owner), match.board.occupied.count(1))
+            for player in match.players.values():
+                player.direction = rng.choice(list(ROW_STEP))
+
+    def test_large_board(self):
+        match = Match(400, 400, 2, seed = 3)
+        snake = [(399, column) for column in range(399, -1, -1)] + [(398, 0)]
+        match.set_state({0: snake, 1: [(0, 0)]}, [(200, 200)])
+        match.players[0].direction = "Up"
+        frames, rest = decode_frames(encode_frame(70000, match.snapshot()) + encode_frame(70001, match.tick()))
+        mirror = MatchMirror(400, 400, 0)
+        mirror.apply(frames[0][2])
+        mirror.apply(frames[1][2])
+        self.assertEqual([frame[1] for frame in frames], [70000, 70001])
+        self.assertEqual(list(mirror.snakes[0]), list(match.players[0].body))
+        self.assertIn(399 * 400 + 399, mirror.snakes[0])
+
+    def test_server_checks_its_board(self):
+        self.assertRaises(ValueError, SnakeServer, MAX_SIDE + 1, 10)
+        self.assertRaises(ValueError, SnakeServer, 10, 10, MAX_PLAYERS + 1)
+
+    def test_failing_match_is_ended(self):
+        server = SnakeServer(10, 10, 1)
+        broken, number = server.join()
+        other, number = server.join()
+        def fail():
+            raise RuntimeError("broken match")
+        broken.tick = fail
+        with contextlib.redirect_stderr(io.StringIO()) as errors:
+            server.tick()
+            server.tick()
+        self.assertIn("broken match", errors.getvalue())
+        self.assertEqual(server.matches, [other])
+        self.assertEqual(other.tick_count, 2)
+        broken.remove_player(0) # its connection closing later
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve multiplayer snake matches")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    parser.add_argument("--unix", metavar = "PATH", help = "listen on a Unix socket instead")
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--players", type = int, default = 2, help = "snakes per match")
+    parser.add_argument("--tick-rate", type = int, default = 10, help = "ticks per second")
+    parser.add_argument("--wraparound", action = "store_true")
+    parser.add_argument("--report", type = float, default = None, metavar = "SECONDS",
+                        help = "print the server's figures this often")
+    args = parser.parse_args()
+    if not (0 < args.rows <= MAX_SIDE and 0 < args.cols <= MAX_SIDE):
+        parser.error("--rows and --cols must be 1 to %d" % MAX_SIDE)
+    if not 0 < args.players <= MAX_PLAYERS:
+        parser.error("--players must be 1 to %d" % MAX_PLAYERS)
+
+    server = SnakeServer(args.rows, args.cols, args.players, args.tick_rate, args.wraparound)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,99 @@
+"""
+Module: snake.timing
+
+Keeps the snake game stepping at the rate the step speed slider asks for.
+Each step is due one period after the previous one was due (not after it
+finished), on a monotonic clock, so the time spent in the model and in
+drawing does not add up as drift. When the game falls more than a whole
+period behind, the missed steps are dropped and counted instead of being
+run in a burst. Also measures real steps/sec and the model and render
+time of each frame, for the timing overlay.
+"""
+import time
+import unittest
+from collections import deque
+
+
+class StepTimer:
+
+    def __init__(self, period, clock=time.perf_counter):
+        """ Create a timer for one step every period seconds, on clock (a monotonic clock) """
+        self.period = period
+        self.clock = clock
+        self.next_due = None
+        self.dropped = 0                    # steps dropped because the game was behind
+        self.step_times = deque()           # when the steps of the last second ran
+        self.model_seconds = 0.0            # model and render time of the last frame
+        self.render_seconds = 0.0
+        self.worst_seconds = 0.0            # longest frame (model and render) since start
+
+    def start(self):
+        """ Start timing; returns the delay in seconds before the first step """
+        self.next_due = self.clock() + self.period
+        self.dropped = 0
+        self.step_times.clear()
+        self.worst_seconds = 0.0
+        return self.period
+
+    def set_period(self, period):
+        """ Change the time between steps, from the next step on """
+        if self.next_due is not None:
+            self.next_due += period - self.period
+        self.period = period
+
+    def frame_done(self, model_seconds, render_seconds):
+        """
+        Record a step that took model_seconds in the model and
+        render_seconds drawing. Returns the delay in seconds before the
+        next step.
+        """
+        now = self.clock()
+        self.model_seconds = model_seconds
+        self.render_seconds = render_seconds
+        self.worst_seconds = max(self.worst_seconds, model_seconds + render_seconds)
+        self.step_times.append(now)
+        while self.step_times[0] < now - 1.0:
+            self.step_times.popleft()
+
+        self.next_due += self.period
+        late = now - self.next_due
+        if late > self.period:
+            missed = int(late // self.period)
+            self.dropped += missed
+            self.next_due += missed * self.period
+        return max(0.0, self.next_due - now)
+
+    def steps_per_second(self):
+        """ Return how many steps ran in the last second """
+        return len(self.step_times)
+
+    def overlay_text(self):
+        """ Return the timing figures as a few lines of text """
+        return ("%d steps/s (target %.0f)\nmodel %.2f ms  render %.2f ms\nworst %.2f ms  dropped %d"
+                % (self.steps_per_second(), 1 / self.period, self.model_seconds * 1000,
+                   self.render_seconds * 1000, self.worst_seconds * 1000, self.dropped))
+
+
+class StepTimerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.timer = StepTimer(0.1, lambda: self.now)
+
+    def test_no_drift(self):
+        self.timer.start()
+        for i in range(100):
+            self.now = 0.1 * (i + 1) + 0.03 # the step ran a little late and took some time
+            delay = self.timer.frame_done(0.01, 0.01)
+            self.assertAlmostEqual(self.now + delay, 0.1 * (i + 2))
+        self.assertEqual(self.timer.dropped, 0)
+
+    def test_dropped_frames(self):
+        self.timer.start()
+        self.now = 0.35 # due at 0.1, but took until 0.35
+        delay = self.timer.frame_done(0.2, 0.05)
+        # The step due at 0.2 is dropped, the one due at 0.3 runs right away
+        self.assertEqual(self.timer.dropped, 1)
+        self.assertEqual(delay, 0.0)
+        self.now = 0.36
+        self.assertAlmostEqual(self.now + self.timer.frame_done(0.005, 0.005), 0.4)
@@ -0,0 +1,278 @@
+"""
+Module: snake.vector
+
+Many snake games at once on NumPy arrays, for training policies. Each
+array has one row per game: the snake's cells in a ring buffer, which
+cells it covers, the free cells with each cell's position among them
+(the same swap-remove scheme as SnakeModel) and the food. A step moves
+every game with a few array operations; only placing new food and
+starting new games loop over the games concerned.
+
+A game played here with seed s goes exactly like
+SnakeModel(num_rows, num_cols, random.Random(s)) given the same
+directions.
+"""
+import argparse
+import random
+import time
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from snake.model import SnakeModel
+
+DIRECTIONS = ["Up", "Down", "Left", "Right"] # actions are indexes into this
+ROW_STEP = [-1, 1, 0, 0]
+COLUMN_STEP = [0, 0, -1, 1]
+
+
+class VectorSnakeModel:
+    """
+    num_games games on num_rows x num_cols boards. A game that ends is
+    started again right away with the next seed; its result is added to
+    finished. Cells are numbered row * num_cols + column.
+    """
+
+    def __init__(self, num_games, num_rows, num_cols, seed=0, wraparound=False):
+        """
+        Start num_games games, seeded seed, seed + 1, ... Raises
+        RuntimeError if NumPy is not installed.
+        """
+        if np is None:
+            raise RuntimeError("VectorSnakeModel needs NumPy")
+        self.num_games = num_games
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_cells = num_rows * num_cols
+        self.wraparound = wraparound
+        self.next_seed = seed
+        self.finished = [] # (seed, score, steps, how it ended) of every game that ended
+
+        self.games = np.arange(num_games)
+        self.body = np.zeros((num_games, self.num_cells), dtype = np.int32) # ring buffers of cells
+        self.head_index = np.zeros(num_games, dtype = np.int64) # where the head is in body
+        self.length = np.zeros(num_games, dtype = np.int64)
+        self.occupied = np.zeros((num_games, self.num_cells), dtype = bool)
+        self.free_cells = np.zeros((num_games, self.num_cells), dtype = np.int32)
+        self.free_position = np.zeros((num_games, self.num_cells), dtype = np.int32)
+        self.free_count = np.zeros(num_games, dtype = np.int64)
+        self.food = np.zeros(num_games, dtype = np.int64) # -1 once the board is full
+        self.direction = np.full(num_games, DIRECTIONS.index("Right"), dtype = np.int64)
+        self.points_scored = np.zeros(num_games, dtype = np.int64)
+        self.steps = np.zeros(num_games, dtype = np.int64)
+        self.seeds = np.zeros(num_games, dtype = np.int64)
+        self.rngs = [None] * num_games
+        self.row_step = np.array(ROW_STEP)
+        self.column_step = np.array(COLUMN_STEP)
+
+        for game in range(num_games):
+            self.reset_game(game)
+
+    def reset_game(self, game):
+        """ Start a new game in row game, with the next seed, placed as SnakeModel places it """
+        seed = self.next_seed
+        self.next_seed += 1
+        rng = random.Random(seed)
+        self.rngs[game] = rng
+        self.seeds[game] = seed
+
+        # SnakeModel picks the head from all the cells, then the food from
+        # the cells left, where the last cell has moved into the head's place
+        head = rng.randrange(self.num_cells)
+        food = rng.randrange(self.num_cells - 1)
+        if food == head:
+            food = self.num_cells - 1
+
+        self.free_cells[game] = np.arange(self.num_cells)
+        self.free_position[game] = np.arange(self.num_cells)
+        self.free_count[game] = self.num_cells
+        self.remove_free(game, head)
+        self.remove_free(game, food)
+        self.occupied[game] = False
+        self.occupied[game, head] = True
+        self.body[game, 0] = head
+        self.head_index[game] = 0
+        self.length[game] = 1
+        self.food[game] = food
+        self.direction[game] = DIRECTIONS.index("Right")
+        self.points_scored[game] = 0
+        self.steps[game] = 0
+
+    def remove_free(self, game, cell):
+        """ Remove cell from the free cells of one game, by moving the last free cell into its place """
+        position = self.free_position[game, cell]
+        if position < 0:
+            return
+        self.free_count[game] -= 1
+        last = self.free_cells[game, self.free_count[game]]
+        self.free_cells[game, position] = last
+        self.free_position[game, last] = position
+        self.free_position[game, cell] = -1
+
+    def heads(self):
+        """ Return the array of the head cell of every game """
+        return self.body[self.games, self.head_index]
+
+    def tails(self):
+        """ Return the array of the tail cell of every game """
+        return self.body[self.games, (self.head_index - self.length + 1) % self.num_cells]
+
+    def step(self, actions=None):
+        """
+        Move every game one step, in the directions actions (indexes
+        into DIRECTIONS, one per game), or on in the same direction if
+        actions is None. Returns (ate, done): arrays telling which games
+        ate and which ended (and were started again).
+        """
+        if actions is not None:
+            self.direction[:] = actions
+        games = self.games
+        head = self.heads()
+        tail = self.tails()
+
+        rows = head // self.num_cols + self.row_step[self.direction]
+        columns = head % self.num_cols + self.column_step[self.direction]
+        if self.wraparound:
+            rows %= self.num_rows
+            columns %= self.num_cols
+            off_board = np.zeros(self.num_games, dtype = bool)
+        else:
+            off_board = (rows < 0) | (rows >= self.num_rows) | (columns < 0) | (columns >= self.num_cols)
+        new_head = np.where(off_board, 0, rows * self.num_cols + columns)
+
+        ate = ~off_board & (new_head == self.food)
+        # Moving onto the tail is fine unless eating, since the tail moves away
+        collided = ~off_board & self.occupied[games, new_head] & ~((new_head == tail) & ~ate)
+        done = off_board | collided
+        moved = ~done & ~ate
+        grown = ~done & ate
+
+        # Games that moved: the tail becomes free, then the head is taken
+        m = games[moved]
+        m_tail = tail[moved]
+        m_head = new_head[moved]
+        self.occupied[m, m_tail] = False
+        position = self.free_count[m]
+        self.free_cells[m, position] = m_tail
+        self.free_position[m, m_tail] = position
+        self.free_count[m] += 1
+        self.push_heads(m, m_head)
+        position = self.free_position[m, m_head]
+        self.free_count[m] -= 1
+        last = self.free_cells[m, self.free_count[m]]
+        self.free_cells[m, position] = last
+        self.free_position[m, last] = position
+        self.free_position[m, m_head] = -1
+
+        # Games that ate: the snake grows and new food is placed
+        g = games[grown]
+        self.push_heads(g, new_head[grown])
+        self.length[g] += 1
+        self.points_scored[g] += 1
+        for game in g.tolist():
+            if self.free_count[game] == 0:
+                self.food[game] = -1 # the board is full
+                continue
+            position = self.rngs[game].randrange(int(self.free_count[game]))
+            cell = int(self.free_cells[game, position])
+            self.remove_free(game, cell)
+            self.food[game] = cell
+
+        self.steps[~done] += 1
+        won = grown & (self.food < 0)
+        for game in games[done].tolist():
+            self.finish_game(game, "died")
+        for game in games[won].tolist():
+            self.finish_game(game, "won")
+        return (ate, done | won)
+
+    def push_heads(self, games, cells):
+        """ Make cells the new heads of games """
+        self.head_index[games] = (self.head_index[games] + 1) % self.num_cells
+        self.body[games, self.head_index[games]] = cells
+        self.occupied[games, cells] = True
+
+    def finish_game(self, game, end):
+        """ Record the result of game and start it again """
+        self.finished.append((int(self.seeds[game]), int(self.points_scored[game]),
+                              int(self.steps[game]), end))
+        self.reset_game(game)
+
+    def snake_locations(self, game):
+        """ Return the list of (row, column) locations of the snake of game, head first """
+        cells = [self.body[game, (self.head_index[game] - i) % self.num_cells]
+                 for i in range(self.length[game])]
+        return [divmod(int(cell), self.num_cols) for cell in cells]
+
+    def boards(self):
+        """ Return the boards as an array of games x rows x columns: 1 for the snake, 2 for the food """
+        boards = self.occupied.astype(np.int8)
+        has_food = self.food >= 0
+        boards[self.games[has_food], self.food[has_food]] = 2
+        return boards.reshape(self.num_games, self.num_rows, self.num_cols)
+
+
+def benchmark(num_games, num_rows, num_cols, num_steps, seed=0):
+    """ Function that steps num_games games num_steps times in random directions and returns steps/sec """
+    model = VectorSnakeModel(num_games, num_rows, num_cols, seed)
+    actions = np.random.default_rng(seed).integers(0, 4, size = (num_steps, num_games))
+    start = time.perf_counter()
+    for i in range(num_steps):
+        model.step(actions[i])
+    return num_games * num_steps / (time.perf_counter() - start)
+
+
+@unittest.skipIf(np is None, "needs NumPy")
+class VectorSnakeModelTest(unittest.TestCase):
+
+    def play_both(self, wraparound):
+        """ Play the same random directions here and on one SnakeModel per game, comparing every step """
+        num_games, num_rows, num_cols = 16, 6, 7
+        vector = VectorSnakeModel(num_games, num_rows, num_cols, seed = 100, wraparound = wraparound)
+        rng = random.Random(1)
+        singles = []
+        def new_single(game):
+            model = SnakeModel(num_rows, num_cols, random.Random(int(vector.seeds[game])))
+            model.wraparound = wraparound
+            return model
+        singles = [new_single(game) for game in range(num_games)]
+
+        for step in range(300):
+            actions = [rng.randrange(4) for game in range(num_games)]
+            alive = []
+            for game in range(num_games):
+                singles[game].direction = DIRECTIONS[actions[game]]
+                alive.append(singles[game].one_step())
+            ate, done = vector.step(actions)
+            for game in range(num_games):
+                if not alive[game] or singles[game].food_location is None:
+                    self.assertTrue(done[game])
+                    singles[game] = new_single(game)
+                else:
+                    self.assertFalse(done[game])
+                    self.assertEqual(vector.snake_locations(game), list(singles[game].snake_locations))
+                    self.assertEqual(divmod(int(vector.food[game]), num_cols), singles[game].food_location)
+                    self.assertEqual(vector.points_scored[game], singles[game].points_scored)
+        self.assertGreater(len(vector.finished), 0)
+
+    def test_same_as_snake_model(self):
+        self.play_both(False)
+
+    def test_same_as_snake_model_with_wraparound(self):
+        self.play_both(True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure steps/sec of many snake games at once")
+    parser.add_argument("--games", type = int, default = 4096)
+    parser.add_argument("--rows", type = int, default = 30)
+    parser.add_argument("--cols", type = int, default = 30)
+    parser.add_argument("--steps", type = int, default = 200)
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("This needs NumPy")
+    print("%.0f steps/sec" % benchmark(args.games, args.rows, args.cols, args.steps))
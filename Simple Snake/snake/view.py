@@ -0,0 +1,280 @@
+"""
+Module: snake.view
+
+The window of the snake game. It only draws what it is told and passes
+the user's input on to the handlers it is given.
+"""
+import tkinter as tk
+
+
+class SnakeView:
+    def __init__(self, num_rows, num_cols):
+        """ Initialize view of the game """
+        # Constants (cells get smaller on big boards, to fit on the screen)
+        self.CELL_SIZE = max(2, min(20, 600 // max(num_rows, num_cols)))
+        self.CONTROL_FRAME_HEIGHT = 100
+        self.SCORE_FRAME_WIDTH = 200
+
+        # Size of grid
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+
+        # Create window
+        self.window = tk.Tk()
+        self.window.title("Snake")
+
+        # Create frame for grid of cells, and put cells in the frame
+        self.grid_frame = tk.Frame(self.window, height = num_rows * self.CELL_SIZE,
+                                width = num_cols * self.CELL_SIZE)
+        self.grid_frame.grid(row = 1, column = 1) # use grid layout manager
+        self.canvas = self.add_cells()
+        self.cell_items = {} # (row, column) -> rectangle drawn there, for cells that are not empty
+        self.overlay_item = None # the timing figures drawn over the board, once shown
+
+        # Create frame for controls
+        self.control_frame = tk.Frame(self.window, width = num_cols * self.CELL_SIZE, 
+                                height = self.CONTROL_FRAME_HEIGHT, borderwidth = 1, relief = "solid")
+        self.control_frame.grid(row = 2, column = 1, columnspan = 2, sticky = 'NESW') # use grid layout manager 
+        self.control_frame.grid_propagate(False)
+        (self.start_button, self.pause_button, 
+         self.step_button, self.step_speed_slider, 
+         self.reset_button, self.quit_button, self.wraparound_checkbox,
+         self.save_replay_button) = self.add_control() 
+
+        # Create frame for the score
+        self.score_frame = tk.Frame(self.window, height = num_rows * self.CELL_SIZE,
+                                width = self.SCORE_FRAME_WIDTH)
+        self.score_frame.grid(row = 1, column = 2) # use grid layout manager
+        self.score_frame.grid_propagate(False)
+        (self.score_label, self.points_label, self.time_label, 
+         self.pts_per_sec_label, self.game_over_label) = self.add_score()
+        
+
+    def add_cells(self):
+        """
+        Add the canvas the cells are drawn on to the grid frame. Empty
+        cells are just the white background with grid lines over it; a
+        rectangle is only drawn for a cell while the snake or the food is
+        in it.
+        """
+        width = self.num_cols * self.CELL_SIZE
+        height = self.num_rows * self.CELL_SIZE
+        canvas = tk.Canvas(self.grid_frame, width = width, height = height,
+                           bg = 'white', highlightthickness = 0)
+        canvas.grid(row = 1, column = 1) # use grid layout manager
+        if self.CELL_SIZE >= 6: # lines would hide smaller cells
+            for r in range(self.num_rows + 1):
+                canvas.create_line(0, r * self.CELL_SIZE, width, r * self.CELL_SIZE, fill = 'gray')
+            for c in range(self.num_cols + 1):
+                canvas.create_line(c * self.CELL_SIZE, 0, c * self.CELL_SIZE, height, fill = 'gray')
+        return canvas
+    
+    def add_control(self):
+        """ 
+        Create control buttons and slider, and add them to the control frame 
+        """
+        start_button = tk.Button(self.control_frame, text = "Start")
+        start_button.grid(row=1, column=1)
+        pause_button = tk.Button(self.control_frame, text = "Pause")
+        pause_button.grid(row=1, column=2)
+        step_button = tk.Button(self.control_frame, text = "Step")
+        step_button.grid(row=1, column=3)
+        step_speed_slider = tk.Scale(self.control_frame, from_=1, to=10, 
+                    label = "Step Speed", showvalue=0, orient=tk.HORIZONTAL)
+        step_speed_slider.grid(row=1, column=4)
+        reset_button = tk.Button(self.control_frame, text = "Reset")
+        reset_button.grid(row=1, column=5)
+        quit_button = tk.Button(self.control_frame, text = "Quit")
+        quit_button.grid(row=1, column=6)
+        
+        # Checkbox variable
+        self.wraparound = tk.BooleanVar()
+        self.wraparound.set(False)
+        wraparound_checkbox = tk.Checkbutton(self.control_frame, text = "Wraparound", var = self.wraparound)
+        wraparound_checkbox.grid(row = 1, column = 7)
+        save_replay_button = tk.Button(self.control_frame, text = "Save Replay")
+        save_replay_button.grid(row = 1, column = 8)
+
+
+        # Vertically center the controls in the control frame
+        self.control_frame.grid_rowconfigure(1, weight = 1) 
+
+        # Horizontally center the controls in the control frame
+        self.control_frame.grid_columnconfigure(0, weight = 1)
+        self.control_frame.grid_columnconfigure(1, weight = 1)
+        self.control_frame.grid_columnconfigure(2, weight = 1)
+        self.control_frame.grid_columnconfigure(3, weight = 1)
+        self.control_frame.grid_columnconfigure(4, weight = 1)
+        self.control_frame.grid_columnconfigure(5, weight = 1) 
+        self.control_frame.grid_columnconfigure(6, weight = 1)
+        self.control_frame.grid_columnconfigure(7, weight = 1) 
+        self.control_frame.grid_columnconfigure(8, weight = 1)
+                                                            
+        return (start_button, pause_button, step_button, step_speed_slider, 
+                reset_button, quit_button, wraparound_checkbox, save_replay_button)
+
+    def add_score(self):
+        """
+        Create score labels and add them to the score frame
+        """
+
+        # Create the variables to display the information in the labels
+        self.points = 0 # Initialize the score as zero
+        self.points_str = tk.StringVar()
+        self.points_str.set(f"Points: {self.points}")
+        self.time = 0.00 # Initialize the time as zero
+        self.time_str = tk.StringVar()
+        self.time_str.set(f"Time: {self.time:.2f}")
+        self.pts_per_sec = 0.00 # Initialize the points per second as zero
+        self.pts_per_sec_str = tk.StringVar()
+        self.pts_per_sec_str.set(f"Points per sec: {self.pts_per_sec:.2f}")
+        self.game_over_str = tk.StringVar()
+        self.game_over_str.set("GAME OVER") # Initialize the game over message as hidden
+
+        # Create the labels and place them in the grid
+        score_label = tk.Label(self.score_frame, text = "Score", font = ("Times", 20))
+        score_label.grid(row = 1, column = 1, pady = 15)
+        points_label = tk.Label(self.score_frame, textvariable = self.points_str, 
+                font = ("Helvetica", 15), borderwidth = 1, relief = "solid")
+        points_label.grid(row = 2, column = 1, pady = 10)
+        time_label = tk.Label(self.score_frame, textvariable = self.time_str, 
+                font = ("Helvetica", 15), borderwidth = 1, relief = "solid")
+        time_label.grid(row = 3, column = 1, pady = 10)
+        pts_per_sec_label = tk.Label(self.score_frame, textvariable = self.pts_per_sec_str, 
+                font = ("Helvetica", 15), borderwidth = 1, relief = "solid")
+        pts_per_sec_label.grid(row = 4, column = 1, pady = 10)
+        game_over_label = tk.Label(self.score_frame, textvariable = self.game_over_str, 
+                font = ("Times", 20))
+        game_over_label.grid(row = 5, column = 1, pady = 15)
+
+        # Center the labels in the frame
+        self.score_frame.grid_columnconfigure(1, weight = 1)
+
+        return (score_label, points_label, time_label, pts_per_sec_label, game_over_label)
+    
+
+    def set_up_handler(self, handler):
+        """ set handler for up key input to the function handler """
+        self.window.bind('<Up>', handler)
+    
+    def set_down_handler(self, handler):
+        """ set handler for down key input to the function handler """
+        self.window.bind('<Down>', handler)
+    
+    def set_right_handler(self, handler):
+        """ set handler for right key input to the function handler """
+        self.window.bind('<Right>', handler)
+    
+    def set_left_handler(self, handler):
+        """ set handler for left to the function handler """
+        self.window.bind('<Left>', handler)
+    
+    def set_start_handler(self, handler):
+        """ set handler for clicking on start button to the function handler """
+        self.start_button.configure(command = handler)
+
+    def set_pause_handler(self, handler):
+        """ set handler for clicking on pause button to the function handler """
+        self.pause_button.configure(command = handler)
+
+    def set_step_handler(self, handler):
+        """ set handler for clicking on step button to the function handler """
+        self.step_button.configure(command = handler)
+
+    def set_reset_handler(self, handler):
+        """ set handler for clicking on reset button to the function handler """
+        self.reset_button.configure(command = handler)
+
+    def set_quit_handler(self, handler):
+        """ set handler for clicking on quit button to the function handler """
+        self.quit_button.configure(command = handler)
+
+    def set_step_speed_handler(self, handler):
+        """ set handler for dragging the step speed slider to the function handler """
+        self.step_speed_slider.configure(command = handler)
+    
+    def set_wraparound_handler(self, handler):
+        self.wraparound_checkbox.configure(command = handler)
+
+    def set_save_replay_handler(self, handler):
+        """ set handler for clicking on save replay button to the function handler """
+        self.save_replay_button.configure(command = handler)
+
+    def fill_cell(self, row, column, color):
+        """ Draw cell in row, column in color """
+        item = self.cell_items.get((row, column))
+        if item is None:
+            x = column * self.CELL_SIZE
+            y = row * self.CELL_SIZE
+            self.cell_items[(row, column)] = self.canvas.create_rectangle(
+                x + 1, y + 1, x + self.CELL_SIZE, y + self.CELL_SIZE,
+                fill = color, width = 0, tags = "cell")
+        else:
+            self.canvas.itemconfigure(item, fill = color)
+
+    def make_alive(self, row, column):
+        """ Make cell in row, column alive """
+        self.fill_cell(row, column, 'black')
+
+    def make_food(self, row, column):
+        """ Show the food in row, column """
+        self.fill_cell(row, column, 'red')
+
+    def make_dead(self, row, column):
+        """ Make cell in row, column dead """
+        item = self.cell_items.pop((row, column), None)
+        if item is not None:
+            self.canvas.delete(item)
+
+    def reset(self):
+        """ reset all cells to dead """
+        self.canvas.delete("cell")
+        self.cell_items = {}
+
+    def draw_model(self, model):
+        """ Draw the whole board of model """
+        self.reset()
+        for row, column in model.snake_locations:
+            self.make_alive(row, column)
+        if model.food_location is not None:
+            self.make_food(*model.food_location)
+        self.game_over_str.set("")
+
+    def update_cells(self, model):
+        """ Redraw only the cells that the last step of model changed """
+        for location in model.dirty_cells:
+            if location == model.food_location:
+                self.make_food(*location)
+            elif model.occupied[model.cell(location)]:
+                self.make_alive(*location)
+            else:
+                self.make_dead(*location)
+
+    def show_overlay(self, text):
+        """ Show text (the timing figures) over the top left corner of the board """
+        if self.overlay_item is None:
+            self.overlay_item = self.canvas.create_text(4, 4, anchor = "nw", fill = 'blue',
+                                                        font = ("Helvetica", 9), tags = "overlay")
+        self.canvas.itemconfigure(self.overlay_item, text = text)
+        self.canvas.tag_raise("overlay") # over the cells drawn since
+
+    def set_points(self, points):
+        """ Show the points scored """
+        self.points = points
+        self.points_str.set(f"Points: {self.points}")
+
+    def show_game_over(self):
+        """ Show the game over message """
+        self.game_over_str.set("GAME OVER")
+
+    def hide_game_over(self):
+        """ Hide the game over message """
+        self.game_over_str.set("")
+
+    def schedule_next_step(self, step_time_millis, step_handler):
+        """ schedule next step of the simulation """
+        self.start_timer_object = self.window.after(step_time_millis, step_handler)
+
+    def cancel_next_step(self):
+        """ cancel the scheduled next step of simulation """
+        self.window.after_cancel(self.start_timer_object)